@@ -0,0 +1,230 @@
+"""
+Benchmark of the feature generation over the bundled relna corpus
+(resources/corpora/relna/corrected): each generator of
+RelnaRelationExtractor.default_feature_generators in isolation, all of them
+one after the other and all of them fused, in training and prediction mode.
+
+The corpus is read and preprocessed (tokenized, parsed, edges generated) once.
+Larger corpora are made by replicating its documents (--scales 1 2 10 100);
+the replicas have the same texts, so the dependency graphs cached by text
+are shared between them.
+
+For each run it reports the time, the edges per second, the features per edge,
+the hit rate of the sentence-level cache (fused runs only) and the peak memory
+(measured with tracemalloc in a second, untimed pass).
+The results are saved as JSON together with the git commit, to compare
+commits:
+
+    python3 benchmarks/feature_generation.py --scales 1 10 --output before.json
+    (...)
+    python3 benchmarks/feature_generation.py --scales 1 10 --output after.json --compare before.json
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+CORPUS = os.path.join(os.path.dirname(__file__), '..', 'resources', 'corpora', 'relna', 'corrected')
+E_ID_1, E_ID_2, R_ID = 'e_1', 'e_2', 'r_4'
+
+
+def read_corpus(corpus_path):
+    """
+    Read and preprocess the corpus, with the same pipeline settings as
+    tests/test_simple_evaluation.py, but without generating any feature.
+
+    :rtype: nalaf.structures.data.Dataset
+    """
+    from nalaf.utils.readers import HTMLReader
+    from nalaf.utils.annotation_readers import AnnJsonAnnotationReader
+    from nalaf.preprocessing.tokenizers import TmVarTokenizer
+    from nalaf.structures.relation_pipelines import RelationExtractionPipeline
+
+    dataset = HTMLReader(corpus_path).read()
+    AnnJsonAnnotationReader(
+        corpus_path,
+        read_only_class_id=None,
+        read_relations=True,
+        delete_incomplete_docs=False,
+        raise_exception_on_incosistencies=False).annotate(dataset)
+
+    pipeline = RelationExtractionPipeline(E_ID_1, E_ID_2, R_ID, tokenizer=TmVarTokenizer())
+    pipeline.feature_generators = []
+    pipeline.execute(dataset, train=True)
+    return dataset
+
+
+def replicate(dataset, scale):
+    """
+    :return: a dataset with scale copies of every document of the dataset
+    :rtype: nalaf.structures.data.Dataset
+    """
+    if scale == 1:
+        return dataset
+    replicated = copy.copy(dataset)
+    replicated.documents = OrderedDict()
+    for replica in range(scale):
+        for doc_id, doc in copy.deepcopy(dataset.documents).items():
+            replicated.documents['{}_{}'.format(doc_id, replica)] = doc
+    return replicated
+
+
+def generator_runs():
+    """
+    :return: the name and the generators of each run: every default generator
+        alone, then all of them serially and all of them fused
+    :rtype: list[(str, callable)]
+    """
+    from relna.learning.taggers import RelnaRelationExtractor
+
+    def default_generators(fused):
+        return RelnaRelationExtractor.default_feature_generators(E_ID_1, E_ID_2, graphs={}, fused=fused)
+
+    runs = []
+    for index, generator in enumerate(default_generators(fused=False)):
+        name = '{:02d}_{}'.format(index, type(generator).__name__)
+        runs.append((name, lambda index=index: [default_generators(fused=False)[index]]))
+    runs.append(('all_serial', lambda: default_generators(fused=False)))
+    runs.append(('all_fused', lambda: default_generators(fused=True)))
+    return runs
+
+
+def generate(generators, dataset, feature_set, is_training_mode):
+    for edge in dataset.edges():
+        edge.features = {}
+    for generator in generators:
+        generator.generate(dataset, feature_set, is_training_mode)
+
+
+def measure(make_generators, dataset, feature_set, is_training_mode, memory):
+    """
+    Time the generation of the features of the dataset and, if memory, measure
+    its peak memory in a second pass.
+
+    :rtype: dict
+    """
+    generators = make_generators()
+    start = time.perf_counter()
+    generate(generators, dataset, feature_set, is_training_mode)
+    seconds = time.perf_counter() - start
+
+    n_edges = sum(1 for _ in dataset.edges())
+    n_features = sum(len(edge.features) for edge in dataset.edges())
+    result = OrderedDict([
+        ('seconds', seconds),
+        ('edges', n_edges),
+        ('edges_per_second', n_edges / seconds if seconds else None),
+        ('features_per_edge', n_features / n_edges if n_edges else 0.0),
+        ('feature_set_size', len(feature_set)),
+    ])
+    sentence_caches = [generator.sentence_cache for generator in generators if hasattr(generator, 'sentence_cache')]
+    if sentence_caches:
+        result['sentence_cache'] = sentence_caches[0].stats()
+
+    if memory:
+        generators = make_generators()
+        pass_feature_set = copy.copy(feature_set) if not is_training_mode else {}
+        tracemalloc.start()
+        generate(generators, dataset, pass_feature_set, is_training_mode)
+        result['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+
+    return result
+
+
+def run(dataset, scales, names=None, memory=True):
+    """
+    :param names: only run the runs whose name contains any of these
+    :type names: list[str]
+    :return: the results keyed by scale, run name and mode
+    :rtype: dict
+    """
+    results = OrderedDict()
+    for scale in scales:
+        scaled = replicate(dataset, scale)
+        results[str(scale)] = OrderedDict()
+        for name, make_generators in generator_runs():
+            if names and not any(part in name for part in names):
+                continue
+            feature_set = {}
+            train = measure(make_generators, scaled, feature_set, True, memory)
+            predict = measure(make_generators, scaled, feature_set, False, memory)
+            results[str(scale)][name] = OrderedDict([('train', train), ('predict', predict)])
+            print('x{:<4} {:52} train {:8.3f}s {:9.1f} edges/s {:7.1f} features/edge | predict {:8.3f}s {:9.1f} edges/s{}'.format(
+                scale, name, train['seconds'], train['edges_per_second'] or 0, train['features_per_edge'],
+                predict['seconds'], predict['edges_per_second'] or 0,
+                ' | sentence cache {:.1%} hits'.format(train['sentence_cache']['hit_rate']) if 'sentence_cache' in train else ''))
+    return results
+
+
+def git_commit():
+    try:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=directory, universal_newlines=True).strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=directory,
+                                        universal_newlines=True).strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """
+    Print the speedup of every run and mode found in both results.
+    """
+    print('\nspeedup against {} (baseline seconds / seconds):'.format(baseline.get('commit')))
+    for scale, runs in results['results'].items():
+        for name, modes in runs.items():
+            baseline_modes = baseline['results'].get(scale, {}).get(name)
+            if baseline_modes is None:
+                continue
+            speedups = ['{} x{:.2f}'.format(mode, baseline_modes[mode]['seconds'] / modes[mode]['seconds'])
+                        for mode in ('train', 'predict') if modes[mode]['seconds']]
+            print('x{:<4} {:52} {}'.format(scale, name, '  '.join(speedups)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the feature generators on the relna corpus')
+    parser.add_argument('--corpus', default=CORPUS, help='the directory of the corpus (html and ann.json files)')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 10],
+                        help='the number of replicas of the corpus to benchmark, e.g. 1 2 10 100')
+    parser.add_argument('--only', nargs='+', help='only run the generators whose name contains any of these, '
+                                                  'e.g. Path all_fused')
+    parser.add_argument('--no_memory', action='store_true', help='skip the peak memory pass (halves the time)')
+    parser.add_argument('--output', help='the JSON file to save the results to, by default benchmark-<commit>.json')
+    parser.add_argument('--compare', help='a JSON file of previous results to compare against')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset = read_corpus(args.corpus)
+    print('read and preprocessed {} documents, {} edges in {:.1f}s'.format(
+        len(dataset.documents), sum(1 for _ in dataset.edges()), time.perf_counter() - start))
+
+    commit = git_commit()
+    results = OrderedDict([
+        ('commit', commit),
+        ('date', time.strftime('%Y-%m-%dT%H:%M:%S')),
+        ('python', platform.python_version()),
+        ('machine', platform.machine()),
+        ('cpus', os.cpu_count()),
+        ('corpus', os.path.abspath(args.corpus)),
+        ('documents', len(dataset.documents)),
+        ('results', run(dataset, args.scales, args.only, not args.no_memory)),
+    ])
+
+    output = args.output or 'benchmark-{}.json'.format((commit or 'unknown')[:12])
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print('results saved to {}'.format(output))
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
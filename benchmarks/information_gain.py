@@ -0,0 +1,167 @@
+"""
+Benchmark of the information gain used for feature selection: the previous
+pure Python implementation (one pass over all the edges per feature) against
+the sparse matrix one in relna.features.selection.
+
+Runs on a synthetic dataset and checks that both return the same ranking:
+
+    python3 benchmarks/information_gain.py --edges 2000 --features 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from math import log2
+from operator import itemgetter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from relna.features.selection import information_gain
+
+
+class Edge:
+    def __init__(self, features, real_target):
+        self.features = features
+        self.real_target = real_target
+
+
+class Dataset:
+    def __init__(self, edges):
+        self._edges = edges
+
+    def edges(self):
+        return iter(self._edges)
+
+
+def synthetic_dataset(n_edges, n_features, features_per_edge, seed):
+    rand = random.Random(seed)
+    feature_set = {'{}_feature_{}'.format(index % 90 + 1, index): index for index in range(1, n_features + 1)}
+    edges = []
+    for _ in range(n_edges):
+        # Zipf-like feature frequencies, as in the real feature sets
+        indices = {min(n_features, int(rand.paretovariate(0.6))) for _ in range(features_per_edge)}
+        target = rand.choices([+1, -1, None], weights=[30, 68, 2])[0]
+        edges.append(Edge({index: 1 for index in indices}, target))
+    return feature_set, Dataset(edges)
+
+
+def naive_information_gain(feature_set, dataset):
+    number_pos_instances = 0
+    number_neg_instances = 0
+
+    for edge in dataset.edges():
+        if edge.real_target == 1:
+            number_pos_instances += 1
+        else:
+            number_neg_instances += 1
+
+    number_total_instances = number_pos_instances + number_neg_instances
+    percentage_pos_instances = number_pos_instances / number_total_instances
+    percentage_neg_instances = number_neg_instances / number_total_instances
+
+    first_ent_component = -1 * (percentage_pos_instances * log2(percentage_pos_instances) + percentage_neg_instances * log2(percentage_neg_instances))
+    feature_list = []
+    for key, value in feature_set.items():
+        feature_present_in_pos = 0
+        feature_present_in_neg = 0
+        feature_absent_in_pos = 0
+        feature_absent_in_neg = 0
+        total_feature_present = 0
+        total_feature_absent = 0
+
+        for edge in dataset.edges():
+            if edge.real_target == 1:
+                if value in edge.features.keys():
+                    feature_present_in_pos += 1
+                    total_feature_present += 1
+                else:
+                    feature_absent_in_pos += 1
+                    total_feature_absent +=1
+            if edge.real_target == -1:
+                if value in edge.features.keys():
+                    feature_present_in_neg += 1
+                    total_feature_present += 1
+                else:
+                    feature_absent_in_neg += 1
+                    total_feature_absent += 1
+
+        percentage_pos_given_feature = 0
+        percentage_neg_given_feature = 0
+        if (total_feature_present > 0):
+            percentage_pos_given_feature = feature_present_in_pos / total_feature_present
+            percentage_neg_given_feature = feature_present_in_neg / total_feature_present
+
+        percentage_pos_given_feature_log = 0
+        percentage_neg_given_feature_log = 0
+        if percentage_pos_given_feature > 0:
+            percentage_pos_given_feature_log = log2(percentage_pos_given_feature)
+        if percentage_neg_given_feature > 0:
+            percentage_neg_given_feature_log = log2(percentage_neg_given_feature)
+
+        second_emp_component_factor = percentage_pos_given_feature * percentage_pos_given_feature_log + \
+                            percentage_neg_given_feature * percentage_neg_given_feature_log
+
+        percentage_feature_given_pos = feature_present_in_pos / number_pos_instances
+        percentage_feature_given_neg = feature_present_in_pos / number_neg_instances
+        percentage_feature = percentage_feature_given_pos * percentage_pos_instances + \
+                    percentage_feature_given_neg * percentage_neg_instances
+
+        second_ent_component = percentage_feature * second_emp_component_factor
+        percentage_pos_given_feature_component = 0
+        percentage_neg_given_feature_component = 0
+        if total_feature_absent>0:
+            percentage_pos_given_feature_component = feature_absent_in_pos / total_feature_absent
+            percentage_neg_given_feature_component = feature_absent_in_neg / total_feature_absent
+
+        percentage_pos_given_feature_component_log = 0
+        percentage_neg_given_feature_component_log = 0
+        if percentage_pos_given_feature_component>0:
+            percentage_pos_given_feature_component_log = log2(percentage_pos_given_feature_component)
+        if percentage_neg_given_feature_component>0:
+            percentage_neg_given_feature_component_log = log2(percentage_neg_given_feature_component)
+
+        third_component_multi_factor = percentage_pos_given_feature_component * percentage_pos_given_feature_component_log + \
+                percentage_neg_given_feature_component * percentage_neg_given_feature_component_log
+
+        percentage_feature_comp_given_pos = feature_absent_in_pos / number_pos_instances
+        percentage_feature_comp_given_neg = feature_absent_in_neg / number_neg_instances
+        percentage_feature_comp = percentage_feature_comp_given_pos * percentage_pos_instances + \
+                    percentage_feature_comp_given_neg * percentage_neg_instances
+
+        third_ent_component = percentage_feature_comp * third_component_multi_factor
+        entropy = first_ent_component + second_ent_component + third_ent_component
+
+        feature_list.append([key, value, entropy])
+    return feature_list
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the information gain of the feature selection')
+    parser.add_argument('--edges', type=int, default=2000)
+    parser.add_argument('--features', type=int, default=20000)
+    parser.add_argument('--features_per_edge', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip_naive', action='store_true', help='only time the sparse matrix implementation')
+    args = parser.parse_args()
+
+    feature_set, dataset = synthetic_dataset(args.edges, args.features, args.features_per_edge, args.seed)
+    print('{} edges, {} features'.format(args.edges, args.features))
+
+    fast, fast_time = timed(information_gain, feature_set, dataset)
+    print('sparse matrix: {:.3f}s'.format(fast_time))
+
+    if not args.skip_naive:
+        naive, naive_time = timed(naive_information_gain, feature_set, dataset)
+        print('naive loop:    {:.3f}s  (speedup x{:.0f})'.format(naive_time, naive_time / fast_time))
+
+        same_ranking = sorted(naive, key=itemgetter(2), reverse=True) == sorted(fast, key=itemgetter(2), reverse=True)
+        print('same ranking: {}'.format(same_ranking))
+        if not same_ranking:
+            sys.exit(1)
@@ -1,25 +1,84 @@
 import argparse
 import os
-import pickle
+import shutil
+import tempfile
 
-import pkg_resources
-
-from relna.utils import PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID
+from nalaf.structures.data import Dataset
 from nalaf.utils.readers import TextFilesReader, PMIDReader
 from nalaf.utils.readers import StringReader
 from nalaf.utils.writers import TagTogFormat, PubTatorFormat
 from relna.utils.writers import RelnaConsoleWriter
-from nalaf.structures.relation_pipelines import RelationExtractionPipeline
-from nalaf.learning.svmlight import SVMLightTreeKernels
-from relna.learning.taggers import TranscriptionFactorTagger
-from relna.learning.taggers import RelnaRelationExtractor
+from relna.prediction import RelnaPredictor
+
+
+def read_chunks(args):
+    """
+    Read the input documents, all at once or, with --stream, in chunks of
+    --chunk_size documents. The texts of a directory are read at once, with the
+    same file selection as without --stream, but each chunk is handed out (and
+    preprocessed, predicted and written) on its own and then dropped.
+
+    :return: generator of nalaf.structures.data.Dataset
+    """
+    chunk_size = args.chunk_size if args.stream else None
+
+    if args.string:
+        yield StringReader(args.string).read()
+
+    elif args.pmids:
+        if chunk_size is None:
+            yield PMIDReader(args.pmids).read()
+        else:
+            for start in range(0, len(args.pmids), chunk_size):
+                yield PMIDReader(args.pmids[start:start + chunk_size]).read()
+
+    elif chunk_size is None:
+        yield TextFilesReader(args.dir_or_file).read()
+
+    else:
+        documents = TextFilesReader(args.dir_or_file).read().documents
+        while documents:
+            chunk = Dataset()
+            for _ in range(min(chunk_size, len(documents))):
+                doc_id, document = documents.popitem(last=False)
+                chunk.documents[doc_id] = document
+            yield chunk
+
+
+def write(dataset, args, append=False):
+    """
+    Write the predictions of the dataset in the requested format.
+
+    :param append: if True, the pubtator output is appended to the one of
+        the previous chunks instead of overwriting it
+    """
+    if args.output_dir:
+        if args.file_format == 'ann.json':
+            TagTogFormat(dataset, to_save_to=args.output_dir).export(threshold_val=0)
+        elif args.file_format == 'pubtator':
+            location = os.path.join(args.output_dir, 'pubtator.txt')
+            if not append:
+                PubTatorFormat(dataset, location=location).export()
+            else:
+                # exported to a file of its own, closed before the exporter opens it again by name
+                file_descriptor, chunk_location = tempfile.mkstemp(suffix='.txt')
+                os.close(file_descriptor)
+                try:
+                    PubTatorFormat(dataset, location=chunk_location).export()
+                    with open(chunk_location, encoding='utf-8') as chunk_file, \
+                            open(location, 'a', encoding='utf-8') as file:
+                        shutil.copyfileobj(chunk_file, file)
+                finally:
+                    os.remove(chunk_location)
+    else:
+        RelnaConsoleWriter(args.color).write(dataset)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='A simple demo for using the relna pipeline for prediction')
 
-    parser.add_argument('-c', '--svmlight_dir', help='path to the directory containing the svmlight executables',
-                        required=True)
+    parser.add_argument('-c', '--svmlight_dir', help='path to the directory containing the svmlight executables; '
+                                                     'if not given, the default linear model is applied in-process')
 
     parser.add_argument('--color', help='uses color for highlighting predictions if supported '
                                         'otherwise prints them in new line',
@@ -32,6 +91,29 @@ if __name__ == "__main__":
                                                    'otherwise the output will be written to the standard console')
     parser.add_argument('-f', '--file_format', help='the format for writing the output to a directory',
                         choices=['ann.json', 'pubtator'], default='ann.json')
+    parser.add_argument('--go_index', help='directory of an offline Uniprot to GO terms index '
+                                           '(built with python3 -m relna.utils.go_index) to use instead of Uniprot')
+    parser.add_argument('--feature_set', help='the feature set of the model, pickled or in the memory-mapped .fdict '
+                                              'format (python3 -m relna.utils.feature_dictionary), '
+                                              'by default relna/data/features.pickle')
+    parser.add_argument('--feature_bits', help='for a model trained with hashed features (HashedFeatureSpace), '
+                                               'the number of bits of its feature space; --feature_set is not used then',
+                        type=int)
+    parser.add_argument('--model_dir', help='the directory of a compact model (python3 -m relna.learning.compaction), '
+                                            'with its own feature set and svmlight model; --feature_set is not used then')
+    parser.add_argument('-j', '--jobs', help='the number of processes used to generate the features, '
+                                             '-1 to use all the available cores',
+                        type=int, default=1)
+    parser.add_argument('--instance_cache', help='directory of a cache of the instances (edge features) of the predicted '
+                                                 'documents, so that predicting the same documents again skips the '
+                                                 'feature generation')
+    parser.add_argument('--profile', help='record the time, edges and features of every feature generator '
+                                          'and write them as a JSON report to this file')
+    parser.add_argument('--stream', help='read, predict and write the documents in chunks of --chunk_size '
+                                         'documents, so that the memory use of the predictions does not grow with the input size',
+                        action='store_true')
+    parser.add_argument('--chunk_size', help='the number of documents per chunk with --stream',
+                        type=int, default=100)
 
     group = parser.add_mutually_exclusive_group(required=True)
 
@@ -41,37 +123,24 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    warning = 'Due to a dependence on GNormPlus, running nala with -s and -d switches might take a long time.'
-    if args.string:
-        print(warning)
-        dataset = StringReader(args.string).read()
-    elif args.pmids:
-        dataset = PMIDReader(args.pmids).read()
-    elif os.path.exists(args.dir_or_file):
-        print(warning)
-        dataset = TextFilesReader(args.dir_or_file).read()
-    else:
+    if args.dir_or_file and not os.path.exists(args.dir_or_file):
         raise FileNotFoundError('directory or file "{}" does not exist'.format(args.dir_or_file))
+    if args.output_dir and not os.path.isdir(args.output_dir):
+        raise NotADirectoryError('{} is not a directory'.format(args.output_dir))
 
-    TranscriptionFactorTagger(pkg_resources.resource_filename('relna.data', 'goose.dat')).tag(dataset, uniprot=True)
-
-    with open(pkg_resources.resource_filename('relna.data', 'features.pickle'), 'rb') as fp:
-        feature_set = pickle.load(fp)
+    if args.string or args.dir_or_file:
+        print('Due to a dependence on GNormPlus, running nala with -s and -d switches might take a long time.')
 
-    pipeline = RelationExtractionPipeline(PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID, feature_set=feature_set)
-    pipeline.execute(dataset, feature_generators=RelnaRelationExtractor.default_feature_generators(PRO_CLASS_ID, MUT_CLASS_ID, feature_set, train=False))
+    predictor = RelnaPredictor(svmlight_dir=args.svmlight_dir, go_index=args.go_index, n_jobs=args.jobs,
+                               feature_set_path=args.feature_set, feature_bits=args.feature_bits,
+                               profile=bool(args.profile), instance_cache=args.instance_cache,
+                               model_dir=args.model_dir)
 
-    # get the predictions
-    svmlight = SVMLightTreeKernels(args.svmlight_dir, use_tree_kernel=False)
-    tagger = RelnaRelationExtractor(PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID, svmlight)
-    tagger.tag(dataset, feature_set)
+    for index, dataset in enumerate(read_chunks(args)):
+        predictor.predict(dataset)
+        write(dataset, args, append=index > 0)
 
-    if args.output_dir:
-        if not os.path.isdir(args.output_dir):
-            raise NotADirectoryError('{} is not a directory'.format(args.output_dir))
-        if args.file_format == 'ann.json':
-            TagTogFormat(dataset, to_save_to=args.output_dir).export(threshold_val=0)
-        elif args.file_format == 'pubtator':
-            PubTatorFormat(dataset, location=os.path.join(args.output_dir, 'pubtator.txt')).export()
-    else:
-        RelnaConsoleWriter(args.color).write(dataset)
+    if args.profile:
+        predictor.profile.write(args.profile)
+        print('Feature generation profile written to {} (sentence cache hit rate {:.1%})'.format(
+            args.profile, predictor.profile.report()['sentence_cache']['hit_rate']))
@@ -1,8 +1,10 @@
-from nalaf.features.relations import EdgeFeatureGenerator
-from nltk.stem import PorterStemmer
+from relna.features.engine import PerEdgeFeatureGenerator
+from relna.features.hashing import feature_key
+from relna.features.stemming import CachedPorterStemmer
+from relna.features.entities import entity_index
 
 
-class LinearContextFeatureGenerator(EdgeFeatureGenerator):
+class LinearContextFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Each entity has a precalculated entity head token. If the entity has only
     one token, that forms the head token. However, if the entity has multiple
@@ -22,50 +24,51 @@ class LinearContextFeatureGenerator(EdgeFeatureGenerator):
         """the window size for the linear context"""
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            head1 = edge.entity1.head_token
-            head2 = edge.entity2.head_token
-            sentence = edge.same_part.sentences[edge.same_sentence_id]
-            for i in range(1, self.linear_context+1):
-                if head1.features['id'] < len(sentence):
-                    if (head1.features['id']+i)<len(sentence):
-                        self.linear_order_features('entity1_linear_'+str(i)+'_',
-                                sentence[head1.features['id']+i], edge, sentence, feature_set, is_training_mode)
-                if head2.features['id'] < len(sentence):
-                    if (head2.features['id']+i)<len(sentence):
-                        self.linear_order_features('entity2_linear_'+str(i)+'_',
-                                sentence[head2.features['id']+i], edge, sentence, feature_set, is_training_mode)
-                if head1.features['id'] >= 0:
-                    if (head1.features['id']-i)>=0:
-                        self.linear_order_features('entity1_linear_-'+str(i)+'_',
-                                sentence[head1.features['id']-i], edge, sentence, feature_set, is_training_mode)
-                if head2.features['id'] >= 0:
-                    if (head2.features['id']-i)>=0:
-                        self.linear_order_features('entity2_linear_-'+str(i)+'_',
-                                sentence[head2.features['id']-i], edge, sentence, feature_set, is_training_mode)
-
-
-    def linear_order_features(self, prefix, token, edge, sentence, feature_set, is_training_mode):
-        feature_name_1 = '23_' + prefix + 'txt_' + token.word + '_[0]'
-        feature_name_2 = '24_' + prefix + 'pos_' + token.features['pos'] + '_[0]'
-        feature_name_3 = '25_' + prefix + 'given_[0]'
-        feature_name_4 = '26_' + prefix + 'txt_' + token.masked_text(edge.same_part) + '_[0]'
-        feature_name_5 = '27_' + prefix + 'ann_type_entity_[0]'
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        head1 = context.head1
+        head2 = context.head2
+        sentence = context.sentence
+        for i in range(1, self.linear_context+1):
+            if head1.features['id'] < len(sentence):
+                if (head1.features['id']+i)<len(sentence):
+                    self.linear_order_features('entity1_linear_'+str(i)+'_',
+                            sentence[head1.features['id']+i], edge, sentence, feature_set, is_training_mode, context)
+            if head2.features['id'] < len(sentence):
+                if (head2.features['id']+i)<len(sentence):
+                    self.linear_order_features('entity2_linear_'+str(i)+'_',
+                            sentence[head2.features['id']+i], edge, sentence, feature_set, is_training_mode, context)
+            if head1.features['id'] >= 0:
+                if (head1.features['id']-i)>=0:
+                    self.linear_order_features('entity1_linear_-'+str(i)+'_',
+                            sentence[head1.features['id']-i], edge, sentence, feature_set, is_training_mode, context)
+            if head2.features['id'] >= 0:
+                if (head2.features['id']-i)>=0:
+                    self.linear_order_features('entity2_linear_-'+str(i)+'_',
+                            sentence[head2.features['id']-i], edge, sentence, feature_set, is_training_mode, context)
+
+
+    def linear_order_features(self, prefix, token, edge, sentence, feature_set, is_training_mode, context=None):
+        entities = entity_index(edge, context)
+        feature_name_1 = feature_key(feature_set, '23_{}txt_{}_[0]', prefix, token.word)
+        feature_name_2 = feature_key(feature_set, '24_{}pos_{}_[0]', prefix, token.features['pos'])
+        feature_name_3 = feature_key(feature_set, '25_{}given_[0]', prefix)
+        feature_name_4 = feature_key(feature_set, '26_{}txt_{}_[0]', prefix, entities.masked_text(token))
+        feature_name_5 = feature_key(feature_set, '27_{}ann_type_entity_[0]', prefix)
 
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
-        if token.is_entity_part(edge.same_part):
+        if entities.is_entity_part(token):
             self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_3)
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_4)
-        if token.is_entity_part(edge.same_part):
-            entity = token.get_entity(edge.same_part)
-            feature_name_6 = '28_' + prefix + 'ann_type_' + entity.class_id + '_[0]'
+        if entities.is_entity_part(token):
+            entity = entities.get_entity(token)
+            feature_name_6 = feature_key(feature_set, '28_{}ann_type_{}_[0]', prefix, entity.class_id)
             self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_5)
             self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_6)
 
 
-class EntityOrderFeatureGenerator(EdgeFeatureGenerator):
+class EntityOrderFeatureGenerator(PerEdgeFeatureGenerator):
     """
     The is the order of the entities in the sentence.  Whether entity1 occurs
     first or entity2 occurs first.
@@ -79,16 +82,16 @@ class EntityOrderFeatureGenerator(EdgeFeatureGenerator):
         pass
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            if edge.entity1.offset < edge.entity2.offset:
-                feature_name = '30_order_entity1_entity2_[0]'
-            else:
-                feature_name = '30_order_entity2_entity1_[0]'
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        if edge.entity1.offset < edge.entity2.offset:
+            feature_name = '30_order_entity1_entity2_[0]'
+        else:
+            feature_name = '30_order_entity2_entity1_[0]'
+        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
 
 
-class LinearDistanceFeatureGenerator(EdgeFeatureGenerator):
+class LinearDistanceFeatureGenerator(PerEdgeFeatureGenerator):
     """
     The absolute distance between the two entities in the edge.
     If distance is greater than 5, add to feature set.
@@ -106,22 +109,20 @@ class LinearDistanceFeatureGenerator(EdgeFeatureGenerator):
         """the distance parameter"""
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            entity1_number = edge.entity1.head_token.features['id']
-            entity2_number = edge.entity2.head_token.features['id']
-            distance = abs(entity1_number-entity2_number)
-            if distance>self.distance:
-                feature_name = '31_entity_linear_distance_greater_than_[5]'
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-            else:
-                feature_name = '31_entity_linear_distance_lesser_than_[5]'
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-            feature_name = '32_entity_linear_distance_[0]'
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name, value=distance)
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        distance = context.second_id - context.first_id
+        if distance>self.distance:
+            feature_name = '31_entity_linear_distance_greater_than_[5]'
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+        else:
+            feature_name = '31_entity_linear_distance_lesser_than_[5]'
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+        feature_name = '32_entity_linear_distance_[0]'
+        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name, value=distance)
 
 
-class IntermediateTokensFeatureGenerator(EdgeFeatureGenerator):
+class IntermediateTokensFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Generate the bag of words representation, masked text, stemmed text and
     parts of speech tag for each of the tokens present between two entities in
@@ -133,47 +134,45 @@ class IntermediateTokensFeatureGenerator(EdgeFeatureGenerator):
     :type training_mode: bool
     """
     def __init__(self):
-        self.stemmer = PorterStemmer()
-        """an instance of PorterStemmer"""
-
-
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            sentence = edge.same_part.sentences[edge.same_sentence_id]
-            if edge.entity1.head_token.features['id'] < edge.entity2.head_token.features['id']:
-                first = edge.entity1.head_token.features['id']
-                second = edge.entity2.head_token.features['id']
-                for i in range(first+1, second):
-                    token = sentence[i]
-                    feature_name = '33_fwd_bow_intermediate_'+token.word+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                    feature_name = '34_fwd_bow_intermediate_masked_'+token.masked_text(edge.same_part)+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                    feature_name = '35_fwd_stem_intermediate_'+self.stemmer.stem(token.word)+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                    feature_name = '36_fwd_pos_intermediate_'+token.features['pos']+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-            else:
-                first = edge.entity2.head_token.features['id']
-                second = edge.entity1.head_token.features['id']
-                for i in range(first+1, second):
-                    token = sentence[i]
-                    feature_name = '37_bkd_bow_intermediate_'+token.word+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                    feature_name = '38_bkd_bow_intermediate_masked_'+token.masked_text(edge.same_part)+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                    feature_name = '39_bkd_stem_intermediate_'+self.stemmer.stem(token.word)+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                    feature_name = '40_bkd_pos_intermediate_'+token.features['pos']+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+        self.stemmer = CachedPorterStemmer()
+        """an instance of the cached PorterStemmer"""
 
+
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        sentence = context.sentence
+        first = context.first_id
+        second = context.second_id
+        if context.head1.features['id'] < context.head2.features['id']:
             for i in range(first+1, second):
                 token = sentence[i]
-                feature_name = '41_bow_intermediate_'+token.word+'_[0]'
+                feature_name = feature_key(feature_set, '33_fwd_bow_intermediate_{}_[0]', token.word)
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                feature_name = feature_key(feature_set, '34_fwd_bow_intermediate_masked_{}_[0]', context.entities.masked_text(token))
                 self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                feature_name = '42_bow_intermediate_masked_'+token.masked_text(edge.same_part)+'_[0]'
+                feature_name = feature_key(feature_set, '35_fwd_stem_intermediate_{}_[0]', self.stemmer.stem(token.word))
                 self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                feature_name = '43_stem_intermediate_'+self.stemmer.stem(token.word)+'_[0]'
+                feature_name = feature_key(feature_set, '36_fwd_pos_intermediate_{}_[0]', token.features['pos'])
                 self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                feature_name = '44_pos_intermediate_'+token.features['pos']+'_[0]'
+        else:
+            for i in range(first+1, second):
+                token = sentence[i]
+                feature_name = feature_key(feature_set, '37_bkd_bow_intermediate_{}_[0]', token.word)
                 self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                feature_name = feature_key(feature_set, '38_bkd_bow_intermediate_masked_{}_[0]', context.entities.masked_text(token))
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                feature_name = feature_key(feature_set, '39_bkd_stem_intermediate_{}_[0]', self.stemmer.stem(token.word))
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                feature_name = feature_key(feature_set, '40_bkd_pos_intermediate_{}_[0]', token.features['pos'])
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+
+        for i in range(first+1, second):
+            token = sentence[i]
+            feature_name = feature_key(feature_set, '41_bow_intermediate_{}_[0]', token.word)
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+            feature_name = feature_key(feature_set, '42_bow_intermediate_masked_{}_[0]', context.entities.masked_text(token))
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+            feature_name = feature_key(feature_set, '43_stem_intermediate_{}_[0]', self.stemmer.stem(token.word))
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+            feature_name = feature_key(feature_set, '44_pos_intermediate_{}_[0]', token.features['pos'])
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
@@ -0,0 +1,580 @@
+import abc
+import time
+from collections import OrderedDict
+from nalaf.features.relations import EdgeFeatureGenerator
+from nalaf.structures.data import Dataset
+from relna.features.hashing import HashedFeatureSpace
+from relna.features.relations import annotated_types
+from relna.features.entities import PartEntityIndex
+from relna.features.selection import feature_group
+
+
+class SentenceFeatureCache:
+    """
+    Memoizes results that only depend on the sentence of an edge, so that they
+    are computed once per sentence and replayed onto every edge in it.
+
+    Entries are keyed by (sentence_id, key) and only kept for the part being
+    visited: they are dropped as soon as an edge of another part is seen. The
+    entity index of the part being visited is built anew when it is entered,
+    so that every run sees the current annotations.
+
+    The key is chosen by the caller and usually contains the generator itself,
+    so that several generators can share the same cache.
+    """
+    def __init__(self):
+        self.part = None
+        """the part the cached entries belong to"""
+        self.entries = {}
+        """the cached results of the current part keyed by (sentence_id, key)"""
+        self.entities = None
+        """the entity index of the current part"""
+        self.hits = 0
+        """the number of lookups answered from the cache"""
+        self.misses = 0
+        """the number of lookups that had to be computed"""
+
+
+    def get(self, part, sentence_id, key, compute):
+        """
+        :param compute: called without arguments to compute the result on a miss
+        :type compute: callable
+        :return: the cached or newly computed result
+        """
+        if part is not self.part:
+            self.enter(part)
+        try:
+            result = self.entries[(sentence_id, key)]
+            self.hits += 1
+        except KeyError:
+            result = compute()
+            self.entries[(sentence_id, key)] = result
+            self.misses += 1
+        return result
+
+
+    def entity_index(self, part):
+        """
+        :return: the entity index of the part, built once per visit of the part
+        :rtype: relna.features.entities.PartEntityIndex
+        """
+        if part is not self.part:
+            self.enter(part)
+        return self.entities
+
+
+    def enter(self, part):
+        """
+        Start visiting the part, dropping the entries of the previous one.
+        """
+        self.part = part
+        self.entries = {}
+        self.entities = PartEntityIndex.build(part)
+
+
+    def clear(self):
+        """
+        Drop the cached entries, keeping the hit and miss counters.
+        """
+        self.part = None
+        self.entries = {}
+        self.entities = None
+
+
+    def hit_rate(self):
+        """
+        :return: the fraction of lookups answered from the cache
+        :rtype: float
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+    def stats(self):
+        """
+        :return: the hits, misses and hit rate of the cache
+        :rtype: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate()}
+
+
+    def merge(self, stats):
+        """
+        Add the counters of another cache, e.g. the one of a worker process
+        generating a shard of the dataset.
+
+        :param stats: the stats of the other cache
+        :type stats: dict
+        """
+        self.hits += stats['hits']
+        self.misses += stats['misses']
+
+
+class EdgeContext:
+    """
+    State of a single edge that is shared by all the generators visiting it.
+
+    The sentence, the head tokens and the annotation types of the tokens are
+    looked up once per edge instead of once per generator, and the entities of
+    the tokens are indexed once per part (see relna.features.entities.PartEntityIndex).
+
+    :param edge: the edge being visited
+    :type edge: nalaf.structures.data.Edge
+    :param sentence_cache: the cache of sentence-level results of the current run
+    :type sentence_cache: relna.features.engine.SentenceFeatureCache
+    """
+    def __init__(self, edge, sentence_cache=None):
+        self.edge = edge
+        """the edge being visited"""
+        self.part = edge.same_part
+        """the part containing the edge"""
+        self.sentence_id = edge.same_sentence_id
+        """the index of the sentence containing the edge"""
+        self.sentence = self.part.sentences[self.sentence_id]
+        """the list of tokens of the sentence containing the edge"""
+        self.head1 = edge.entity1.head_token
+        """the head token of entity1"""
+        self.head2 = edge.entity2.head_token
+        """the head token of entity2"""
+        self.first_id = min(self.head1.features['id'], self.head2.features['id'])
+        """the id of the head token that comes first in the sentence"""
+        self.second_id = max(self.head1.features['id'], self.head2.features['id'])
+        """the id of the head token that comes last in the sentence"""
+        self.sentence_cache = sentence_cache if sentence_cache is not None else SentenceFeatureCache()
+        """the cache of sentence-level results of the current run"""
+        self.entities = self.sentence_cache.entity_index(self.part)
+        """the token to entity lookups of the part"""
+        self._annotated_types = {}
+
+
+    def annotated_types(self, token):
+        """
+        Memoized version of relna.features.relations.annotated_types for the
+        tokens of this edge's sentence.
+        """
+        try:
+            return self._annotated_types[token.start]
+        except KeyError:
+            ann_types = annotated_types(token, self.edge, self.entities)
+            self._annotated_types[token.start] = ann_types
+            return ann_types
+
+
+    def sentence_features(self, key, compute):
+        """
+        Result of compute for the sentence of this edge, computed only once
+        for all the edges of the sentence.
+
+        :param key: identifies the result within the sentence
+        :param compute: called without arguments to compute the result on a miss
+        :type compute: callable
+        """
+        return self.sentence_cache.get(self.part, self.sentence_id, key, compute)
+
+
+class PerEdgeFeatureGenerator(EdgeFeatureGenerator):
+    """
+    Edge feature generator that computes the features of one edge at a time.
+
+    Subclasses implement generate_edge instead of generate, which lets
+    FusedEdgeFeatureGenerator visit every edge only once for all generators.
+    """
+
+    def generate(self, dataset, feature_set, is_training_mode):
+        sentence_cache = SentenceFeatureCache()
+        for edge in dataset.edges():
+            self.generate_edge(EdgeContext(edge, sentence_cache), feature_set, is_training_mode)
+
+
+    @abc.abstractmethod
+    def generate_edge(self, context, feature_set, is_training_mode):
+        """
+        :type context: relna.features.engine.EdgeContext
+        """
+        pass
+
+
+    def add_to_feature_set(self, feature_set, is_training_mode, edge, feature_name, value=1):
+        """
+        Same as EdgeFeatureGenerator.add_to_feature_set, but with a single
+        lookup of the feature in prediction mode. With a HashedFeatureSpace,
+        the hashed signed value is set in both modes.
+        """
+        if isinstance(feature_set, HashedFeatureSpace):
+            feature_set.add(edge, feature_name, value)
+        elif is_training_mode:
+            super().add_to_feature_set(feature_set, is_training_mode, edge, feature_name, value)
+        else:
+            feature_index = feature_set.get(feature_name)
+            if feature_index is not None:
+                edge.features[feature_index] = value
+
+
+    def add_features(self, feature_set, is_training_mode, edge, features):
+        """
+        Add the features computed once for a whole sentence to the edge.
+
+        :param features: the feature values keyed by feature name, in the
+            order they were generated
+        :type features: dict
+        """
+        for feature_name, value in features.items():
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name, value)
+
+
+class StagedFeatureSet:
+    """
+    Training mode view of a feature set that records the new feature names a
+    generator adds, in first-seen order, without assigning their indices.
+
+    Until the names are registered in the real feature set, the edges are keyed
+    by the feature name itself instead of by the feature index.
+
+    :param feature_set: the feature set for the dataset
+    :type feature_set: nalaf.structures.data.FeatureDictionary
+    """
+    def __init__(self, feature_set):
+        self.feature_set = feature_set
+        """the real feature set, which is never modified"""
+        self.names = {}
+        """the new feature names in first-seen order (used as an ordered set)"""
+
+
+    def __contains__(self, feature_name):
+        return feature_name in self.feature_set or feature_name in self.names
+
+
+    def __getitem__(self, feature_name):
+        if feature_name in self.names:
+            return feature_name
+        return self.feature_set[feature_name]
+
+
+    def __setitem__(self, feature_name, feature_index):
+        self.names[feature_name] = None
+
+
+    def __len__(self):
+        return len(self.feature_set) + len(self.names)
+
+
+    def __iter__(self):
+        yield from self.feature_set
+        yield from self.names
+
+
+    def get(self, feature_name, default=None):
+        return self[feature_name] if feature_name in self else default
+
+
+    def keys(self):
+        return self
+
+
+class _FeatureIndexProbe:
+    """
+    Throwaway edge used to register a feature name through add_to_feature_set,
+    so that indices are assigned exactly as the generators themselves would.
+    """
+    def __init__(self):
+        self.features = {}
+
+
+def _count_features(dataset):
+    return sum(len(edge.features) for edge in dataset.edges())
+
+
+class FusedEdgeFeatureGenerator(EdgeFeatureGenerator):
+    """
+    Runs several edge feature generators in a single pass over the edges.
+
+    Each edge is visited once and dispatched to every PerEdgeFeatureGenerator
+    with a shared EdgeContext. Any other generator is run on its own, in its
+    position.
+
+    In training mode the feature indices are the same as if the generators were
+    run one after the other: every generator stages its new feature names and
+    these are registered in generator order once all edges have been visited.
+    A HashedFeatureSpace needs no registration, so it is used directly.
+
+    :param feature_generators: the generators to run, in order
+    :type feature_generators: list[nalaf.features.relations.EdgeFeatureGenerator]
+    :param profile: if given, the time, edges and features of every generator
+        are recorded in it
+    :type profile: relna.features.profiling.GeneratorProfile
+    :param skip: the indices of the generators not to run, e.g. those whose
+        feature groups are outside the budget of a compact model (see
+        relna.features.selection.skipped_generators)
+    :type skip: collections.Iterable[int]
+    """
+    def __init__(self, feature_generators, profile=None, skip=()):
+        self.feature_generators = list(feature_generators)
+        """the generators to run, in order"""
+        self.profile = profile
+        """the profile the generators are recorded in, None to not profile them"""
+        self.skip = set(skip)
+        """the indices of the generators not run"""
+        self.generator_groups = {index: set() for index in range(len(self.feature_generators))}
+        """generator index --> the feature groups of the feature names it registered in training"""
+        self.sentence_cache = SentenceFeatureCache()
+        """the cache of sentence-level results; its counters add up over runs"""
+
+
+    def generate(self, dataset, feature_set, is_training_mode):
+        if is_training_mode and not isinstance(feature_set, HashedFeatureSpace):
+            staged_sets = self.stage(dataset, feature_set)
+            self.register(feature_set, [[staged_set.names for staged_set in staged_sets]])
+            self.index_edges(dataset, feature_set)
+        else:
+            self.run(dataset, [feature_set] * len(self.feature_generators), is_training_mode)
+
+
+    def stage(self, dataset, feature_set):
+        """
+        Generate the training features of the dataset keyed by feature name.
+
+        :return: the staged feature set of each generator
+        :rtype: list[relna.features.engine.StagedFeatureSet]
+        """
+        staged_sets = [StagedFeatureSet(feature_set) for _ in self.feature_generators]
+        self.run(dataset, staged_sets, True)
+        return staged_sets
+
+
+    def run(self, dataset, feature_sets, is_training_mode):
+        """
+        Run every generator with its own feature set, fusing consecutive
+        PerEdgeFeatureGenerator's into a single pass over the edges.
+        """
+        self.sentence_cache.clear()
+        if self.profile is not None:
+            return self.run_profiled(dataset, feature_sets, is_training_mode)
+
+        for segment in self.segments():
+            if isinstance(self.feature_generators[segment[0]], PerEdgeFeatureGenerator):
+                generators = [(self.feature_generators[index], feature_sets[index]) for index in segment]
+                for edge in dataset.edges():
+                    context = EdgeContext(edge, self.sentence_cache)
+                    for generator, generator_feature_set in generators:
+                        generator.generate_edge(context, generator_feature_set, is_training_mode)
+            else:
+                index = segment[0]
+                self.feature_generators[index].generate(dataset, feature_sets[index], is_training_mode)
+
+
+    def run_profiled(self, dataset, feature_sets, is_training_mode):
+        """
+        Same as run, recording every generator call in the profile. The new
+        feature set entries are only known once registered (see register).
+        """
+        profile = self.profile
+        profile.runs += 1
+        profile.edges += sum(1 for _ in dataset.edges())
+        hits, misses = self.sentence_cache.hits, self.sentence_cache.misses
+        clock = time.perf_counter
+
+        for segment in self.segments():
+            if isinstance(self.feature_generators[segment[0]], PerEdgeFeatureGenerator):
+                generators = [(self.feature_generators[index], feature_sets[index],
+                               profile.generator(index, self.feature_generators[index])) for index in segment]
+                for edge in dataset.edges():
+                    context = EdgeContext(edge, self.sentence_cache)
+                    for generator, generator_feature_set, stats in generators:
+                        n_features = len(edge.features)
+                        start = clock()
+                        generator.generate_edge(context, generator_feature_set, is_training_mode)
+                        stats['seconds'] += clock() - start
+                        stats['edges'] += 1
+                        stats['features'] += len(edge.features) - n_features
+            else:
+                index = segment[0]
+                generator = self.feature_generators[index]
+                stats = profile.generator(index, generator)
+                n_features = _count_features(dataset)
+                start = clock()
+                generator.generate(dataset, feature_sets[index], is_training_mode)
+                stats['seconds'] += clock() - start
+                stats['edges'] += sum(1 for _ in dataset.edges())
+                stats['features'] += _count_features(dataset) - n_features
+
+        profile.sentence_cache['hits'] += self.sentence_cache.hits - hits
+        profile.sentence_cache['misses'] += self.sentence_cache.misses - misses
+
+
+    def segments(self):
+        """
+        :return: the indices of the generators to run grouped in runs of
+            PerEdgeFeatureGenerator's and single generators of any other kind
+        :rtype: list[list[int]]
+        """
+        segments = []
+        for index, generator in enumerate(self.feature_generators):
+            if index in self.skip:
+                continue
+            if isinstance(generator, PerEdgeFeatureGenerator) and segments and \
+                    isinstance(self.feature_generators[segments[-1][-1]], PerEdgeFeatureGenerator):
+                segments[-1].append(index)
+            else:
+                segments.append([index])
+        return segments
+
+
+    def register(self, feature_set, staged_runs):
+        """
+        Assign indices to the staged feature names, generator by generator and,
+        for each generator, run by run (e.g. one run per document shard).
+
+        :param staged_runs: for each run, the new feature names staged by each
+            generator in first-seen order (see StagedFeatureSet.names)
+        :type staged_runs: list[list[collections.Iterable[str]]]
+        """
+        probe = _FeatureIndexProbe()
+        for index in range(len(self.feature_generators)):
+            n_features = len(feature_set)
+            groups = self.generator_groups[index]
+            for staged_names in staged_runs:
+                for feature_name in staged_names[index]:
+                    groups.add(feature_group(feature_name))
+                    if feature_name not in feature_set:
+                        self.add_to_feature_set(feature_set, True, probe, feature_name)
+            if self.profile is not None:
+                self.profile.generator(index, self.feature_generators[index])['new_features'] += \
+                    len(feature_set) - n_features
+
+
+    def index_edges(self, dataset, feature_set):
+        """
+        Replace the feature names staged on the edges with their feature index.
+        """
+        for edge in dataset.edges():
+            staged_names = [key for key in edge.features if isinstance(key, str)]
+            for feature_name in staged_names:
+                edge.features[feature_set[feature_name]] = edge.features.pop(feature_name)
+
+
+class RawFeatureCache:
+    """
+    Raw features of the edges of a dataset, i.e. keyed by feature name instead
+    of feature index, generated only once and then indexed for any subset of its
+    documents, e.g. for the training and validation sets of every fold of a
+    cross-validation.
+
+    In training mode, the generators are run document by document staging the
+    new feature names of each generator (see StagedFeatureSet). For a subset of
+    the documents, these names are registered generator by generator and
+    document by document, which gives the same feature set and the same edge
+    features as running the generators on the subset itself.
+
+    Some generators only add features in training mode, so the prediction mode
+    features are generated separately, keeping all the feature names looked
+    up, and are filtered by the feature set when indexed.
+
+    With a HashedFeatureSpace there are no names to register: the hashed
+    features of the edges are cached as they are.
+
+    The documents must have been preprocessed (parsed and their edges
+    generated) before, and not be preprocessed again, as the cached features
+    are assigned to the edges by position.
+
+    :param engine: runs the feature generators
+    :type engine: relna.features.engine.FusedEdgeFeatureGenerator
+    :param feature_space: the hashed space to generate the features in, if the
+        models use one
+    :type feature_space: relna.features.hashing.HashedFeatureSpace
+    """
+    def __init__(self, engine, feature_space=None):
+        self.engine = engine
+        """runs the feature generators"""
+        self.feature_space = feature_space
+        """the hashed space the features are generated in, None to cache feature names"""
+        self.staged_names = {}
+        """document id --> the new feature names staged by each generator in training mode"""
+        self.features = {}
+        """(document id, is_training_mode) --> the raw features of each edge of the document"""
+
+
+    def fill(self, dataset, modes=(True, False)):
+        """
+        Generate the raw features of the documents of the dataset that are not
+        cached yet.
+
+        :param modes: the values of is_training_mode to generate the features for
+        :type modes: tuple[bool]
+        """
+        for is_training_mode in modes:
+            self.fill_mode(dataset, is_training_mode)
+
+
+    def fill_mode(self, dataset, is_training_mode):
+        """
+        Same as fill, for a single value of is_training_mode.
+        """
+        for doc_id, document in dataset.documents.items():
+            if (doc_id, is_training_mode) in self.features:
+                continue
+            single = _single_document_dataset(doc_id, document)
+            for edge in single.edges():
+                edge.features = {}
+
+            if self.feature_space is not None:
+                self.engine.run(single, [self.feature_space] * len(self.engine.feature_generators), is_training_mode)
+            elif is_training_mode:
+                self.staged_names[doc_id] = [list(staged_set.names) for staged_set in self.engine.stage(single, {})]
+            else:
+                self.engine.run(single, [_AllFeatureNames()] * len(self.engine.feature_generators), False)
+
+            self.features[(doc_id, is_training_mode)] = [edge.features for edge in single.edges()]
+            for edge in single.edges():
+                edge.features = {}
+
+
+    def apply(self, dataset, feature_set, is_training_mode):
+        """
+        Set the features of the edges of the dataset from the cache (filled
+        first if needed), as the generators would have in the given mode: in
+        training mode the new feature names are added to the feature set, in
+        prediction mode the ones not in it are left out.
+        """
+        self.fill(dataset, (is_training_mode,))
+
+        if is_training_mode and self.feature_space is None:
+            self.engine.register(feature_set, [self.staged_names[doc_id] for doc_id in dataset.documents])
+
+        for doc_id, document in dataset.documents.items():
+            edges = _single_document_dataset(doc_id, document).edges()
+            for edge, raw_features in zip(edges, self.features[(doc_id, is_training_mode)]):
+                if self.feature_space is not None:
+                    edge.features = dict(raw_features)
+                    continue
+                edge.features = {}
+                for feature_name, value in raw_features.items():
+                    feature_index = feature_set.get(feature_name)
+                    if feature_index is not None:
+                        edge.features[feature_index] = value
+
+
+class _AllFeatureNames:
+    """
+    Prediction mode feature set that contains every feature name, with the
+    name itself as index, so that the edges keep all the features looked up.
+    """
+    def __contains__(self, feature_name):
+        return True
+
+
+    def __getitem__(self, feature_name):
+        return feature_name
+
+
+    def get(self, feature_name, default=None):
+        return feature_name
+
+
+    def keys(self):
+        return self
+
+
+def _single_document_dataset(doc_id, document):
+    dataset = Dataset()
+    dataset.documents = OrderedDict([(doc_id, document)])
+    return dataset
@@ -0,0 +1,91 @@
+import weakref
+from bisect import bisect_left, bisect_right
+
+
+class PartEntityIndex:
+    """
+    Interval index of the entities of a part: Token.get_entity,
+    Token.is_entity_part and Token.masked_text scan all the annotations of the
+    part on every call, while the generators ask for the same tokens over and
+    over (every token of the sentence, for every edge of the sentence).
+
+    The offsets and end offsets of the annotations are sorted once, and the
+    entity of each interval between two consecutive of them is precomputed, so
+    that the entity of a token is found by bisecting its start offset. As with
+    Token.get_entity, the entity of a token is the first annotation of the part
+    that contains its start offset.
+
+    There is one index per part, obtained with PartEntityIndex.of(part). It is
+    rebuilt when the annotation list of the part is replaced or changes length,
+    which is cheap enough to check once per edge. Annotations edited in place
+    (moved or re-classed) are not detected: the feature generators build a new
+    index of every part on every run (see SentenceFeatureCache.entity_index),
+    otherwise call PartEntityIndex.build(part).
+
+    :param part: the part whose tokens are looked up
+    :type part: nalaf.structures.data.Part
+    """
+
+    _indices = weakref.WeakKeyDictionary()
+    """part --> its index; an index goes away with its part"""
+
+    def __init__(self, part):
+        self.annotations = part.annotations
+        """the annotation list of the part the index was built from"""
+        self.n_annotations = len(part.annotations)
+        """the number of annotations the index was built from"""
+        self.boundaries = sorted({offset for ann in part.annotations for offset in (ann.offset, ann.offset + len(ann.text))})
+        """the sorted start and end offsets of the annotations"""
+        self.interval_entities = [None] * len(self.boundaries)
+        """the entity of the interval from each boundary to the next one, or None"""
+
+        # the first annotation containing an interval wins, so they are laid from the last to the first
+        for ann in reversed(part.annotations):
+            first = bisect_left(self.boundaries, ann.offset)
+            last = bisect_left(self.boundaries, ann.offset + len(ann.text))
+            for interval in range(first, last):
+                self.interval_entities[interval] = ann
+
+
+    @classmethod
+    def of(cls, part):
+        """
+        :return: the index of the part, rebuilt if its annotation list was replaced or changed length
+        :rtype: relna.features.entities.PartEntityIndex
+        """
+        index = cls._indices.get(part)
+        if index is None or index.annotations is not part.annotations or index.n_annotations != len(part.annotations):
+            index = cls.build(part)
+        return index
+
+
+    @classmethod
+    def build(cls, part):
+        """
+        :return: a new index of the part, which replaces the one returned by of
+        :rtype: relna.features.entities.PartEntityIndex
+        """
+        index = cls._indices[part] = cls(part)
+        return index
+
+
+    def get_entity(self, token):
+        interval = bisect_right(self.boundaries, token.start) - 1
+        return self.interval_entities[interval] if interval >= 0 else None
+
+
+    def is_entity_part(self, token):
+        return self.get_entity(token) is not None
+
+
+    def masked_text(self, token):
+        entity = self.get_entity(token)
+        return token.word if entity is None else entity.class_id
+
+
+def entity_index(edge, context=None):
+    """
+    :return: the entity index of the edge's part, the one of the context if given
+    :rtype: relna.features.entities.PartEntityIndex
+    """
+    return context.entities if context is not None else PartEntityIndex.of(edge.same_part)
@@ -1,10 +1,12 @@
-from nalaf.features.relations import EdgeFeatureGenerator
+from relna.features.engine import PerEdgeFeatureGenerator
+from relna.features.hashing import feature_key
 from relna.features.relations import TokenFeatureGenerator
-from nltk.stem import PorterStemmer
+from relna.features.stemming import CachedPorterStemmer
+from relna.features.entities import entity_index
 import re
 
 
-class EntityHeadTokenFeatureGenerator(EdgeFeatureGenerator):
+class EntityHeadTokenFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Calculate the head token for each entity, using a simple heuristic - the
     distance to the root of the sentence.
@@ -19,49 +21,56 @@ class EntityHeadTokenFeatureGenerator(EdgeFeatureGenerator):
     :type training_mode: bool
     """
     def __init__(self):
-        self.stemmer = PorterStemmer()
-        """an instance of the PorterStemmer"""
-
-
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            entity1 = edge.entity1
-            entity2 = edge.entity2
-
-            self.named_entity_count('entity1_', entity1.class_id, edge, feature_set, is_training_mode)
-            self.named_entity_count('entity2_', entity2.class_id, edge, feature_set, is_training_mode)
-
-            entity1_stem = self.stemmer.stem(entity1.head_token.word)
-            entity1_non_stem = entity1.head_token.word[len(entity1_stem):]
-            entity2_stem = self.stemmer.stem(entity2.head_token.word)
-            entity2_non_stem = entity1.head_token.word[len(entity2_stem):]
-
-            feature_name_1_1 = '7_entity1_txt_' + entity1.head_token.word + '_[0]'
-            feature_name_2_1 = '7_entity2_txt_' + entity2.head_token.word + '_[0]'
-            feature_name_1_2 = '8_entity1_pos_' + entity1.head_token.features['pos'] + '_[0]'
-            feature_name_2_2 = '8_entity2_pos_' + entity2.head_token.features['pos'] + '_[0]'
-            feature_name_1_3 = '9_entity1_stem_' + entity1_stem + '_[0]'
-            feature_name_2_3 = '9_entity2_stem_' + entity2_stem + '_[0]'
-            feature_name_1_4 = '10_entity1_nonstem_' + entity1_non_stem + '_[0]'
-            feature_name_2_4 = '10_entity2_nonstem_' + entity2_non_stem + '_[0]'
-
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1_1)
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2_1)
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1_2)
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2_2)
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1_3)
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2_3)
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1_4)
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2_4)
-
-
-    def named_entity_count(self, prefix, entity_type, edge, feature_set, is_training_mode):
-        entities = edge.same_part.get_entities_in_sentence(edge.same_sentence_id, entity_type)
-        feature_name = '1_'+prefix+entity_type+'_count_['+str(len(entities))+']'
+        self.stemmer = CachedPorterStemmer()
+        """an instance of the cached PorterStemmer"""
+
+
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        entity1 = edge.entity1
+        entity2 = edge.entity2
+
+        self.named_entity_count('entity1_', entity1.class_id, edge, feature_set, is_training_mode, context)
+        self.named_entity_count('entity2_', entity2.class_id, edge, feature_set, is_training_mode, context)
+
+        entity1_stem = self.stemmer.stem(context.head1.word)
+        entity1_non_stem = context.head1.word[len(entity1_stem):]
+        entity2_stem = self.stemmer.stem(context.head2.word)
+        entity2_non_stem = context.head1.word[len(entity2_stem):]
+
+        feature_name_1_1 = feature_key(feature_set, '7_entity1_txt_{}_[0]', context.head1.word)
+        feature_name_2_1 = feature_key(feature_set, '7_entity2_txt_{}_[0]', context.head2.word)
+        feature_name_1_2 = feature_key(feature_set, '8_entity1_pos_{}_[0]', context.head1.features['pos'])
+        feature_name_2_2 = feature_key(feature_set, '8_entity2_pos_{}_[0]', context.head2.features['pos'])
+        feature_name_1_3 = feature_key(feature_set, '9_entity1_stem_{}_[0]', entity1_stem)
+        feature_name_2_3 = feature_key(feature_set, '9_entity2_stem_{}_[0]', entity2_stem)
+        feature_name_1_4 = feature_key(feature_set, '10_entity1_nonstem_{}_[0]', entity1_non_stem)
+        feature_name_2_4 = feature_key(feature_set, '10_entity2_nonstem_{}_[0]', entity2_non_stem)
+
+        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1_1)
+        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2_1)
+        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1_2)
+        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2_2)
+        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1_3)
+        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2_3)
+        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1_4)
+        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2_4)
+
+
+    def named_entity_count(self, prefix, entity_type, edge, feature_set, is_training_mode, context=None):
+        if context is not None:
+            count = context.sentence_features((self, entity_type), lambda: self.entity_count(entity_type, edge))
+        else:
+            count = self.entity_count(entity_type, edge)
+        feature_name = feature_key(feature_set, '1_{}{}_count_[{}]', prefix, entity_type, count)
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
 
 
-class EntityHeadTokenUpperCaseFeatureGenerator(EdgeFeatureGenerator):
+    def entity_count(self, entity_type, edge):
+        return len(edge.same_part.get_entities_in_sentence(edge.same_sentence_id, entity_type))
+
+
+class EntityHeadTokenUpperCaseFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Check if the head token for the entity has an upper case start
 
@@ -71,26 +80,26 @@ class EntityHeadTokenUpperCaseFeatureGenerator(EdgeFeatureGenerator):
         pass
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
+    def generate_edge(self, context, feature_set, is_training_mode):
         feature_name_1 = '11_entity1_upper_case_start_[0]'
         feature_name_2 = '11_entity2_upper_case_start_[0]'
         feature_name_3 = '12_entity1_upper_case_middle_[0]'
         feature_name_4 = '12_entity2_upper_case_middle_[0]'
-        for edge in dataset.edges():
-            head1 = edge.entity1.head_token
-            head2 = edge.entity2.head_token
-            if is_training_mode:
-                if head1.word[0].isupper():
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
-                if head2.word[0].isupper():
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
-                if not head1.word.isupper() and not head1.word.islower():
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_3)
-                if not head2.word.isupper() and not head2.word.islower():
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_4)
+        edge = context.edge
+        head1 = context.head1
+        head2 = context.head2
+        if is_training_mode:
+            if head1.word[0].isupper():
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
+            if head2.word[0].isupper():
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
+            if not head1.word.isupper() and not head1.word.islower():
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_3)
+            if not head2.word.isupper() and not head2.word.islower():
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_4)
 
 
-class EntityHeadTokenDigitsFeatureGenerator(EdgeFeatureGenerator):
+class EntityHeadTokenDigitsFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Checks if the head token for the entities in the edge contain a digit.
     If there is a digit, the corresponding feature value is set to 1
@@ -100,24 +109,24 @@ class EntityHeadTokenDigitsFeatureGenerator(EdgeFeatureGenerator):
         """search regular expression for presence of digits"""
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            head1 = edge.entity1.head_token
-            head2 = edge.entity2.head_token
-            feature_name_1 = '13_entity1_has_digits_[0]'
-            feature_name_2 = '13_entity2_has_digits_[0]'
-            feature_name_3 = '14_entity1_has_hyphenated_digits_[0]'
-            feature_name_4 = '14_entity2_has_hyphenated_digits_[0]'
-            if is_training_mode:
-                if self.contains_digits(head1):
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
-                    if self.contains_hyphenated_digits(head1):
-                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_3)
-
-                if self.contains_digits(head2):
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
-                    if self.contains_hyphenated_digits(head2):
-                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_4)
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        head1 = context.head1
+        head2 = context.head2
+        feature_name_1 = '13_entity1_has_digits_[0]'
+        feature_name_2 = '13_entity2_has_digits_[0]'
+        feature_name_3 = '14_entity1_has_hyphenated_digits_[0]'
+        feature_name_4 = '14_entity2_has_hyphenated_digits_[0]'
+        if is_training_mode:
+            if self.contains_digits(head1):
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
+                if self.contains_hyphenated_digits(head1):
+                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_3)
+
+            if self.contains_digits(head2):
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
+                if self.contains_hyphenated_digits(head2):
+                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_4)
 
     def contains_digits(self, token):
         return bool(self._digits.search(token.word))
@@ -129,7 +138,7 @@ class EntityHeadTokenDigitsFeatureGenerator(EdgeFeatureGenerator):
         return False
 
 
-class EntityHeadTokenLetterPrefixesFeatureGenerator(EdgeFeatureGenerator):
+class EntityHeadTokenLetterPrefixesFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Combines groups of 2 or 3 letters for each entity
     """
@@ -137,27 +146,27 @@ class EntityHeadTokenLetterPrefixesFeatureGenerator(EdgeFeatureGenerator):
         pass
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            head1 = edge.entity1.head_token
-            head2 = edge.entity2.head_token
-            for i in range(len(head1.word)):
-                if i>0:
-                    feature_name_1 = '15_entity1_dt_' + head1.word[i-1:i+1].lower() + '_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
-                if i>1:
-                    feature_name_2 = '16_entity2_tt_' + head1.word[i-2:i+1].lower() + '_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
-            for i in range(len(head2.word)):
-                if i>0:
-                    feature_name_1 = '15_entity2_dt_' + head2.word[i-1:i+1].lower() + '_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
-                if i>1:
-                    feature_name_2 = '16_entity2_tt_' + head2.word[i-2:i+1].lower() + '_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
-
-
-class EntityHeadTokenPunctuationFeatureGenerator(EdgeFeatureGenerator):
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        head1 = context.head1
+        head2 = context.head2
+        for i in range(len(head1.word)):
+            if i>0:
+                feature_name_1 = feature_key(feature_set, '15_entity1_dt_{}_[0]', head1.word[i-1:i+1].lower())
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
+            if i>1:
+                feature_name_2 = feature_key(feature_set, '16_entity2_tt_{}_[0]', head1.word[i-2:i+1].lower())
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
+        for i in range(len(head2.word)):
+            if i>0:
+                feature_name_1 = feature_key(feature_set, '15_entity2_dt_{}_[0]', head2.word[i-1:i+1].lower())
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
+            if i>1:
+                feature_name_2 = feature_key(feature_set, '16_entity2_tt_{}_[0]', head2.word[i-2:i+1].lower())
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
+
+
+class EntityHeadTokenPunctuationFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Check whether the entity head token has punctuations such as forward slash
     ('/') or hyphen ('-')
@@ -166,25 +175,25 @@ class EntityHeadTokenPunctuationFeatureGenerator(EdgeFeatureGenerator):
         pass
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
+    def generate_edge(self, context, feature_set, is_training_mode):
         feature_name_1 = '17_entity1_has_hyphen_[0]'
         feature_name_2 = '18_entity1_has_fslash_[0]'
         feature_name_3 = '17_entity2_has_hyphen_[0]'
         feature_name_4 = '18_entity2_has_fslash_[0]'
-        for edge in dataset.edges():
-            head1 = edge.entity1.head_token
-            head2 = edge.entity2.head_token
-            if head1.word.find('-')>=0:
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
-            if head1.word.find('/')>=0:
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
-            if head2.word.find('-')>=0:
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_3)
-            if head2.word.find('/')>=0:
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_4)
+        edge = context.edge
+        head1 = context.head1
+        head2 = context.head2
+        if head1.word.find('-')>=0:
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
+        if head1.word.find('/')>=0:
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
+        if head2.word.find('-')>=0:
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_3)
+        if head2.word.find('/')>=0:
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_4)
 
 
-class EntityHeadTokenChainFeatureGenerator(EdgeFeatureGenerator):
+class EntityHeadTokenChainFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Generate chains of dependencies from the token of a given depth
     """
@@ -192,69 +201,139 @@ class EntityHeadTokenChainFeatureGenerator(EdgeFeatureGenerator):
     def __init__(self, depth=3):
         self.depth = depth
         """the depth of the chain to generate"""
-        self.stemmer = PorterStemmer()
-        """an instance of the PorterStemmer"""
+        self.stemmer = CachedPorterStemmer()
+        """an instance of the cached PorterStemmer"""
         self.token_feature_generator = TokenFeatureGenerator()
         """an instance of TokenFeatureGenerator"""
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            head1 = edge.entity1.head_token
-            head2 = edge.entity2.head_token
-            self.build_chains(head1, edge.same_part.sentences[edge.same_sentence_id], edge, 'entity1_', '', self.depth, feature_set, is_training_mode)
-            self.build_chains(head2, edge.same_part.sentences[edge.same_sentence_id], edge, 'entity2_', '', self.depth, feature_set, is_training_mode)
-            self.build_token_features(edge, feature_set, is_training_mode)
-            self.entity_combination(edge, feature_set, is_training_mode)
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        for head, prefix in ((context.head1, 'entity1_'), (context.head2, 'entity2_')):
+            features = context.sentence_features((self, prefix, head.features['id']),
+                                                 lambda: self.chain_features(head, prefix, context, feature_set))
+            self.add_features(feature_set, is_training_mode, edge, features)
+        self.build_token_features(edge, feature_set, is_training_mode, context)
+        self.entity_combination(edge, feature_set, is_training_mode)
 
 
-    def build_token_features(self, edge, feature_set, is_training_mode):
+    def build_token_features(self, edge, feature_set, is_training_mode, context=None):
         sentence = edge.same_part.sentences[edge.same_sentence_id]
+        entities = entity_index(edge, context)
         for token in sentence:
-            if token.is_entity_part(edge.same_part):
-                if token.get_entity(edge.same_part)==edge.entity1:
-                    self.token_feature_generator.token_features(token, 'e1_', edge, feature_set, is_training_mode)
-                if token.get_entity(edge.same_part)==edge.entity2:
-                    self.token_feature_generator.token_features(token, 'e2_', edge, feature_set, is_training_mode)
+            if entities.is_entity_part(token):
+                if entities.get_entity(token)==edge.entity1:
+                    self.token_feature_generator.token_features(token, 'e1_', edge, feature_set, is_training_mode, context)
+                if entities.get_entity(token)==edge.entity2:
+                    self.token_feature_generator.token_features(token, 'e2_', edge, feature_set, is_training_mode, context)
 
 
-    def build_chains(self, token, sentence, edge, prefix, chain, depth_left, feature_set, is_training_mode):
+    def build_chains(self, token, sentence, edge, prefix, chain, depth_left, feature_set, is_training_mode, context=None):
         if depth_left==0:
             return
-        depth_string = 'dist_'+str(depth_left)+'_'
-        feature_name_1 = '19_'+prefix+'dep_'+depth_string+'from_'+token.features['dep']+'_[0]'
-        feature_name_2 = '20_'+prefix+'chain_dep_dist_'+str(depth_left)+'_'+chain+'-fw_'+token.features['dep']+'_[0]'
+        feature_name_1 = feature_key(feature_set, '19_{}dep_dist_{}_from_{}_[0]', prefix, depth_left, token.features['dep'])
+        feature_name_2 = feature_key(feature_set, '20_{}chain_dep_dist_{}_{}-fw_{}_[0]', prefix, depth_left, chain, token.features['dep'])
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
-        self.linear_order_features(prefix+depth_string, token.features['dependency_from'][0], edge, sentence, feature_set, is_training_mode)
-        self.build_chains(token.features['dependency_from'][0], sentence, edge, prefix, chain+'-fw', depth_left-1, feature_set, is_training_mode)
+        self.linear_order_features(prefix+'dist_'+str(depth_left)+'_', token.features['dependency_from'][0], edge, sentence, feature_set, is_training_mode, context)
+        self.build_chains(token.features['dependency_from'][0], sentence, edge, prefix, chain+'-fw', depth_left-1, feature_set, is_training_mode, context)
 
         for dependency in token.features['dependency_to']:
-            feature_name_1 = '21_'+prefix+'dep_dist_dist_'+str(depth_left)+'_to_'+dependency[1]+'_[0]'
-            feature_name_2 = '22_'+prefix+'chain_dep_dist_'+str(depth_left)+'_'+chain+'-rv_'+dependency[1]+'_[0]'
+            feature_name_1 = feature_key(feature_set, '21_{}dep_dist_dist_{}_to_{}_[0]', prefix, depth_left, dependency[1])
+            feature_name_2 = feature_key(feature_set, '22_{}chain_dep_dist_{}_{}-rv_{}_[0]', prefix, depth_left, chain, dependency[1])
             self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
             self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
-            self.linear_order_features(prefix+'dist_'+str(depth_left)+'_', dependency[0], edge, sentence, feature_set, is_training_mode)
-            self.build_chains(dependency[0], sentence, edge, prefix, chain+'-rv', depth_left-1, feature_set, is_training_mode)
-
-
-    def linear_order_features(self, prefix, token, edge, sentence, feature_set, is_training_mode):
-        feature_name_1 = '23_' + prefix + 'txt_' + token.word + '_[0]'
-        feature_name_2 = '24_' + prefix + 'pos_' + token.features['pos'] + '_[0]'
-        feature_name_3 = '25_' + prefix + 'given_[0]'
-        feature_name_4 = '26_' + prefix + 'txt_' + token.masked_text(edge.same_part) + '_[0]'
-        feature_name_5 = '27_' + prefix + 'ann_type_entity_[0]'
-        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
-        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
-        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_3)
-        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_4)
-        if token.is_entity_part(edge.same_part):
-            entity = token.get_entity(edge.same_part)
-            feature_name_6 = '28_' + prefix + 'ann_type_' + entity.class_id + '_[0]'
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_5)
-            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_6)
+            self.linear_order_features(prefix+'dist_'+str(depth_left)+'_', dependency[0], edge, sentence, feature_set, is_training_mode, context)
+            self.build_chains(dependency[0], sentence, edge, prefix, chain+'-rv', depth_left-1, feature_set, is_training_mode, context)
+
+
+    def chain_features(self, token, prefix, context, feature_set):
+        """
+        The features of the dependency chains of up to self.depth hops from the
+        (head) token, as generated by build_chains. They only depend on the
+        token and its sentence, so they are computed once per head token and
+        sentence.
+
+        The features of the neighbourhood of each token at each remaining depth
+        are built only once, as the same tokens are reached along many
+        branches: the keys of the chain features, which contain the path
+        (e.g. '-fw-rv'), are completed with the path of each branch at the end.
+        The features are in the same first-seen order as with build_chains.
+
+        :return: the feature keys (see relna.features.hashing.feature_key), with
+            value 1, in the order first generated
+        :rtype: dict
+        """
+        entities = context.entities
+        neighbourhoods = {}
+
+        def neighbourhood(token, depth_left):
+            """
+            :return: (feature key, None, None) for the chain independent features and
+                (dependency, path from token, key template) for the chain features, in walk order
+            :rtype: list[tuple]
+            """
+            key = (token.features['id'], depth_left)
+            if key in neighbourhoods:
+                return neighbourhoods[key]
+            dependencies = [(token.features['dependency_from'][0], '-fw', token.features['dep'],
+                             feature_key(feature_set, '19_{}dep_dist_{}_from_{}_[0]', prefix, depth_left, token.features['dep']),
+                             '20_{}chain_dep_dist_{}_{}-fw_{}_[0]')]
+            dependencies.extend((dependency[0], '-rv', dependency[1],
+                                 feature_key(feature_set, '21_{}dep_dist_dist_{}_to_{}_[0]', prefix, depth_left, dependency[1]),
+                                 '22_{}chain_dep_dist_{}_{}-rv_{}_[0]') for dependency in token.features['dependency_to'])
+
+            # as an ordered set: a repeated entry would not add a new feature
+            entries = {}
+            depth_prefix = prefix+'dist_'+str(depth_left)+'_'
+            for dependency_token, step, dependency, dependency_key, chain_template in dependencies:
+                entries[(dependency_key, None, None)] = None
+                entries[(dependency, '', chain_template)] = None
+                for feature_name in self.linear_order_names(depth_prefix, dependency_token, entities, feature_set):
+                    entries[(feature_name, None, None)] = None
+                if depth_left > 1:
+                    for name, chain, template in neighbourhood(dependency_token, depth_left-1):
+                        entries[(name, chain if chain is None else step + chain, template)] = None
+
+            neighbourhoods[key] = list(entries)
+            return neighbourhoods[key]
+
+        features = {}
+        if self.depth > 0:
+            for name, chain, template in neighbourhood(token, self.depth):
+                if chain is not None:
+                    # the chain reaches the token it ends at after one hop per step
+                    depth_left = self.depth - chain.count('-')
+                    name = feature_key(feature_set, template, prefix, depth_left, chain, name)
+                features[name] = 1
+        return features
+
+
+    def linear_order_features(self, prefix, token, edge, sentence, feature_set, is_training_mode, context=None):
+        for feature_name in self.linear_order_names(prefix, token, entity_index(edge, context), feature_set):
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+
+
+    def linear_order_names(self, prefix, token, entities, feature_set):
+        """
+        :type entities: relna.features.entities.PartEntityIndex
+        :return: the keys of the linear order features of the token, in order
+            (see relna.features.hashing.feature_key)
+        :rtype: list[str or tuple]
+        """
+        feature_names = [
+            feature_key(feature_set, '23_{}txt_{}_[0]', prefix, token.word),
+            feature_key(feature_set, '24_{}pos_{}_[0]', prefix, token.features['pos']),
+            feature_key(feature_set, '25_{}given_[0]', prefix),
+            feature_key(feature_set, '26_{}txt_{}_[0]', prefix, entities.masked_text(token)),
+        ]
+        if entities.is_entity_part(token):
+            entity = entities.get_entity(token)
+            feature_names.append(feature_key(feature_set, '27_{}ann_type_entity_[0]', prefix))
+            feature_names.append(feature_key(feature_set, '28_{}ann_type_{}_[0]', prefix, entity.class_id))
+        return feature_names
 
 
     def entity_combination(self, edge, feature_set, is_training_mode):
-        feature_name = '29_entity1_'+edge.entity1.class_id+'_entity2_'+edge.entity2.class_id+'_[0]'
+        feature_name = feature_key(feature_set, '29_entity1_{}_entity2_{}_[0]', edge.entity1.class_id, edge.entity2.class_id)
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
@@ -0,0 +1,115 @@
+import zlib
+
+
+def feature_key(feature_set, template, *parts):
+    """
+    The key of a feature whose name is the template formatted with the parts,
+    e.g. feature_key(feature_set, '57_dep_{}_{}_{}_[0]', style_gram, k, dep).
+
+    :return: the feature name for a feature dictionary, or the structured key
+        (template, parts) for a HashedFeatureSpace, which hashes it without
+        building the name
+    :rtype: str or tuple
+    """
+    if isinstance(feature_set, HashedFeatureSpace):
+        return template, parts
+    return template.format(*parts)
+
+
+class HashedFeatureSpace:
+    """
+    Feature set for the hashing trick: instead of growing a dictionary with one
+    index per feature name, every feature key is hashed into a fixed space of
+    2^bits indices (1 to 2^bits, as svmlight indices start at 1). A second,
+    independent bit of the hash gives the sign the value is multiplied with, so
+    that colliding features cancel out in expectation instead of adding up.
+
+    The space is stateless, so the same one is used for training and
+    prediction: a model trained with HashedFeatureSpace(bits) only needs the
+    same number of bits at prediction time, not a pickled feature set.
+
+    Besides feature names, the keys can be structured keys (template, parts), as
+    returned by feature_key: they are hashed part by part, so relna's
+    generators never build the feature name in hashed mode.
+
+    It can be passed wherever a feature set is expected: relna's generators
+    (PerEdgeFeatureGenerator) add signed values, any other generator sees a
+    feature set that already contains every key and adds unsigned values.
+
+    :param bits: the number of bits of the feature indices, at most 30
+    :type bits: int
+    """
+
+    def __init__(self, bits=18):
+        if not 1 <= bits <= 30:
+            raise ValueError('the number of bits must be between 1 and 30, got {}'.format(bits))
+        self.bits = bits
+        """the number of bits of the feature indices"""
+        self.mask = (1 << bits) - 1
+
+
+    def hash(self, key):
+        """
+        :param key: a feature name or a structured key (template, parts)
+        :type key: str or tuple
+        :return: the feature index (1 to 2^bits) and the sign (1 or -1) of the key
+        :rtype: (int, int)
+        """
+        if isinstance(key, tuple):
+            template, parts = key
+            digest = zlib.crc32(template.encode('utf-8'))
+            for part in parts:
+                digest = zlib.crc32(str(part).encode('utf-8'), zlib.crc32(b'\x1f', digest))
+        else:
+            digest = zlib.crc32(key.encode('utf-8'))
+        return (digest & self.mask) + 1, -1 if digest & 0x80000000 else 1
+
+
+    def add(self, edge, key, value=1):
+        """
+        Set the signed value of the feature on the edge. As with a feature
+        dictionary, setting the same key twice keeps the last value; so does a
+        collision of two different keys on the same edge.
+        """
+        index, sign = self.hash(key)
+        edge.features[index] = sign * value
+
+
+    def __getitem__(self, key):
+        return self.hash(key)[0]
+
+
+    def get(self, key, default=None):
+        return self.hash(key)[0]
+
+
+    def __contains__(self, key):
+        return True
+
+
+    def keys(self):
+        return self
+
+
+    def values(self):
+        """
+        :return: every feature index of the space
+        :rtype: range
+        """
+        return range(1, self.mask + 2)
+
+
+    def __len__(self):
+        return self.mask + 1
+
+
+    def __iter__(self):
+        raise TypeError('a HashedFeatureSpace does not keep the feature names')
+
+
+    def __setitem__(self, key, value):
+        raise TypeError('the indices of a HashedFeatureSpace cannot be assigned')
+
+
+    def __repr__(self):
+        return 'HashedFeatureSpace(bits={})'.format(self.bits)
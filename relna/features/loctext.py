@@ -1,7 +1,9 @@
-from nalaf.features.relations import EdgeFeatureGenerator
-from nalaf.utils.graph import get_path, build_walks
+from relna.features.engine import PerEdgeFeatureGenerator
+from relna.features.hashing import feature_key
+from nalaf.utils.graph import build_walks
+from relna.utils.graph import get_path
 
-class ProteinWordFeatureGenerator(EdgeFeatureGenerator):
+class ProteinWordFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Check for the presence of the word "protein" in the sentence. If the word
     "protein" is part of an entity, then it checks for dependencies from the
@@ -20,65 +22,63 @@ class ProteinWordFeatureGenerator(EdgeFeatureGenerator):
     """
     def __init__(self, graphs):
         self.graphs = graphs
-        """a dictionary of graphs to avoid recomputation of path"""
-
-
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            head1 = edge.entity1.head_token
-            head2 = edge.entity2.head_token
-            sentence = edge.same_part.sentences[edge.same_sentence_id]
-            protein_word_found = False
-            for token in sentence:
-                if token.is_entity_part(edge.same_part) and token.word.lower().find('protein') >= 0:
-                    protein_word_found = True
-                    token_from = token.features['dependency_from'][0]
-                    if token_from == head1:
-                        feature_name = '78_dependency_from_entity_to_protein_word_[0]'
+        """the dependency graphs of the sentences (see relna.utils.graph.get_path), to avoid recomputing the paths"""
+
+
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        head1 = context.head1
+        protein_word_found = False
+        for token in context.sentence:
+            if context.entities.is_entity_part(token) and token.word.lower().find('protein') >= 0:
+                protein_word_found = True
+                token_from = token.features['dependency_from'][0]
+                if token_from == head1:
+                    feature_name = '78_dependency_from_entity_to_protein_word_[0]'
+                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                for dependency_to in token.features['dependency_to']:
+                    token_to = dependency_to[0]
+                    if token_to == head1:
+                        feature_name = '79_dependency_from_protein_word_to_entity_[0]'
                         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                    for dependency_to in token.features['dependency_to']:
-                        token_to = dependency_to[0]
-                        if token_to == head1:
-                            feature_name = '79_dependency_from_protein_word_to_entity_[0]'
-                            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                        path = get_path(token, head1, edge.same_part, edge.same_sentence_id, self.graphs)
-                        if path == []:
-                            path = [token, head1]
-                        for tok in path:
-                            feature_name = '80_PWPE_bow_masked_'+tok.masked_text(edge.same_part)+'_[0]'
-                            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                            feature_name = '81_PWPE_pos_'+tok.features['pos']+'_[0]'
-                            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                            feature_name = '82_PWPE_bow_'+tok.word+'_[0]'
-                            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                        all_walks = build_walks(path)
-                        for dep_list in all_walks:
-                            dep_path = ''
-                            for dep in dep_list:
-                                feature_name = '83_'+'PWPE_dep_'+dep[1]+'_[0]'
-                                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                                dep_path += dep[1]
-                            feature_name = '84_PWPE_dep_full+'+dep_path+'_[0]'
-                            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                        for j in range(len(all_walks)):
-                            dir_grams = ''
-                            for i in range(len(path)-1):
-                                cur_walk = all_walks[j]
-                                if cur_walk[i][0] == path[i]:
-                                    dir_grams += 'F'
-                                else:
-                                    dir_grams += 'R'
-                            feature_name = '85_PWPE_dep_gram_'+dir_grams+'_[0]'
+                    path = get_path(token, head1, edge.same_part, edge.same_sentence_id, self.graphs)
+                    if path == []:
+                        path = [token, head1]
+                    for tok in path:
+                        feature_name = feature_key(feature_set, '80_PWPE_bow_masked_{}_[0]', context.entities.masked_text(tok))
+                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                        feature_name = feature_key(feature_set, '81_PWPE_pos_{}_[0]', tok.features['pos'])
+                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                        feature_name = feature_key(feature_set, '82_PWPE_bow_{}_[0]', tok.word)
+                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                    all_walks = build_walks(path)
+                    for dep_list in all_walks:
+                        dep_path = ''
+                        for dep in dep_list:
+                            feature_name = feature_key(feature_set, '83_PWPE_dep_{}_[0]', dep[1])
                             self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-            if protein_word_found:
-                feature_name = '86_protein_word_found_[0]'
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-            else:
-                feature_name = '87_protein_not_word_found_[0]'
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                            dep_path += dep[1]
+                        feature_name = feature_key(feature_set, '84_PWPE_dep_full+{}_[0]', dep_path)
+                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                    for j in range(len(all_walks)):
+                        dir_grams = ''
+                        for i in range(len(path)-1):
+                            cur_walk = all_walks[j]
+                            if cur_walk[i][0] == path[i]:
+                                dir_grams += 'F'
+                            else:
+                                dir_grams += 'R'
+                        feature_name = feature_key(feature_set, '85_PWPE_dep_gram_{}_[0]', dir_grams)
+                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+        if protein_word_found:
+            feature_name = '86_protein_word_found_[0]'
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+        else:
+            feature_name = '87_protein_not_word_found_[0]'
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
 
 
-class LocationWordFeatureGenerator(EdgeFeatureGenerator):
+class LocationWordFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Check each sentence for the presence of location words if the sentence
     contains an edge. These location words include ['location', 'localize'].
@@ -92,33 +92,40 @@ class LocationWordFeatureGenerator(EdgeFeatureGenerator):
         pass
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            location_word = False
-            if edge.entity1.class_id == 'e_1':
-                head1 = edge.entity1.head_token
-                head2 = edge.entity2.head_token
-            else:
-                head1 = edge.entity2.head_token
-                head2 = edge.entity1.head_token
-            sentence = edge.same_part.sentences[edge.same_sentence_id]
-            for token in sentence:
-                if not token.is_entity_part(edge.same_part) and \
-                    ('location' in token.word.lower() or \
-                    'localize' in token.word.lower()):
-                    location_word = True
-                    if head1.features['id']<token.features['id']<head2.features['id']:
-                        feature_name = '88_localize_word_in_between_[0]'
-                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-            if (location_word):
-                feature_name = '89_location_word_found_[0]'
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-            else:
-                feature_name = '90_location_word_not_found_[0]'
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        location_word = False
+        if edge.entity1.class_id == 'e_1':
+            head1 = context.head1
+            head2 = context.head2
+        else:
+            head1 = context.head2
+            head2 = context.head1
+        for token_id in context.sentence_features(self, lambda: self.location_word_ids(context)):
+            location_word = True
+            if head1.features['id']<token_id<head2.features['id']:
+                feature_name = '88_localize_word_in_between_[0]'
                 self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+        if (location_word):
+            feature_name = '89_location_word_found_[0]'
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+        else:
+            feature_name = '90_location_word_not_found_[0]'
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+
 
+    def location_word_ids(self, context):
+        """
+        :return: the ids of the tokens in the sentence that are location words
+            and not part of an entity
+        :rtype: list[int]
+        """
+        return [token.features['id'] for token in context.sentence
+                if not context.entities.is_entity_part(token) and
+                ('location' in token.word.lower() or 'localize' in token.word.lower())]
 
-class FoundInFeatureGenerator(EdgeFeatureGenerator):
+
+class FoundInFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Check for the presence of "found" and "in" in the sentence that contains
     the edge. The words must be present in that order and must be between the
@@ -133,21 +140,21 @@ class FoundInFeatureGenerator(EdgeFeatureGenerator):
         pass
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            found_word = False
-            in_word = False
-            if edge.entity1.class_id == 'e_1':
-                head1 = edge.entity1.head_token
-                head2 = edge.entity2.head_token
-            else:
-                head1 = edge.entity2.head_token
-                head2 = edge.entity1.head_token
-            for i in range(head1.features['id']+1, head2.features['id']):
-                if edge.same_part.sentences[edge.same_sentence_id][i].word.lower() == 'found':
-                    found_word = True
-                if edge.same_part.sentences[edge.same_sentence_id][i].word.lower() == 'in':
-                    in_word = True
-            if found_word and in_word:
-                feature_name = '91_found_in_[0]'
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        found_word = False
+        in_word = False
+        if edge.entity1.class_id == 'e_1':
+            head1 = context.head1
+            head2 = context.head2
+        else:
+            head1 = context.head2
+            head2 = context.head1
+        for i in range(head1.features['id']+1, head2.features['id']):
+            if context.sentence[i].word.lower() == 'found':
+                found_word = True
+            if context.sentence[i].word.lower() == 'in':
+                in_word = True
+        if found_word and in_word:
+            feature_name = '91_found_in_[0]'
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
@@ -1,6 +1,7 @@
-from nalaf.features.relations import EdgeFeatureGenerator
+from relna.features.engine import PerEdgeFeatureGenerator
+from relna.features.hashing import feature_key
 
-class BiGramFeatureGenerator(EdgeFeatureGenerator):
+class BiGramFeatureGenerator(PerEdgeFeatureGenerator):
     """
     For each edge, we consider all the intermediate tokens between the two
     entities. For all the tokens between the entities, we construct an n-gram
@@ -15,26 +16,27 @@ class BiGramFeatureGenerator(EdgeFeatureGenerator):
         pass
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            if edge.entity1.offset < edge.entity2.offset:
-                head1 = edge.entity1.head_token
-                head2 = edge.entity2.head_token
-            else:
-                head1 = edge.entity2.head_token
-                head2 = edge.entity1.head_token
-            for i in range(head1.features['id'], head2.features['id']):
-                token1 = edge.same_part.sentences[edge.same_sentence_id][i]
-                token2 = edge.same_part.sentences[edge.same_sentence_id][i+1]
-                feature_name = '92_bigram_'+token1.word+'_'+token2.word+'_[0]'
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                feature_name = '93_bigram_pos_'+token1.features['pos']+'_'+token2.features['pos']+'_[0]'
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                feature_name = '93_bigram_pos_'+token1.features['dep']+'_'+token2.features['dep']+'_[0]'
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        sentence = context.sentence
+        if edge.entity1.offset < edge.entity2.offset:
+            head1 = context.head1
+            head2 = context.head2
+        else:
+            head1 = context.head2
+            head2 = context.head1
+        for i in range(head1.features['id'], head2.features['id']):
+            token1 = sentence[i]
+            token2 = sentence[i+1]
+            feature_name = feature_key(feature_set, '92_bigram_{}_{}_[0]', token1.word, token2.word)
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+            feature_name = feature_key(feature_set, '93_bigram_pos_{}_{}_[0]', token1.features['pos'], token2.features['pos'])
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+            feature_name = feature_key(feature_set, '93_bigram_pos_{}_{}_[0]', token1.features['dep'], token2.features['dep'])
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
 
 
-class TriGramFeatureGenerator(EdgeFeatureGenerator):
+class TriGramFeatureGenerator(PerEdgeFeatureGenerator):
     """
     For each edge, we consider all the intermediate tokens between the two
     entities. For all the tokens between the entities, we construct an n-gram
@@ -49,22 +51,23 @@ class TriGramFeatureGenerator(EdgeFeatureGenerator):
         pass
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            if edge.entity1.offset < edge.entity2.offset:
-                head1 = edge.entity1.head_token
-                head2 = edge.entity2.head_token
-            else:
-                head1 = edge.entity2.head_token
-                head2 = edge.entity1.head_token
-            if head2.features['id']-head1.features['id']==2:
-                for i in range(head1.features['id'], head2.features['id']):
-                    token1 = edge.same_part.sentences[edge.same_sentence_id][i]
-                    token2 = edge.same_part.sentences[edge.same_sentence_id][i+1]
-                    token3 = edge.same_part.sentences[edge.same_sentence_id][i+2]
-                    feature_name = '92_trigram_'+token1.word+'_'+token2.word+'_'+token3.word+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                    feature_name = '93_trigram_pos_'+token1.features['pos']+'_'+token2.features['pos']+'_'+token3.features['pos']+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                    feature_name = '93_trigram_pos_'+token1.features['dep']+'_'+token2.features['dep']+'_'+token3.features['dep']+'_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        sentence = context.sentence
+        if edge.entity1.offset < edge.entity2.offset:
+            head1 = context.head1
+            head2 = context.head2
+        else:
+            head1 = context.head2
+            head2 = context.head1
+        if head2.features['id']-head1.features['id']==2:
+            for i in range(head1.features['id'], head2.features['id']):
+                token1 = sentence[i]
+                token2 = sentence[i+1]
+                token3 = sentence[i+2]
+                feature_name = feature_key(feature_set, '92_trigram_{}_{}_{}_[0]', token1.word, token2.word, token3.word)
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                feature_name = feature_key(feature_set, '93_trigram_pos_{}_{}_{}_[0]', token1.features['pos'], token2.features['pos'], token3.features['pos'])
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+                feature_name = feature_key(feature_set, '93_trigram_pos_{}_{}_{}_[0]', token1.features['dep'], token2.features['dep'], token3.features['dep'])
+                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
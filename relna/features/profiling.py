@@ -0,0 +1,96 @@
+import json
+
+
+class GeneratorProfile:
+    """
+    Opt-in instrumentation of the FusedEdgeFeatureGenerator runs: for each
+    generator, the wall time spent in it, the edges it visited, the features it
+    set on them and the new entries it created in the feature set, added up
+    over all the runs (e.g. over the chunks of a prediction or the folds of a
+    cross-validation).
+
+    The hits and misses of the sentence-level cache shared by the generators
+    (see relna.features.engine.SentenceFeatureCache) are added up as well.
+
+    With parallel feature generation the times of the workers are added up,
+    i.e. they are the total time spent in each generator, not the elapsed time.
+    """
+    def __init__(self):
+        self.runs = 0
+        """the number of runs (datasets) profiled"""
+        self.edges = 0
+        """the number of edges of all the runs"""
+        self.generators = {}
+        """generator index --> the statistics of the generator, as in report()"""
+        self.sentence_cache = {'hits': 0, 'misses': 0}
+        """the lookups of the sentence-level cache answered from it and computed"""
+
+
+    def generator(self, index, generator):
+        """
+        :return: the statistics of the generator at index, created if new
+        :rtype: dict
+        """
+        try:
+            return self.generators[index]
+        except KeyError:
+            stats = self.generators[index] = {
+                'index': index,
+                'name': type(generator).__name__,
+                'seconds': 0.0,
+                'edges': 0,
+                'features': 0,
+                'new_features': 0,
+            }
+            return stats
+
+
+    def merge(self, other):
+        """
+        Add the statistics of another profile of the same run, e.g. the one of
+        a worker process generating a shard of the dataset; its runs are not
+        counted again.
+
+        :type other: relna.features.profiling.GeneratorProfile
+        """
+        self.edges += other.edges
+        for key in ('hits', 'misses'):
+            self.sentence_cache[key] += other.sentence_cache[key]
+        for index, other_stats in other.generators.items():
+            stats = self.generators.setdefault(index, dict(other_stats, seconds=0.0, edges=0, features=0,
+                                                           new_features=0))
+            for key in ('seconds', 'edges', 'features', 'new_features'):
+                stats[key] += other_stats[key]
+
+
+    def report(self):
+        """
+        :return: the JSON serializable report of the profile, with the generators
+            in their order of execution
+        :rtype: dict
+        """
+        generators = []
+        for index in sorted(self.generators):
+            stats = dict(self.generators[index])
+            stats['edges_per_second'] = stats['edges'] / stats['seconds'] if stats['seconds'] else None
+            stats['features_per_edge'] = stats['features'] / stats['edges'] if stats['edges'] else 0.0
+            generators.append(stats)
+        lookups = self.sentence_cache['hits'] + self.sentence_cache['misses']
+        return {
+            'runs': self.runs,
+            'edges': self.edges,
+            'seconds': sum(stats['seconds'] for stats in generators),
+            'features': sum(stats['features'] for stats in generators),
+            'new_features': sum(stats['new_features'] for stats in generators),
+            'sentence_cache': dict(self.sentence_cache,
+                                   hit_rate=self.sentence_cache['hits'] / lookups if lookups else 0.0),
+            'generators': generators,
+        }
+
+
+    def write(self, path):
+        """
+        Write the report of the profile to path as JSON.
+        """
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
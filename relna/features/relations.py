@@ -1,6 +1,8 @@
 from nalaf.features.relations import EdgeFeatureGenerator
-from nltk.stem import PorterStemmer
-from math import log2
+from relna.features.stemming import CachedPorterStemmer
+from relna.features.hashing import feature_key
+from relna.features.selection import information_gain
+from relna.features.entities import PartEntityIndex, entity_index
 from operator import itemgetter
 
 
@@ -9,136 +11,69 @@ class TokenFeatureGenerator(EdgeFeatureGenerator):
     Token based features for each entity belonging to an edge
     """
     def __init__(self):
-        self.stemmer = PorterStemmer()
-        """an instance of the PorterStemmer()"""
+        self.stemmer = CachedPorterStemmer()
+        """an instance of the cached PorterStemmer"""
 
 
-    def token_features(self, token, prefix, edge, feature_set, is_training_mode):
-        feature_name_1 = '73_'+prefix+'txt_'+token.word+'_[0]'
+    def token_features(self, token, prefix, edge, feature_set, is_training_mode, context=None):
+        feature_name_1 = feature_key(feature_set, '73_{}txt_{}_[0]', prefix, token.word)
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_1)
-        feature_name_2 = '74_'+prefix+'pos_'+token.features['pos']+'_[0]'
+        feature_name_2 = feature_key(feature_set, '74_{}pos_{}_[0]', prefix, token.features['pos'])
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_2)
-        feature_name_3 = '75_'+prefix+'txt_'+token.masked_text(edge.same_part)+'_[0]'
+        masked_text = entity_index(edge, context).masked_text(token)
+        feature_name_3 = feature_key(feature_set, '75_{}txt_{}_[0]', prefix, masked_text)
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_3)
-        feature_name_4 = '76_'+prefix+'stem_'+self.stemmer.stem(token.masked_text(edge.same_part))+'_[0]'
+        feature_name_4 = feature_key(feature_set, '76_{}stem_{}_[0]', prefix, self.stemmer.stem(masked_text))
         self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_4)
-        ann_types = self.annotated_types(token, edge)
+        if context is None:
+            ann_types = self.annotated_types(token, edge)
+        else:
+            ann_types = context.annotated_types(token)
         for ann in ann_types:
-            feature_name_5 = '77_'+prefix+'ann_type_'+ann+'_[0]'
+            feature_name_5 = feature_key(feature_set, '77_{}ann_type_{}_[0]', prefix, ann)
             self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name_5)
 
 
     def annotated_types(self, token, edge):
-        head1 = edge.entity1.head_token
-        head2 = edge.entity2.head_token
-        if not token.is_entity_part(edge.same_part):
-            feature_name = 'no_ann_type'
-            return [feature_name]
-        else:
-            ann_types = []
-            if token.is_entity_part(edge.same_part):
-                entity = token.get_entity(edge.same_part)
-                feature_name_1 = entity.class_id
-                ann_types.append(feature_name_1)
-                if entity==edge.entity1:
-                    feature_name_2 = 'entity1_'+edge.entity1.class_id
-                    ann_types.append(feature_name_2)
-                    return ann_types
-                elif entity==edge.entity2:
-                    feature_name_2 = 'entity2_'+edge.entity2.class_id
-                    ann_types.append(feature_name_2)
-                    return ann_types
-                return ann_types
-
-
-def calculateInformationGain(feature_set, dataset, output_file):
-    number_pos_instances = 0
-    number_neg_instances = 0
-
-    for edge in dataset.edges():
-        if edge.real_target == 1:
-            number_pos_instances += 1
-        else:
-            number_neg_instances += 1
-
-    number_total_instances = number_pos_instances + number_neg_instances
-    percentage_pos_instances = number_pos_instances / number_total_instances
-    percentage_neg_instances = number_neg_instances / number_total_instances
-
-    first_ent_component = -1 * (percentage_pos_instances * log2(percentage_pos_instances) + percentage_neg_instances * log2(percentage_neg_instances))
-    feature_list = []
-    for key, value in feature_set.items():
-        feature_present_in_pos = 0
-        feature_present_in_neg = 0
-        feature_absent_in_pos = 0
-        feature_absent_in_neg = 0
-        total_feature_present = 0
-        total_feature_absent = 0
-
-        for edge in dataset.edges():
-            if edge.real_target == 1:
-                if value in edge.features.keys():
-                    feature_present_in_pos += 1
-                    total_feature_present += 1
-                else:
-                    feature_absent_in_pos += 1
-                    total_feature_absent +=1
-            if edge.real_target == -1:
-                if value in edge.features.keys():
-                    feature_present_in_neg += 1
-                    total_feature_present += 1
-                else:
-                    feature_absent_in_neg += 1
-                    total_feature_absent += 1
-
-        percentage_pos_given_feature = 0
-        percentage_neg_given_feature = 0
-        if (total_feature_present > 0):
-            percentage_pos_given_feature = feature_present_in_pos / total_feature_present
-            percentage_neg_given_feature = feature_present_in_neg / total_feature_present
+        return annotated_types(token, edge)
 
-        percentage_pos_given_feature_log = 0
-        percentage_neg_given_feature_log = 0
-        if percentage_pos_given_feature > 0:
-            percentage_pos_given_feature_log = log2(percentage_pos_given_feature)
-        if percentage_neg_given_feature > 0:
-            percentage_neg_given_feature_log = log2(percentage_neg_given_feature)
 
-        second_emp_component_factor = percentage_pos_given_feature * percentage_pos_given_feature_log + \
-                            percentage_neg_given_feature * percentage_neg_given_feature_log
-
-        percentage_feature_given_pos = feature_present_in_pos / number_pos_instances
-        percentage_feature_given_neg = feature_present_in_pos / number_neg_instances
-        percentage_feature = percentage_feature_given_pos * percentage_pos_instances + \
-                    percentage_feature_given_neg * percentage_neg_instances
-
-        second_ent_component = percentage_feature * second_emp_component_factor
-        percentage_pos_given_feature_component = 0
-        percentage_neg_given_feature_component = 0
-        if total_feature_absent>0:
-            percentage_pos_given_feature_component = feature_absent_in_pos / total_feature_absent
-            percentage_neg_given_feature_component = feature_absent_in_neg / total_feature_absent
-
-        percentage_pos_given_feature_component_log = 0
-        percentage_neg_given_feature_component_log = 0
-        if percentage_pos_given_feature_component>0:
-            percentage_pos_given_feature_component_log = log2(percentage_pos_given_feature_component)
-        if percentage_neg_given_feature_component>0:
-            percentage_neg_given_feature_component_log = log2(percentage_neg_given_feature_component)
-
-        third_component_multi_factor = percentage_pos_given_feature_component * percentage_pos_given_feature_component_log + \
-                percentage_neg_given_feature_component * percentage_neg_given_feature_component_log
-
-        percentage_feature_comp_given_pos = feature_absent_in_pos / number_pos_instances
-        percentage_feature_comp_given_neg = feature_absent_in_neg / number_neg_instances
-        percentage_feature_comp = percentage_feature_comp_given_pos * percentage_pos_instances + \
-                    percentage_feature_comp_given_neg * percentage_neg_instances
-
-        third_ent_component = percentage_feature_comp * third_component_multi_factor
-        entropy = first_ent_component + second_ent_component + third_ent_component
+def annotated_types(token, edge, entities=None):
+    """
+    The annotation types of a token with respect to an edge: 'no_ann_type' if
+    the token is not part of an entity, otherwise the class of the entity,
+    followed by whether it is entity1 or entity2 of the edge.
+
+    :type token: nalaf.structures.data.Token
+    :type edge: nalaf.structures.data.Edge
+    :param entities: the entity index of the edge's part
+    :type entities: relna.features.entities.PartEntityIndex
+    :rtype: list[str]
+    """
+    if entities is None:
+        entities = PartEntityIndex.of(edge.same_part)
+    if not entities.is_entity_part(token):
+        feature_name = 'no_ann_type'
+        return [feature_name]
+    else:
+        ann_types = []
+        if entities.is_entity_part(token):
+            entity = entities.get_entity(token)
+            feature_name_1 = entity.class_id
+            ann_types.append(feature_name_1)
+            if entity==edge.entity1:
+                feature_name_2 = 'entity1_'+edge.entity1.class_id
+                ann_types.append(feature_name_2)
+                return ann_types
+            elif entity==edge.entity2:
+                feature_name_2 = 'entity2_'+edge.entity2.class_id
+                ann_types.append(feature_name_2)
+                return ann_types
+            return ann_types
 
-        feature_list.append([key, value, entropy])
 
+def calculateInformationGain(feature_set, dataset):
+    feature_list = information_gain(feature_set, dataset)
     feature_list = sorted(feature_list, key=itemgetter(2), reverse=True)
 
     return feature_list
@@ -1,5 +1,8 @@
 import operator
 from math import log2
+import numpy as np
+from scipy.sparse import csr_matrix
+from relna.utils.matrices import edge_feature_matrix, edge_labels
 
 class FeatureSelection:
     """
@@ -13,126 +16,232 @@ class FeatureSelection:
         """the dataset"""
 
 
-    def select(self, nbest=55, group=True, mode='avgIG', feature_set):
-        features = {}
+    def select(self, feature_set, nbest=55, group=True, mode='avgIG'):
+        """
+        Select the features of the nbest feature groups with the highest average
+        information gain, or with group=False the nbest features with the
+        highest information gain.
+
+        :return: the selected features and their (unchanged) index
+        :rtype: dict
+        """
         feature_list = self.information_gain(feature_set)
-        counts, entropy = self.sum_across_generators(feature_list)
-        if group and mode=='avgIG':
-            averageIg = {}
-            for key in entropy.keys():
-                averageIg[key] = entropy[key] / counts[key]
-            sorted_avg_Ig = sorted(averageIg.items(), key=operator.itemgetter(1))
-            nbest_avg_Ig = []
-            for i in range(nbest):
-                item = sorted_avg_Ig[i]
-                nbest_avg_Ig.append(str(item[0]))
-            nbest_avg_Ig = tuple(nbest_avg_Ig)
-            for key, value in feature_set.items():
-                if key.startswith(nbest_avg_Ig):
-                    features[key] = value
-        return features
+        if group and mode == 'avgIG':
+            selected = select_features(feature_list, n_groups=nbest)
+        else:
+            selected = select_features(feature_list, n_features=nbest)
+        return {key: value for key, value in feature_set.items() if key in selected}
 
 
     def sum_across_generators(self, feature_list):
-        counts = {}
-        entropy = {}
-        for item in feature_list:
-            feature_name = item[0]
-            generator = int(feature_name.split('_')[0])
-            if generator not in counts.keys():
-                counts[generator] = 0
-            counts[generator]+=1
-            if generator not in entropy.keys():
-                entropy[generator] = 0
-            entropy[generator]+=1
-        return counts, entropy
+        return sum_across_groups(feature_list)
 
 
     def information_gain(self, feature_set):
-        number_pos_instances = 0
-        number_neg_instances = 0
-
-        for edge in self.dataset.edges():
-            if edge.real_target == 1:
-                number_pos_instances += 1
-            else:
-                number_neg_instances += 1
-
-        number_total_instances = number_pos_instances + number_neg_instances
-        percentage_pos_instances = number_pos_instances / number_total_instances
-        percentage_neg_instances = number_neg_instances / number_total_instances
-
-        first_ent_component = -1 * (percentage_pos_instances * log2(percentage_pos_instances) + percentage_neg_instances * log2(percentage_neg_instances))
-        feature_list = []
-        for key, value in feature_set.items():
-            feature_present_in_pos = 0
-            feature_present_in_neg = 0
-            feature_absent_in_pos = 0
-            feature_absent_in_neg = 0
-            total_feature_present = 0
-            total_feature_absent = 0
-
-            for edge in self.dataset.edges():
-                if edge.real_target == 1:
-                    if value in edge.features.keys():
-                        feature_present_in_pos += 1
-                        total_feature_present += 1
-                    else:
-                        feature_absent_in_pos += 1
-                        total_feature_absent +=1
-                if edge.real_target == -1:
-                    if value in edge.features.keys():
-                        feature_present_in_neg += 1
-                        total_feature_present += 1
-                    else:
-                        feature_absent_in_neg += 1
-                        total_feature_absent += 1
-
-            percentage_pos_given_feature = 0
-            percentage_neg_given_feature = 0
-            if (total_feature_present > 0):
-                percentage_pos_given_feature = feature_present_in_pos / total_feature_present
-                percentage_neg_given_feature = feature_present_in_neg / total_feature_present
-
-            percentage_pos_given_feature_log = 0
-            percentage_neg_given_feature_log = 0
-            if percentage_pos_given_feature > 0:
-                percentage_pos_given_feature_log = log2(percentage_pos_given_feature)
-            if percentage_neg_given_feature > 0:
-                percentage_neg_given_feature_log = log2(percentage_neg_given_feature)
-
-            second_emp_component_factor = percentage_pos_given_feature * percentage_pos_given_feature_log + \
-                                percentage_neg_given_feature * percentage_neg_given_feature_log
-
-            percentage_feature_given_pos = feature_present_in_pos / number_pos_instances
-            percentage_feature_given_neg = feature_present_in_pos / number_neg_instances
-            percentage_feature = percentage_feature_given_pos * percentage_pos_instances + \
-                        percentage_feature_given_neg * percentage_neg_instances
-
-            second_ent_component = percentage_feature * second_emp_component_factor
-            percentage_pos_given_feature_component = 0
-            percentage_neg_given_feature_component = 0
-            if total_feature_absent>0:
-                percentage_pos_given_feature_component = feature_absent_in_pos / total_feature_absent
-                percentage_neg_given_feature_component = feature_absent_in_neg / total_feature_absent
-
-            percentage_pos_given_feature_component_log = 0
-            percentage_neg_given_feature_component_log = 0
-            if percentage_pos_given_feature_component>0:
-                percentage_pos_given_feature_component_log = log2(percentage_pos_given_feature_component)
-            if percentage_neg_given_feature_component>0:
-                percentage_neg_given_feature_component_log = log2(percentage_neg_given_feature_component)
-
-            third_component_multi_factor = percentage_pos_given_feature_component * percentage_pos_given_feature_component_log + \
-                    percentage_neg_given_feature_component * percentage_neg_given_feature_component_log
-
-            percentage_feature_comp_given_pos = feature_absent_in_pos / number_pos_instances
-            percentage_feature_comp_given_neg = feature_absent_in_neg / number_neg_instances
-            percentage_feature_comp = percentage_feature_comp_given_pos * percentage_pos_instances + \
-                        percentage_feature_comp_given_neg * percentage_neg_instances
-
-            third_ent_component = percentage_feature_comp * third_component_multi_factor
-            entropy = first_ent_component + second_ent_component + third_ent_component
-
-            feature_list.append([key, value, entropy])
-        return feature_list
+        return information_gain(feature_set, self.dataset)
+
+
+def feature_group(feature_name):
+    """
+    :return: the feature group of a feature, the number its name starts with
+        (e.g. 23 for '23_txt_binds_[0]')
+    :rtype: int
+    """
+    return int(feature_name.split('_', 1)[0])
+
+
+def sum_across_groups(feature_list):
+    """
+    :param feature_list: [feature name, feature index, entropy] for every
+        feature, as returned by information_gain
+    :return: the number of features and the sum of their information gain
+        for each feature group
+    :rtype: (dict, dict)
+    """
+    counts = {}
+    entropy = {}
+    for feature_name, _, feature_entropy in feature_list:
+        group = feature_group(feature_name)
+        counts[group] = counts.get(group, 0) + 1
+        entropy[group] = entropy.get(group, 0) + feature_entropy
+    return counts, entropy
+
+
+def group_information_gain(feature_list):
+    """
+    :param feature_list: [feature name, feature index, entropy] for every
+        feature, as returned by information_gain
+    :return: feature group --> the average information gain of its features
+    :rtype: dict
+    """
+    counts, entropy = sum_across_groups(feature_list)
+    return {group: entropy[group] / counts[group] for group in counts}
+
+
+def select_features(feature_list, n_features=None, n_groups=None):
+    """
+    Select the features within a budget: the n_features with the highest
+    information gain and/or all the features of the n_groups feature groups
+    with the highest average information gain. Ties are broken by the order of
+    feature_list (i.e. of the feature set) and by group number.
+
+    :param feature_list: [feature name, feature index, entropy] for every
+        feature, as returned by information_gain
+    :return: the names of the selected features
+    :rtype: set
+    """
+    if n_groups is not None:
+        average_ig = group_information_gain(feature_list)
+        best_groups = set(sorted(average_ig, key=lambda group: (-average_ig[group], group))[:n_groups])
+        feature_list = [item for item in feature_list if feature_group(item[0]) in best_groups]
+
+    if n_features is not None:
+        feature_list = sorted(feature_list, key=operator.itemgetter(2), reverse=True)[:n_features]
+
+    return {item[0] for item in feature_list}
+
+
+def compact_feature_set(feature_set, feature_names):
+    """
+    Build a feature set of only the given features, with contiguous indices
+    starting at 1 (as assigned by add_to_feature_set) in the order of their
+    original index.
+
+    :type feature_names: collections.Container[str]
+    :return: the compact feature set and the mapping of the original indices of
+        the kept features to their new index
+    :rtype: (dict, dict)
+    """
+    kept = sorted((value, key) for key, value in feature_set.items() if key in feature_names)
+    compact_set = {}
+    index_map = {}
+    for new_index, (old_index, key) in enumerate(kept, start=1):
+        compact_set[key] = new_index
+        index_map[old_index] = new_index
+    return compact_set, index_map
+
+
+def compact_edge_features(edges, index_map):
+    """
+    Renumber the features of the edges to the indices of a compact feature set,
+    dropping those not kept in it.
+
+    :param index_map: original feature index --> new index, as returned by compact_feature_set
+    :type index_map: dict
+    """
+    for edge in edges:
+        edge.features = {index_map[index]: value for index, value in edge.features.items() if index in index_map}
+
+
+def skipped_generators(generator_groups, feature_groups):
+    """
+    :param generator_groups: generator index --> the feature groups it produced
+        in training (see FusedEdgeFeatureGenerator.generator_groups)
+    :type generator_groups: dict
+    :param feature_groups: the feature groups within the budget
+    :type feature_groups: collections.Container[int]
+    :return: the indices of the generators that produced no feature group
+        within the budget and so need not run
+    :rtype: list[int]
+    """
+    return sorted(index for index, groups in generator_groups.items()
+                  if not any(group in feature_groups for group in groups))
+
+
+def feature_class_counts(feature_set, dataset):
+    """
+    Count, for every feature of the feature set, in how many positive (real
+    target +1) and negative (real target -1) edges it is present, using column
+    sums of the sparse edge × feature matrix.
+
+    :return: the number of positive and negative edges containing each feature
+        index, the number of edges with real target +1 and -1, and the number
+        of edges whose real target is other than +1
+    :rtype: (numpy.ndarray, numpy.ndarray, int, int, int)
+    """
+    edges = list(dataset.edges())
+    n_columns = max(feature_set.values(), default=0) + 1
+    matrix = edge_feature_matrix(edges, n_columns)
+    presence = csr_matrix((np.ones_like(matrix.data), matrix.indices, matrix.indptr), shape=matrix.shape)
+    labels = edge_labels(edges)
+
+    present_in_pos = (labels == 1).astype(np.float64) @ presence
+    present_in_neg = (labels == -1).astype(np.float64) @ presence
+    return present_in_pos.astype(np.int64), present_in_neg.astype(np.int64), \
+        int((labels == 1).sum()), int((labels == -1).sum()), int((labels != 1).sum())
+
+
+def information_gain(feature_set, dataset):
+    """
+    Compute the information gain (as entropy) of every feature in the feature
+    set over the edges of the dataset.
+
+    :return: a list of [feature name, feature index, entropy] in the order of
+        the feature set
+    :rtype: list[list]
+    """
+    present_in_pos, present_in_neg, number_pos_instances, number_neg_edges, number_neg_instances = \
+        feature_class_counts(feature_set, dataset)
+
+    number_total_instances = number_pos_instances + number_neg_instances
+    percentage_pos_instances = number_pos_instances / number_total_instances
+    percentage_neg_instances = number_neg_instances / number_total_instances
+
+    first_ent_component = -1 * (percentage_pos_instances * log2(percentage_pos_instances) + percentage_neg_instances * log2(percentage_neg_instances))
+    feature_list = []
+    for key, value in feature_set.items():
+        feature_present_in_pos = int(present_in_pos[value])
+        feature_present_in_neg = int(present_in_neg[value])
+        feature_absent_in_pos = number_pos_instances - feature_present_in_pos
+        feature_absent_in_neg = number_neg_edges - feature_present_in_neg
+        total_feature_present = feature_present_in_pos + feature_present_in_neg
+        total_feature_absent = feature_absent_in_pos + feature_absent_in_neg
+
+        percentage_pos_given_feature = 0
+        percentage_neg_given_feature = 0
+        if (total_feature_present > 0):
+            percentage_pos_given_feature = feature_present_in_pos / total_feature_present
+            percentage_neg_given_feature = feature_present_in_neg / total_feature_present
+
+        percentage_pos_given_feature_log = 0
+        percentage_neg_given_feature_log = 0
+        if percentage_pos_given_feature > 0:
+            percentage_pos_given_feature_log = log2(percentage_pos_given_feature)
+        if percentage_neg_given_feature > 0:
+            percentage_neg_given_feature_log = log2(percentage_neg_given_feature)
+
+        second_emp_component_factor = percentage_pos_given_feature * percentage_pos_given_feature_log + \
+                            percentage_neg_given_feature * percentage_neg_given_feature_log
+
+        percentage_feature_given_pos = feature_present_in_pos / number_pos_instances
+        percentage_feature_given_neg = feature_present_in_pos / number_neg_instances
+        percentage_feature = percentage_feature_given_pos * percentage_pos_instances + \
+                    percentage_feature_given_neg * percentage_neg_instances
+
+        second_ent_component = percentage_feature * second_emp_component_factor
+        percentage_pos_given_feature_component = 0
+        percentage_neg_given_feature_component = 0
+        if total_feature_absent>0:
+            percentage_pos_given_feature_component = feature_absent_in_pos / total_feature_absent
+            percentage_neg_given_feature_component = feature_absent_in_neg / total_feature_absent
+
+        percentage_pos_given_feature_component_log = 0
+        percentage_neg_given_feature_component_log = 0
+        if percentage_pos_given_feature_component>0:
+            percentage_pos_given_feature_component_log = log2(percentage_pos_given_feature_component)
+        if percentage_neg_given_feature_component>0:
+            percentage_neg_given_feature_component_log = log2(percentage_neg_given_feature_component)
+
+        third_component_multi_factor = percentage_pos_given_feature_component * percentage_pos_given_feature_component_log + \
+                percentage_neg_given_feature_component * percentage_neg_given_feature_component_log
+
+        percentage_feature_comp_given_pos = feature_absent_in_pos / number_pos_instances
+        percentage_feature_comp_given_neg = feature_absent_in_neg / number_neg_instances
+        percentage_feature_comp = percentage_feature_comp_given_pos * percentage_pos_instances + \
+                    percentage_feature_comp_given_neg * percentage_neg_instances
+
+        third_ent_component = percentage_feature_comp * third_component_multi_factor
+        entropy = first_ent_component + second_ent_component + third_ent_component
+
+        feature_list.append([key, value, entropy])
+    return feature_list
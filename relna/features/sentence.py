@@ -1,10 +1,9 @@
-from nalaf.features.relations import EdgeFeatureGenerator
-from relna.features.relations import TokenFeatureGenerator
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
+from relna.features.engine import PerEdgeFeatureGenerator
+from relna.features.hashing import feature_key
+from relna.features.stemming import CachedPorterStemmer
 
 
-class BagOfWordsFeatureGenerator(EdgeFeatureGenerator):
+class BagOfWordsFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Generates Bag of Words representation for each sentence that contains an edge
 
@@ -14,30 +13,35 @@ class BagOfWordsFeatureGenerator(EdgeFeatureGenerator):
     """
     def __init__(self, stop_words=None):
         if stop_words is None:
+            from nltk.corpus import stopwords
             stop_words = stopwords.words('english')
         self.stop_words = stop_words
         """a list of stop words"""
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            sentence = edge.same_part.sentences[edge.same_sentence_id]
-            bow_map = {}
-            for token in sentence:
-                if token.word not in self.stop_words and not token.features['is_punct']:
-                    feature_name = '2_bow_text_' + token.word + '_[0]'
-                    self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
-                    if token.is_entity_part(edge.same_part):
-                        bow_string = 'ne_bow_' + token.word + '_[0]'
-                        if bow_string not in bow_map.keys():
-                            bow_map[bow_string] = 0
-                        bow_map[bow_string] = bow_map[bow_string]+1
-            for key, value in bow_map.items():
-                feature_name = '3_'+key
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name, value)
-
-
-class StemmedBagOfWordsFeatureGenerator(EdgeFeatureGenerator):
+    def generate_edge(self, context, feature_set, is_training_mode):
+        features = context.sentence_features(self, lambda: self.sentence_features(context, feature_set))
+        self.add_features(feature_set, is_training_mode, context.edge, features)
+
+
+    def sentence_features(self, context, feature_set):
+        features = {}
+        bow_map = {}
+        for token in context.sentence:
+            if token.word not in self.stop_words and not token.features['is_punct']:
+                feature_name = feature_key(feature_set, '2_bow_text_{}_[0]', token.word)
+                features[feature_name] = 1
+                if context.entities.is_entity_part(token):
+                    if token.word not in bow_map.keys():
+                        bow_map[token.word] = 0
+                    bow_map[token.word] = bow_map[token.word]+1
+        for word, value in bow_map.items():
+            feature_name = feature_key(feature_set, '3_ne_bow_{}_[0]', word)
+            features[feature_name] = value
+        return features
+
+
+class StemmedBagOfWordsFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Generates stemmed Bag of Words representation for each sentence that contains
     an edge, using the function given in the argument.
@@ -45,55 +49,58 @@ class StemmedBagOfWordsFeatureGenerator(EdgeFeatureGenerator):
     By default it uses Porter stemmer
 
     :type feature_set: nalaf.structures.data.FeatureDictionary
-    :type stemmer: nltk.stem.PorterStemmer
+    :type stemmer: relna.features.stemming.CachedPorterStemmer
     :type stop_words: list[str]
     :type is_training_mode: bool
     """
 
     def __init__(self, stop_words=[]):
-        self.stemmer = PorterStemmer()
-        """an instance of the PorterStemmer"""
+        self.stemmer = CachedPorterStemmer()
+        """an instance of the cached PorterStemmer"""
         self.stop_words = stop_words
         """a list of stop words"""
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            sentence = edge.same_part.sentences[edge.same_sentence_id]
+    def generate_edge(self, context, feature_set, is_training_mode):
+        if is_training_mode:
+            features = context.sentence_features(self, lambda: self.sentence_features(context, feature_set))
+            self.add_features(feature_set, is_training_mode, context.edge, features)
+
 
-            if is_training_mode:
-                for token in sentence:
-                    if self.stemmer.stem(token.word) not in self.stop_words and not token.features['is_punct']:
-                        feature_name = '4_bow_stem_' + self.stemmer.stem(token.word) + '_[0]'
-                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+    def sentence_features(self, context, feature_set):
+        features = {}
+        for token in context.sentence:
+            token_stem = self.stemmer.stem(token.word)
+            if token_stem not in self.stop_words and not token.features['is_punct']:
+                feature_name = feature_key(feature_set, '4_bow_stem_{}_[0]', token_stem)
+                features[feature_name] = 1
+        return features
 
 
-class SentenceFeatureGenerator(EdgeFeatureGenerator):
+class SentenceFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Generate features for each sentence containing an edge
     """
 
     def __init__(self):
-        self.token_feature_generator = TokenFeatureGenerator()
-        """an instance of TokenFeatureGenerator"""
-
-
-    def generate(self, dataset, feature_set, is_training_mode):
-        for edge in dataset.edges():
-            sentence = edge.same_part.sentences[edge.same_sentence_id]
-            text_count = {}
-            for token in sentence:
-                ann_types = self.token_feature_generator.annotated_types(token, edge)
-                for ann in ann_types:
-                    if ann not in text_count.keys():
-                        text_count[ann] = 0
-                    text_count[ann] = text_count[ann]+1
-            for key, value in text_count.items():
-                feature_name = '5_'+key+'_[0]'
-                self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name, value=value)
-
-
-class WordFilterFeatureGenerator(EdgeFeatureGenerator):
+        pass
+
+
+    def generate_edge(self, context, feature_set, is_training_mode):
+        edge = context.edge
+        text_count = {}
+        for token in context.sentence:
+            ann_types = context.annotated_types(token)
+            for ann in ann_types:
+                if ann not in text_count.keys():
+                    text_count[ann] = 0
+                text_count[ann] = text_count[ann]+1
+        for key, value in text_count.items():
+            feature_name = feature_key(feature_set, '5_{}_[0]', key)
+            self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name, value=value)
+
+
+class WordFilterFeatureGenerator(PerEdgeFeatureGenerator):
     """
     Checks if the sentence containing an edge contains any of the words
     given in the list.
@@ -111,23 +118,27 @@ class WordFilterFeatureGenerator(EdgeFeatureGenerator):
         """a list of words to check for their presence in the sentence"""
         self.stem = stem
         """whether the words in the sentence and the list should be stemmed"""
-        self.stemmer = PorterStemmer()
+        self.stemmer = CachedPorterStemmer()
+
+
+    def generate_edge(self, context, feature_set, is_training_mode):
+        features = context.sentence_features(self, lambda: self.sentence_features(context, feature_set))
+        self.add_features(feature_set, is_training_mode, context.edge, features)
 
 
-    def generate(self, dataset, feature_set, is_training_mode):
+    def sentence_features(self, context, feature_set):
+        features = {}
         if self.stem:
             stemmed_words = [self.stemmer.stem(word) for word in self.words]
-            for edge in dataset.edges():
-                sentence = edge.same_part.sentences[edge.same_sentence_id]
-                for token in sentence:
-                    if self.stemmer.stem(token.word) in stemmed_words:
-                        feature_name = '6_word_filter_stem_' + self.stemmer.stem(token.word) + '_[0]'
-                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+            for token in context.sentence:
+                token_stem = self.stemmer.stem(token.word)
+                if token_stem in stemmed_words:
+                    feature_name = feature_key(feature_set, '6_word_filter_stem_{}_[0]', token_stem)
+                    features[feature_name] = 1
 
         else:
-            for edge in dataset.edges():
-                sentence = edge.same_part.sentences[edge.same_sentence_id]
-                for token in sentence:
-                    if token.word in self.words:
-                        feature_name = '6_word_filter_' + token.word + '_[0]'
-                        self.add_to_feature_set(feature_set, is_training_mode, edge, feature_name)
+            for token in context.sentence:
+                if token.word in self.words:
+                    feature_name = feature_key(feature_set, '6_word_filter_{}_[0]', token.word)
+                    features[feature_name] = 1
+        return features
@@ -0,0 +1,50 @@
+from functools import lru_cache
+
+
+STEM_CACHE_SIZE = 2 ** 17
+"""the maximum number of words whose stem is kept, least recently used words are evicted first"""
+
+_PORTER_STEMMER = None
+"""the nltk PorterStemmer, created on the first use so that importing the feature modules does not import nltk"""
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word):
+    """
+    Porter stem of the word, memoized in a cache shared by the whole process.
+
+    :type word: str
+    :rtype: str
+    """
+    global _PORTER_STEMMER
+    if _PORTER_STEMMER is None:
+        from nltk.stem import PorterStemmer
+        _PORTER_STEMMER = PorterStemmer()
+    return _PORTER_STEMMER.stem(word)
+
+
+class CachedPorterStemmer:
+    """
+    Drop-in replacement for nltk.stem.PorterStemmer whose stems come from the
+    process-wide cache of relna.features.stemming.stem.
+
+    All the instances share the same cache, so a word is stemmed only once no
+    matter how many generators or edges ask for it.
+    """
+
+    def stem(self, word):
+        return stem(word)
+
+
+    @staticmethod
+    def cache_info():
+        """
+        :return: the hits, misses, maximum size and current size of the cache
+        :rtype: functools._CacheInfo
+        """
+        return stem.cache_info()
+
+
+    @staticmethod
+    def cache_clear():
+        stem.cache_clear()
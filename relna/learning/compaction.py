@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import pickle
+import shutil
+from relna.features.selection import information_gain, select_features, compact_feature_set, \
+    compact_edge_features, skipped_generators, feature_group
+
+
+BUDGET_FILE = 'budget.json'
+"""the name of the file, next to the feature set and model of a compact model, listing the generators it skips"""
+
+
+def compact(dataset, feature_set, n_features=None, n_groups=None, engine=None):
+    """
+    Shrink a trained feature set to a feature budget selected by information
+    gain over the edges of the dataset (see select_features), and renumber the
+    features of the edges of the dataset to the compact feature set, ready to
+    retrain on.
+
+    :param dataset: the training set, with the features of its edges generated with feature_set
+    :type dataset: nalaf.structures.data.Dataset
+    :param n_features: keep the n_features features with the highest information gain
+    :type n_features: int
+    :param n_groups: keep the features of the n_groups feature groups with the
+        highest average information gain
+    :type n_groups: int
+    :param engine: the engine that generated the features, to find the generators
+        whose feature groups are all outside the budget
+    :type engine: relna.features.engine.FusedEdgeFeatureGenerator
+    :return: the compact feature set, the mapping of the original feature indices to
+        the compact ones, and the indices of the generators of the engine that
+        need not run anymore
+    :rtype: (dict, dict, list[int])
+    """
+    selected = select_features(information_gain(feature_set, dataset), n_features=n_features, n_groups=n_groups)
+    compact_set, index_map = compact_feature_set(feature_set, selected)
+    compact_edge_features(dataset.edges(), index_map)
+
+    skip = []
+    if engine is not None:
+        skip = skipped_generators(engine.generator_groups, {feature_group(feature_name) for feature_name in compact_set})
+    return compact_set, index_map, skip
+
+
+def write_compact_model(output_dir, feature_set, model_path, skip):
+    """
+    Write a compact model as a directory with its pickled feature set
+    (features.pickle), its model (default_model) and the generators it skips
+    (budget.json), to predict with (e.g. relna.py --model_dir).
+    """
+    from nalaf.structures.data import FeatureDictionary
+
+    os.makedirs(output_dir, exist_ok=True)
+    feature_dictionary = FeatureDictionary()
+    for feature_name, feature_index in feature_set.items():
+        feature_dictionary[feature_name] = feature_index
+    with open(os.path.join(output_dir, 'features.pickle'), 'wb') as file:
+        pickle.dump(feature_dictionary, file)
+    shutil.copyfile(model_path, os.path.join(output_dir, 'default_model'))
+    with open(os.path.join(output_dir, BUDGET_FILE), 'w') as file:
+        json.dump({'skip_generators': list(skip),
+                   'feature_groups': sorted({feature_group(feature_name) for feature_name in feature_set})},
+                  file, indent=2)
+
+
+def read_skipped_generators(model_dir):
+    """
+    :return: the indices of the default feature generators a compact model skips,
+        none if the directory has no budget file
+    :rtype: list[int]
+    """
+    try:
+        with open(os.path.join(model_dir, BUDGET_FILE)) as file:
+            return json.load(file)['skip_generators']
+    except FileNotFoundError:
+        return []
+
+
+if __name__ == "__main__":
+    from nalaf.utils.readers import HTMLReader
+    from nalaf.utils.annotation_readers import AnnJsonAnnotationReader
+    from nalaf.structures.data import FeatureDictionary
+    from nalaf.structures.relation_pipelines import RelationExtractionPipeline
+    from nalaf.preprocessing.tokenizers import TmVarTokenizer
+    from relna.learning.taggers import RelnaRelationExtractor
+    from relna.learning.linear import LinearSVMLearner
+    from relna.utils import PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID
+
+    parser = argparse.ArgumentParser(description='Train a compact relna model on a feature budget selected by information gain')
+    parser.add_argument('corpus', help='the directory of the training documents (html) and their annotations (ann.json)')
+    parser.add_argument('output_dir', help='the directory to write the features.pickle, default_model and budget.json of the compact model to')
+    parser.add_argument('--features', type=int, help='keep the features with the highest information gain')
+    parser.add_argument('--groups', type=int, help='keep the feature groups with the highest average information gain')
+    parser.add_argument('--minority_class', type=int, default=1, choices=[-1, 1])
+    parser.add_argument('--majority_class_undersampling', type=float, default=0.4)
+    parser.add_argument('--c', type=float, default=0.5, help='the trade-off between training error and margin')
+    args = parser.parse_args()
+
+    if args.features is None and args.groups is None:
+        parser.error('give the budget with --features and/or --groups')
+
+    dataset = HTMLReader(args.corpus).read()
+    AnnJsonAnnotationReader(args.corpus, read_only_class_id=None, read_relations=True, delete_incomplete_docs=False,
+                            raise_exception_on_incosistencies=False).annotate(dataset)
+
+    engine = RelnaRelationExtractor.default_feature_generators(PRO_CLASS_ID, MUT_CLASS_ID, fused=True)[0]
+    pipeline = RelationExtractionPipeline(PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID, tokenizer=TmVarTokenizer(),
+                                          feature_set=FeatureDictionary(), feature_generators=[engine])
+    pipeline.execute(dataset, train=True)
+
+    feature_set, _, skip = compact(dataset, pipeline.feature_set, n_features=args.features, n_groups=args.groups, engine=engine)
+    print('kept {} of {} features, skipping {} of {} generators'.format(
+        len(feature_set), len(pipeline.feature_set), len(skip), len(engine.feature_generators)))
+
+    learner = LinearSVMLearner()
+    learner.learn(learner.create_input_file(dataset, 'train', feature_set, minority_class=args.minority_class,
+                                            majority_class_undersampling=args.majority_class_undersampling), c=args.c)
+    write_compact_model(args.output_dir, feature_set, learner.model_path, skip)
+    print('wrote the compact model to {}'.format(args.output_dir))
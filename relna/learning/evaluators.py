@@ -0,0 +1,137 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import random
+import shutil
+import tempfile
+import traceback
+from nalaf.learning.evaluators import Evaluations, EvaluationWithStandardError
+
+
+_SHARED_STATE = None
+"""the annotator generator, folds, evaluator and seed of the running cross-validation, inherited by the forked folds"""
+
+
+def _run_fold(fold_index, connection, tempdir):
+    """
+    Train and evaluate a single fold in a forked process, with tempdir as the
+    temporary and working directory, so that the svmlight instance, model and
+    prediction files of the folds do not clash.
+
+    Sends (the counts of the fold's evaluations, None) on the connection, or
+    (None, the formatted exception) if the fold failed. Only the counts are
+    sent, as EvaluationWithStandardError objects cannot be pickled.
+    """
+    annotator_gen_fun, folds, evaluator, seed = _SHARED_STATE
+    try:
+        tempfile.tempdir = tempdir
+        os.chdir(tempdir)
+        # otherwise every fold would draw the same undersampling from the inherited random state
+        random.seed(None if seed is None else seed + fold_index)
+
+        training_set, evaluation_set = folds[fold_index]
+        annotator_apply = annotator_gen_fun(training_set)
+        annotator_apply(evaluation_set)
+        evaluations = evaluator.evaluate(evaluation_set)
+        connection.send(({evaluations(label).label: dict(evaluations(label).dic_counts) for label in evaluations},
+                         None))
+    except BaseException:
+        connection.send((None, traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def cross_validate(annotator_gen_fun, corpus, evaluator, k_num_folds, use_validation_set=True, n_jobs=-1, seed=None):
+    """
+    Same as nalaf.learning.evaluators.Evaluations.cross_validate, but with the
+    folds trained and evaluated in parallel, each in its own forked process.
+
+    Each fold runs in its own temporary directory (also its working directory),
+    where the svmlight files are written, and which is deleted afterwards. The
+    evaluations of the folds are merged in fold order, as in the serial version.
+
+    Unlike the serial version, the predictions of a fold stay in its process:
+    the documents of the corpus are not annotated.
+
+    Requires the fork start method, which is the default on Linux.
+
+    :param annotator_gen_fun: trains on the training set of a fold and returns
+        the function annotating its evaluation set
+    :type annotator_gen_fun: callable
+    :type corpus: nalaf.structures.data.Dataset
+    :type evaluator: nalaf.learning.evaluators.Evaluator
+    :type k_num_folds: int
+    :param n_jobs: the number of folds run at the same time, all available cores if -1;
+        with 1, Evaluations.cross_validate is used
+    :type n_jobs: int
+    :param seed: if given, the random module is seeded with seed + the fold index in
+        each fold (e.g. for the undersampling), otherwise with fresh entropy
+    :type seed: int
+    :rtype: nalaf.learning.evaluators.Evaluations
+    """
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    if n_jobs <= 1:
+        return Evaluations.cross_validate(annotator_gen_fun, corpus, evaluator, k_num_folds,
+                                          use_validation_set=use_validation_set)
+
+    folds = list(corpus.cv_kfold_splits(k_num_folds, validation_set=use_validation_set))
+
+    global _SHARED_STATE
+    _SHARED_STATE = (annotator_gen_fun, folds, evaluator, seed)
+    try:
+        evaluations = _run_folds(len(folds), n_jobs)
+    finally:
+        _SHARED_STATE = None
+
+    return Evaluations.merge([evaluations[fold_index] for fold_index in range(len(folds))])
+
+
+def _run_folds(n_folds, n_jobs):
+    """
+    Run the folds of _SHARED_STATE, at most n_jobs at a time.
+
+    Plain processes are used rather than a pool, whose daemonic workers could
+    not start their own processes (e.g. for parallel feature generation).
+
+    :return: fold index --> the evaluations of the fold
+    :rtype: dict
+    """
+    context = multiprocessing.get_context('fork')
+    pending = list(range(n_folds))
+    running = {}  # result connection --> (fold index, process, temporary directory)
+    evaluations = {}
+    try:
+        while pending or running:
+            while pending and len(running) < n_jobs:
+                fold_index = pending.pop(0)
+                tempdir = tempfile.mkdtemp(prefix='relna_fold_{}_'.format(fold_index))
+                reader, writer = context.Pipe(duplex=False)
+                process = context.Process(target=_run_fold, args=(fold_index, writer, tempdir))
+                process.start()
+                writer.close()
+                running[reader] = (fold_index, process, tempdir)
+
+            for reader in multiprocessing.connection.wait(list(running)):
+                fold_index, process, tempdir = running.pop(reader)
+                try:
+                    counts, error = reader.recv()
+                except EOFError:
+                    counts, error = None, 'the process died without a result'
+                finally:
+                    reader.close()
+                    process.join()
+                    shutil.rmtree(tempdir, ignore_errors=True)
+
+                if error is not None:
+                    raise RuntimeError('fold {} failed (exit code {}):\n{}'.format(fold_index, process.exitcode, error))
+                evaluations[fold_index] = Evaluations()
+                for label, dic_counts in counts.items():
+                    evaluations[fold_index].add(EvaluationWithStandardError(label, dic_counts))
+    finally:
+        for reader, (_, process, tempdir) in running.items():
+            reader.close()
+            process.terminate()
+            process.join()
+            shutil.rmtree(tempdir, ignore_errors=True)
+
+    return evaluations
@@ -0,0 +1,245 @@
+import argparse
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from relna.learning.instances import document_fingerprint
+
+
+class FeatureStore:
+    """
+    Persistent store of the raw training features of documents, i.e. keyed by
+    feature name instead of feature index, one file per document keyed by the
+    hash of its contents (see document_fingerprint), so that retraining on a
+    grown or edited corpus only preprocesses and featurizes the documents that
+    are new or changed.
+
+    Each entry holds, as RawFeatureCache does in memory, the new feature names
+    staged by each generator on the document, the raw features of each of its
+    edges and their real targets. Registering the staged names document by
+    document gives the same feature set and edge features as generating the
+    features of the whole corpus in training mode.
+
+    The key does not cover the code of the preprocessing and of the feature
+    generators: change the salt (or empty the directory) when they change.
+    Entries of documents no longer in the corpus are kept, but not used.
+
+    :param directory: the directory of the store files, created if it does not exist
+    :type directory: str
+    :param salt: mixed into every key, e.g. a version of the feature generators
+    :type salt: str
+    """
+
+    def __init__(self, directory, salt=''):
+        self.directory = directory
+        """the directory of the store files"""
+        self.salt = salt
+        """mixed into every key"""
+        self.hits = 0
+        """the number of documents found in the store"""
+        self.misses = 0
+        """the number of documents featurized and added to the store"""
+        os.makedirs(directory, exist_ok=True)
+
+
+    def key(self, doc_id, document):
+        """
+        :return: the key of the stored features of the document
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+        for value in (self.salt, document_fingerprint(doc_id, document)):
+            digest.update(value.encode('utf-8'))
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+
+    def get(self, key):
+        """
+        :return: the staged feature names of each generator, the raw features of
+            each edge and the real target of each edge, or None if not stored
+        :rtype: dict
+        """
+        try:
+            with open(self.path(key), 'rb') as file:
+                return pickle.load(file)
+        except FileNotFoundError:
+            return None
+
+
+    def put(self, key, entry):
+        """
+        Store the entry of a document under key. The file is written under a
+        temporary name and then renamed, so that concurrent readers never see a
+        partial file.
+        """
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.pickle.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, self.path(key))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+
+    def update(self, dataset, engine, preprocess=None):
+        """
+        Featurize the documents of the dataset that are not stored yet, in
+        training mode, and store them.
+
+        :param engine: generates the features, with a feature dictionary (not hashed)
+        :type engine: relna.features.engine.FusedEdgeFeatureGenerator
+        :param preprocess: called with a dataset of only the documents to featurize,
+            to split, tokenize and parse them and to generate and label their edges
+        :type preprocess: callable
+        :return: the key of each document of the dataset, in order
+        :rtype: list[str]
+        """
+        keys = OrderedDict((doc_id, self.key(doc_id, document)) for doc_id, document in dataset.documents.items())
+        missing = [doc_id for doc_id, key in keys.items() if key not in self]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_documents = _subset(dataset, missing)
+            if preprocess is not None:
+                preprocess(new_documents)
+
+            for doc_id in missing:
+                single = _subset(dataset, [doc_id])
+                for edge in single.edges():
+                    edge.features = {}
+                staged_names = [list(staged_set.names) for staged_set in engine.stage(single, {})]
+                edges = list(single.edges())
+                self.put(keys[doc_id], {
+                    'staged_names': staged_names,
+                    'features': [edge.features for edge in edges],
+                    'labels': [edge.real_target for edge in edges],
+                })
+                for edge in edges:
+                    edge.features = {}
+
+        return list(keys.values())
+
+
+    def training_set(self, keys, feature_set, engine):
+        """
+        Register the stored feature names of the documents in the feature set,
+        as generating their features in training mode would, and return their
+        edges with the features indexed by it.
+
+        :param keys: the keys of the documents, in corpus order (as returned by update)
+        :type keys: list[str]
+        :type feature_set: nalaf.structures.data.FeatureDictionary
+        :type engine: relna.features.engine.FusedEdgeFeatureGenerator
+        :rtype: relna.learning.feature_store.StoredDataset
+        """
+        entries = []
+        for key in keys:
+            entry = self.get(key)
+            if entry is None:
+                raise KeyError('the document {} is not in the feature store {}'.format(key, self.directory))
+            entries.append(entry)
+
+        engine.register(feature_set, [entry['staged_names'] for entry in entries])
+
+        edges = []
+        for entry in entries:
+            for raw_features, label in zip(entry['features'], entry['labels']):
+                features = {}
+                for feature_name, value in raw_features.items():
+                    feature_index = feature_set.get(feature_name)
+                    if feature_index is not None:
+                        features[feature_index] = value
+                edges.append(StoredEdge(features, label))
+        return StoredDataset(edges)
+
+
+class StoredEdge:
+    """
+    An edge rebuilt from the feature store, with only what the learners read.
+    """
+    def __init__(self, features, real_target):
+        self.features = features
+        """feature index --> value"""
+        self.real_target = real_target
+        """the real target of the edge"""
+
+
+class StoredDataset:
+    """
+    The edges of the documents of a feature store, in corpus order, to pass to
+    the create_input_file of a learner (linear kernels only, as the parse
+    trees are not stored).
+    """
+    def __init__(self, edges):
+        self._edges = edges
+
+
+    def edges(self):
+        return iter(self._edges)
+
+
+def _subset(dataset, doc_ids):
+    subset = type(dataset)()
+    subset.documents = OrderedDict((doc_id, dataset.documents[doc_id]) for doc_id in doc_ids)
+    return subset
+
+
+if __name__ == "__main__":
+    from nalaf.utils.readers import HTMLReader
+    from nalaf.utils.annotation_readers import AnnJsonAnnotationReader
+    from nalaf.structures.data import FeatureDictionary
+    from nalaf.structures.relation_pipelines import RelationExtractionPipeline
+    from nalaf.preprocessing.tokenizers import TmVarTokenizer
+    from nalaf.learning.svmlight import SVMLightTreeKernels
+    from relna.learning.taggers import RelnaRelationExtractor
+    from relna.learning.linear import LinearSVMLearner
+    from relna.learning.compaction import write_compact_model
+    from relna.utils import PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID
+
+    parser = argparse.ArgumentParser(description='Train a relna model, featurizing only the documents not in the feature store yet')
+    parser.add_argument('corpus', help='the directory of the training documents (html) and their annotations (ann.json)')
+    parser.add_argument('store', help='the directory of the feature store, created if it does not exist')
+    parser.add_argument('output_dir', help='the directory to write the features.pickle and default_model of the model to')
+    parser.add_argument('--salt', default='', help='change it when the preprocessing or the feature generators change')
+    parser.add_argument('-c', '--svmlight_dir', help='train with the svm_learn executable in this directory instead of in-process')
+    parser.add_argument('--minority_class', type=int, default=1, choices=[-1, 1])
+    parser.add_argument('--majority_class_undersampling', type=float, default=0.4)
+    parser.add_argument('--c', type=float, default=0.5, help='the trade-off between training error and margin')
+    args = parser.parse_args()
+
+    dataset = HTMLReader(args.corpus).read()
+    AnnJsonAnnotationReader(args.corpus, read_only_class_id=None, read_relations=True, delete_incomplete_docs=False,
+                            raise_exception_on_incosistencies=False).annotate(dataset)
+
+    preprocessing = RelationExtractionPipeline(PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID, tokenizer=TmVarTokenizer())
+    preprocessing.feature_generators = []
+    engine = RelnaRelationExtractor.default_feature_generators(PRO_CLASS_ID, MUT_CLASS_ID, fused=True)[0]
+
+    store = FeatureStore(args.store, salt=args.salt)
+    keys = store.update(dataset, engine, preprocess=lambda documents: preprocessing.execute(documents, train=True))
+    print('{} documents from the feature store, {} featurized'.format(store.hits, store.misses))
+
+    feature_set = FeatureDictionary()
+    training_set = store.training_set(keys, feature_set, engine)
+
+    model_path = tempfile.NamedTemporaryFile().name
+    if args.svmlight_dir:
+        learner = SVMLightTreeKernels(model_path=model_path, svmlight_dir_path=args.svmlight_dir, use_tree_kernel=False)
+    else:
+        learner = LinearSVMLearner(model_path=model_path)
+    learner.learn(learner.create_input_file(training_set, 'train', feature_set, minority_class=args.minority_class,
+                                            majority_class_undersampling=args.majority_class_undersampling), c=args.c)
+    write_compact_model(args.output_dir, feature_set, learner.model_path, skip=[])
+    print('wrote the model ({} features) to {}'.format(len(feature_set), args.output_dir))
@@ -0,0 +1,203 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+from scipy.sparse import csr_matrix
+from relna.features.hashing import HashedFeatureSpace
+from relna.utils.feature_dictionary import MappedFeatureDictionary
+
+
+class InstanceCache:
+    """
+    Content-addressed cache of the instance matrices of datasets (the features
+    and real targets of their edges), stored as compressed NumPy archives of
+    the CSR arrays, one file per key (see instance_key).
+
+    A cached matrix replaces both the feature generation and the writing of the
+    svmlight instances file of a dataset already seen with the same feature set.
+
+    The key does not cover the code of the feature generators: change the salt
+    (or empty the directory) when they change.
+
+    :param directory: the directory of the cache files, created if it does not exist
+    :type directory: str
+    :param salt: mixed into every key, e.g. a version of the feature generators
+    :type salt: str
+    """
+
+    def __init__(self, directory, salt=''):
+        self.directory = directory
+        """the directory of the cache files"""
+        self.salt = salt
+        """mixed into every key"""
+        self.hits = 0
+        """the number of lookups of an existing entry"""
+        self.misses = 0
+        """the number of lookups of a missing entry"""
+        self.fingerprinted = (None, 0, None)
+        """the last feature set fingerprinted, its size and its fingerprint"""
+        os.makedirs(directory, exist_ok=True)
+
+
+    def key(self, dataset, feature_set, mode):
+        """
+        :return: the key of the instances of the dataset in the given mode ('train' or 'predict')
+        :rtype: str
+        """
+        return instance_key(dataset, feature_set, mode, self.salt, self.fingerprint(feature_set))
+
+
+    def fingerprint(self, feature_set):
+        """
+        :return: the fingerprint of the feature set, only computed again for
+            another feature set or if its size changed (feature sets only grow)
+        :rtype: str
+        """
+        fingerprinted_set, size, fingerprint = self.fingerprinted
+        if fingerprinted_set is not feature_set or size != len(feature_set):
+            fingerprint = feature_set_fingerprint(feature_set)
+            self.fingerprinted = (feature_set, len(feature_set), fingerprint)
+        return fingerprint
+
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+
+    def get(self, key):
+        """
+        :return: the matrix and the real targets of the edges, or None if not cached
+        :rtype: (scipy.sparse.csr_matrix, numpy.ndarray)
+        """
+        try:
+            with np.load(self.path(key)) as arrays:
+                matrix = csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=tuple(arrays['shape']))
+                labels = arrays['labels']
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return matrix, labels
+
+
+    def put(self, key, matrix, labels):
+        """
+        Store the matrix and the real targets of the edges under key. The file is
+        written under a temporary name and then renamed, so that concurrent
+        readers never see a partial file.
+        """
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.npz.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                np.savez_compressed(file, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                                    shape=np.array(matrix.shape), labels=labels)
+            os.replace(temporary_path, self.path(key))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+
+def instance_key(dataset, feature_set, mode, salt='', fingerprint=None):
+    """
+    :param fingerprint: the fingerprint of the feature set if already known
+    :type fingerprint: str
+    :return: the SHA-256 of the contents of the documents of the dataset, the
+        fingerprint of the feature set, the mode and the salt
+    :rtype: str
+    """
+    if fingerprint is None:
+        fingerprint = feature_set_fingerprint(feature_set)
+    digest = hashlib.sha256()
+    for value in (salt, mode, fingerprint, dataset_fingerprint(dataset)):
+        digest.update(value.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def dataset_fingerprint(dataset):
+    """
+    :return: the SHA-256 of the ids, texts and (gold and predicted) annotations
+        of the documents of the dataset, in order
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    for doc_id, document in dataset.documents.items():
+        _update_document_digest(digest, doc_id, document)
+    return digest.hexdigest()
+
+
+def document_fingerprint(doc_id, document):
+    """
+    :return: the SHA-256 of the id, text, (gold and predicted) annotations and
+        gold relations of the document, which determine its edges and their labels
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    _update_document_digest(digest, doc_id, document, relations=True)
+    return digest.hexdigest()
+
+
+def _update_document_digest(digest, doc_id, document, relations=False):
+    digest.update('\x1edocument\x1f{}'.format(doc_id).encode('utf-8'))
+    for part_id, part in document.parts.items():
+        digest.update('\x1epart\x1f{}\x1f{}'.format(part_id, part.text).encode('utf-8'))
+        for kind in ('annotations', 'predicted_annotations'):
+            for ann in getattr(part, kind, ()):
+                digest.update('\x1e{}\x1f{}\x1f{}\x1f{}'.format(kind, ann.class_id, ann.offset, ann.text)
+                              .encode('utf-8'))
+        if relations:
+            for relation in getattr(part, 'relations', ()):
+                digest.update('\x1erelation\x1f{}\x1f{}\x1f{}'.format(
+                    relation.class_id, relation.entity1.offset, relation.entity2.offset).encode('utf-8'))
+
+
+def feature_set_fingerprint(feature_set):
+    """
+    :return: a fingerprint of the feature names and indices of the feature set:
+        the number of bits of a HashedFeatureSpace, the SHA-256 of the file of a
+        MappedFeatureDictionary and of the items of any other feature set
+    :rtype: str
+    """
+    if isinstance(feature_set, HashedFeatureSpace):
+        return 'hashed:{}'.format(feature_set.bits)
+
+    digest = hashlib.sha256()
+    if isinstance(feature_set, MappedFeatureDictionary):
+        digest.update(feature_set.buffer)
+        return 'fdict:' + digest.hexdigest()
+
+    for feature_name, feature_index in feature_set.items():
+        digest.update('{}\x1f{}\x1e'.format(feature_name, feature_index).encode('utf-8'))
+    return 'dict:' + digest.hexdigest()
+
+
+def write_instances_file(matrix, labels, parse_trees=None):
+    """
+    Write the instances of a cached matrix as an svmlight instances file, as
+    SVMLightTreeKernels.create_input_file does from the edges in 'predict' mode.
+
+    :param parse_trees: the parse tree of the sentence of each edge, for tree kernels
+    :type parse_trees: list[str]
+    :return: the instances file, open and flushed
+    """
+    matrix = matrix.tocsr()
+    matrix.sort_indices()
+    instancesfile = tempfile.NamedTemporaryFile('w', delete=False)
+    for row, label in enumerate(labels):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        line = [str(label)]
+        if parse_trees is not None:
+            line.append('|BT| {} |ET|'.format(parse_trees[row]))
+        line.extend('{}:{}'.format(index, _format_value(value))
+                    for index, value in zip(matrix.indices[start:end], matrix.data[start:end]))
+        instancesfile.write(' '.join(line) + '\n')
+    instancesfile.flush()
+    return instancesfile
+
+
+def _format_value(value):
+    return str(int(value)) if value == int(value) else repr(float(value))
@@ -0,0 +1,332 @@
+import tempfile
+from random import random
+import numpy as np
+from relna.utils.matrices import edge_feature_matrix, edge_labels
+
+
+class LinearSVMScorer:
+    """
+    Classifies edges in-process with a linear SVM-light model, as an alternative
+    to writing an instances file and calling the svm_classify executable.
+
+    The model is read once into a dense weight vector w (indexed by feature
+    index) and the threshold b. The decision value of an edge with features x is
+    w·x - b, the same as computed by svm_classify for linear kernels.
+
+    :param model_path: the path to a model written by svm_learn with a linear
+        kernel (-t 0), e.g. relna/data/default_model
+    :type model_path: str
+    :param classification_threshold: edges with a decision value above it are
+        predicted as relations
+    :type classification_threshold: float
+    """
+
+    def __init__(self, model_path, classification_threshold=0.0):
+        self.model_path = model_path
+        """the path to the svmlight model"""
+        self.classification_threshold = classification_threshold
+        """edges with a decision value above it are predicted as relations"""
+        self.weights, self.bias = self.read_model(model_path)
+        """the weight of each feature index and the threshold b of the model"""
+
+
+    @staticmethod
+    def read_model(model_path):
+        """
+        Read an SVM-light (or SVM-light-TK) linear model and collapse its
+        support vectors into a single weight vector.
+
+        :return: the weight vector, with one position per feature index starting
+            at 0, and the threshold b
+        :rtype: (numpy.ndarray, float)
+        """
+        with open(model_path) as file:
+            header = {}
+            for line in file:
+                value, _, description = line.partition('#')
+                header[description.strip()] = value.strip()
+                if description.startswith(' threshold b'):
+                    break
+
+            if header['kernel type'] != '0':
+                raise ValueError('{} is not a linear model (kernel type {})'.format(model_path, header['kernel type']))
+
+            weights = np.zeros(int(header['highest feature index']) + 1)
+            bias = float(value)
+
+            for line in file:
+                tokens = line.split()
+                if not tokens:
+                    continue
+                alpha = float(tokens[0])
+                for token in tokens[1:]:
+                    if token.startswith('#') or token.startswith('|'):
+                        break
+                    index, feature_value = token.split(':')
+                    weights[int(index)] += alpha * float(feature_value)
+
+        return weights, bias
+
+
+    def decision_values(self, dataset):
+        """
+        Compute the decision value of all the edges in the dataset with a single
+        sparse dot product. Feature indices unknown to the model are ignored, as
+        svm_classify does.
+
+        :type dataset: nalaf.structures.data.Dataset
+        :return: the decision value of each edge, in the order of dataset.edges()
+        :rtype: numpy.ndarray
+        """
+        return self.matrix_decision_values(edge_feature_matrix(list(dataset.edges()), len(self.weights)))
+
+
+    def matrix_decision_values(self, matrix):
+        """
+        :param matrix: the features of the edges, one row per edge (e.g. from an
+            relna.learning.instances.InstanceCache); the columns beyond the
+            highest feature index of the model are ignored
+        :type matrix: scipy.sparse.csr_matrix
+        :return: the decision value of each row
+        :rtype: numpy.ndarray
+        """
+        n_columns = min(matrix.shape[1], len(self.weights))
+        return matrix[:, :n_columns].dot(self.weights[:n_columns]) - self.bias
+
+
+    def tag(self, dataset):
+        """
+        Set the predicted target of every edge in the dataset and form the
+        predicted relations, like SVMLightTreeKernels.read_predictions.
+
+        :type dataset: nalaf.structures.data.Dataset
+        """
+        return self.tag_with_scores(dataset, self.decision_values(dataset))
+
+
+    def tag_with_scores(self, dataset, scores):
+        """
+        Same as tag, with the decision values of the edges already computed.
+
+        :param scores: the decision value of each edge, in the order of dataset.edges()
+        :type scores: numpy.ndarray
+        """
+        for edge, score in zip(dataset.edges(), scores):
+            edge.pred_target = +1 if score > self.classification_threshold else -1
+        return dataset.form_predicted_relations()
+
+
+class SparseInstances:
+    """
+    In-memory counterpart of the svmlight instances file: the edges, their
+    feature matrix and their labels.
+
+    :type edges: list[nalaf.structures.data.Edge]
+    :type matrix: scipy.sparse.csr_matrix
+    :type labels: numpy.ndarray
+    """
+    def __init__(self, edges, matrix, labels):
+        self.edges = edges
+        """the edges, in the order of the rows"""
+        self.matrix = matrix
+        """row i holds the features of the i-th edge"""
+        self.labels = labels
+        """the real target of each edge, 0 if it has none"""
+
+
+class LinearSVMLearner:
+    """
+    Trains a linear SVM in-process, as an alternative to writing an instances
+    file and calling the svm_learn executable for the linear (non tree kernel)
+    configuration.
+
+    It has the interface of nalaf.learning.svmlight.SVMLightTreeKernels:
+    create_input_file builds the instances as a sparse matrix in memory, learn
+    trains the model and writes it in the SVM-light linear model format (so that
+    LinearSVMScorer, svm_classify and RelnaPredictor can load it), classify and
+    read_predictions predict with it.
+
+    The problem is the one of svm_learn -t 0 (hinge loss with cost c), solved
+    by dual coordinate descent (Hsieh et al., A Dual Coordinate Descent Method
+    for Large-scale Linear SVM, 2008). Unlike svm_learn, the threshold b is
+    learned as the weight of a constant feature and thus regularized too, so
+    the models are close to, not the same as, the ones of svm_learn.
+
+    :param model_path: the model (path) to write to, a temporary file by default
+    :type model_path: str
+    :param classification_threshold: edges with a decision value above it are
+        predicted as relations
+    :type classification_threshold: float
+    :param tolerance: the optimization stops when the projected gradients are
+        all within this range
+    :type tolerance: float
+    :param max_iterations: the maximum number of passes over the instances
+    :type max_iterations: int
+    :param seed: the seed of the order in which the instances are visited
+    :type seed: int
+    """
+
+    def __init__(self, model_path=None, classification_threshold=0.0, tolerance=0.1, max_iterations=1000, seed=0):
+        self.model_path = model_path if model_path is not None else tempfile.NamedTemporaryFile().name
+        """the model (path) to write to"""
+        self.classification_threshold = classification_threshold
+        """edges with a decision value above it are predicted as relations"""
+        self.tolerance = tolerance
+        """the optimization stops when the projected gradients are all within this range"""
+        self.max_iterations = max_iterations
+        """the maximum number of passes over the instances"""
+        self.seed = seed
+        """the seed of the order in which the instances are visited"""
+        self.weights = None
+        """the weight of each feature index of the trained model"""
+        self.bias = None
+        """the threshold b of the trained model"""
+
+
+    def create_input_file(self, dataset, mode, features, minority_class=None, majority_class_undersampling=1.0):
+        """
+        Same as SVMLightTreeKernels.create_input_file, in memory: in 'train'
+        mode, the edges of the majority class are undersampled with the same
+        calls to random.random, and only the feature indices of the feature set
+        are kept.
+
+        :rtype: relna.learning.linear.SparseInstances
+        """
+        edges = [edge for edge in dataset.edges()
+                 if mode != 'train' or minority_class is None or edge.real_target == minority_class or
+                 random() <= majority_class_undersampling]
+        feature_indices = features.values()
+        # the indices of a HashedFeatureSpace are a range, whose maximum is its last index
+        n_columns = (feature_indices[-1] if isinstance(feature_indices, range) else max(feature_indices, default=0)) + 1
+        return SparseInstances(edges, edge_feature_matrix(edges, n_columns), edge_labels(edges))
+
+
+    def learn(self, instances, c=None):
+        """
+        Train the model on the labeled (+1 or -1) instances and write it to model_path.
+
+        :type instances: relna.learning.linear.SparseInstances
+        :param c: the cost of the training errors, by default 1 / the average
+            squared norm of the instances, as in svm_learn
+        :type c: float
+        :return: the model path
+        :rtype: str
+        """
+        labeled = np.flatnonzero(np.abs(instances.labels) == 1)
+        matrix = instances.matrix[labeled]
+        labels = instances.labels[labeled].astype(np.float64)
+        squared_norms = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+        if c is None:
+            c = 1.0 / squared_norms.mean() if len(labeled) and squared_norms.mean() > 0 else 1.0
+
+        self.weights, self.bias = train_linear_svm(matrix, labels, squared_norms, c, self.tolerance,
+                                                   self.max_iterations, self.seed)
+        write_linear_model(self.model_path, self.weights, self.bias, len(labeled))
+        return self.model_path
+
+
+    def classify(self, instances):
+        """
+        :type instances: relna.learning.linear.SparseInstances
+        :return: the decision value of each instance
+        :rtype: numpy.ndarray
+        """
+        n_columns = min(instances.matrix.shape[1], len(self.weights))
+        return instances.matrix[:, :n_columns].dot(self.weights[:n_columns]) - self.bias
+
+
+    def read_predictions(self, dataset, predictions, classification_threshold=None):
+        """
+        Set the predicted target of every edge in the dataset from its decision
+        value and form the predicted relations, like
+        SVMLightTreeKernels.read_predictions.
+
+        :param predictions: the decision values returned by classify, in the order of dataset.edges()
+        :type predictions: numpy.ndarray
+        """
+        if classification_threshold is None:
+            classification_threshold = self.classification_threshold
+        for edge, score in zip(dataset.edges(), predictions):
+            edge.pred_target = +1 if score > classification_threshold else -1
+        return dataset.form_predicted_relations()
+
+
+def train_linear_svm(matrix, labels, squared_norms, c, tolerance=0.1, max_iterations=1000, seed=0):
+    """
+    Train a linear SVM with hinge loss by dual coordinate descent, with a
+    constant feature of value 1 for the threshold.
+
+    :param matrix: the instances, one per row
+    :type matrix: scipy.sparse.csr_matrix
+    :param labels: the label (+1 or -1) of each instance
+    :type labels: numpy.ndarray
+    :param squared_norms: the squared norm of each instance
+    :type squared_norms: numpy.ndarray
+    :param c: the cost of the training errors
+    :type c: float
+    :return: the weight vector w and the threshold b, the decision value of x being w·x - b
+    :rtype: (numpy.ndarray, float)
+    """
+    weights = np.zeros(matrix.shape[1])
+    bias_weight = 0.0
+    alphas = np.zeros(matrix.shape[0])
+    diagonal = squared_norms + 1.0
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+    rows = [(indices[indptr[i]:indptr[i + 1]], data[indptr[i]:indptr[i + 1]]) for i in range(matrix.shape[0])]
+    random_state = np.random.RandomState(seed)
+
+    for _ in range(max_iterations):
+        max_projected_gradient, min_projected_gradient = -np.inf, np.inf
+        for i in random_state.permutation(matrix.shape[0]):
+            row_indices, row_data = rows[i]
+            label = labels[i]
+            gradient = label * (row_data.dot(weights[row_indices]) + bias_weight) - 1.0
+
+            alpha = alphas[i]
+            if alpha == 0.0:
+                projected_gradient = min(gradient, 0.0)
+            elif alpha == c:
+                projected_gradient = max(gradient, 0.0)
+            else:
+                projected_gradient = gradient
+            max_projected_gradient = max(max_projected_gradient, projected_gradient)
+            min_projected_gradient = min(min_projected_gradient, projected_gradient)
+
+            if projected_gradient != 0.0:
+                alphas[i] = min(max(alpha - gradient / diagonal[i], 0.0), c)
+                step = (alphas[i] - alpha) * label
+                weights[row_indices] += step * row_data
+                bias_weight += step
+
+        if max_projected_gradient - min_projected_gradient <= tolerance:
+            break
+
+    return weights, -bias_weight
+
+
+def write_linear_model(model_path, weights, bias, n_instances):
+    """
+    Write a linear model as an SVM-light model with a single support vector
+    holding the weights, which svm_classify and LinearSVMScorer read as such.
+
+    :param weights: the weight of each feature index
+    :type weights: numpy.ndarray
+    :param bias: the threshold b
+    :type bias: float
+    :param n_instances: the number of training instances
+    :type n_instances: int
+    """
+    nonzero = np.flatnonzero(weights)
+    with open(model_path, 'w') as file:
+        file.write('SVM-light Version V6.02\n')
+        file.write('0 # kernel type\n')
+        file.write('3 # kernel parameter -d \n')
+        file.write('1 # kernel parameter -g \n')
+        file.write('1 # kernel parameter -s \n')
+        file.write('1 # kernel parameter -r \n')
+        file.write('empty# kernel parameter -u \n')
+        file.write('{} # highest feature index \n'.format(max(len(weights) - 1, 0)))
+        file.write('{} # number of training documents \n'.format(n_instances))
+        file.write('2 # number of support vectors plus 1 \n')
+        file.write('{!r} # threshold b, each following line is a SV (starting with alpha*y)\n'.format(float(bias)))
+        file.write('1 {} #\n'.format(' '.join('{}:{!r}'.format(index, float(weights[index])) for index in nonzero)))
@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from nalaf.learning.taggers import RelationExtractor
 from nalaf.utils.ncbi_utils import GNormPlus
 from relna.utils.swissprot_utils import Swissprot
@@ -5,23 +6,45 @@ from relna.utils.go_utils import GOTerms
 from nalaf.structures.data import Entity
 from relna.utils import MUT_CLASS_ID, PRO_CLASS_ID, ENTREZ_GENE_ID, UNIPROT_ID
 from nalaf.learning.taggers import Tagger
-from relna.features.context import *
-from relna.features.entityhead import *
-from relna.features.loctext import *
-from relna.features.path import *
-from relna.features.sentence import *
-from nalaf.features.relations.sentence import NamedEntityCountFeatureGenerator
-from relna.features.ngrams import *
 
 
 class RelnaRelationExtractor(RelationExtractor):
 
     @staticmethod
-    def default_feature_generators(class1, class2, graphs=None):
+    def default_feature_generators(class1, class2, graphs=None, fused=False, profile=None, skip=()):
+        """
+        :param fused: if True, the generators are returned wrapped in a single
+            FusedEdgeFeatureGenerator, which visits each edge only once for all
+            of them and produces the same features; otherwise the plain list of
+            the generators is returned
+        :type fused: bool
+        :param profile: if given (and fused), the time and features of every
+            generator are recorded in it
+        :type profile: relna.features.profiling.GeneratorProfile
+        :param skip: the indices of the generators not to run (if fused), e.g. those
+            of a compact model (see relna.learning.compaction)
+        :type skip: collections.Iterable[int]
+        """
+        # imported here rather than at module level, so that importing the taggers
+        # (e.g. just for TranscriptionFactorTagger) does not load the feature modules
+        from relna.features.context import LinearContextFeatureGenerator, EntityOrderFeatureGenerator, \
+            LinearDistanceFeatureGenerator, IntermediateTokensFeatureGenerator
+        from relna.features.entityhead import EntityHeadTokenFeatureGenerator, \
+            EntityHeadTokenUpperCaseFeatureGenerator, EntityHeadTokenDigitsFeatureGenerator, \
+            EntityHeadTokenLetterPrefixesFeatureGenerator, EntityHeadTokenPunctuationFeatureGenerator, \
+            EntityHeadTokenChainFeatureGenerator
+        from relna.features.loctext import ProteinWordFeatureGenerator, LocationWordFeatureGenerator, \
+            FoundInFeatureGenerator
+        from relna.features.path import PathFeatureGenerator
+        from relna.features.sentence import BagOfWordsFeatureGenerator, StemmedBagOfWordsFeatureGenerator, \
+            SentenceFeatureGenerator, WordFilterFeatureGenerator
+        from nalaf.features.relations.sentence import NamedEntityCountFeatureGenerator
+        from relna.features.ngrams import BiGramFeatureGenerator, TriGramFeatureGenerator
+        from relna.features.engine import FusedEdgeFeatureGenerator
 
         GRAPHS_CLOSURE_VARIABLE = {} if graphs is None else graphs
 
-        return [
+        feature_generators = [
             NamedEntityCountFeatureGenerator(class1, prefix=107),
             NamedEntityCountFeatureGenerator(class2, prefix=108),
             BagOfWordsFeatureGenerator(),
@@ -46,17 +69,71 @@ class RelnaRelationExtractor(RelationExtractor):
             TriGramFeatureGenerator(),
         ]
 
+        if fused:
+            return [FusedEdgeFeatureGenerator(feature_generators, profile=profile, skip=skip)]
+        return feature_generators
 
-    def __init__(self, entity1_class, entity2_class, rel_type, svmlight):
+
+    def __init__(self, entity1_class, entity2_class, rel_type, svmlight=None, scorer=None, instance_cache=None):
         super().__init__(entity1_class, entity2_class, rel_type)
         self.svmlight = svmlight
         """an instance of SVMLightTreeKernels"""
+        self.scorer = scorer
+        """an instance of LinearSVMScorer, used instead of svmlight if given"""
+        self.instance_cache = instance_cache
+        """an instance of relna.learning.instances.InstanceCache, to reuse the instances of already seen datasets"""
+
+
+    def has_cached_instances(self, dataset, feature_set):
+        """
+        :return: whether the instances of the dataset are cached, in which case
+            its features need not be generated before tagging it
+        :rtype: bool
+        """
+        return self.instance_cache is not None and \
+            self.instance_cache.key(dataset, feature_set, 'predict') in self.instance_cache
 
 
     def tag(self, dataset, feature_set):
-        self.svmlight.create_input_file(dataset, 'predict', feature_set)
-        self.svmlight.tag()
-        self.svmlight.read_predictions(dataset)
+        if self.instance_cache is not None:
+            self.tag_cached(dataset, feature_set)
+        elif self.scorer is not None:
+            self.scorer.tag(dataset)
+        else:
+            instancesfile = self.svmlight.create_input_file(dataset, 'predict', feature_set)
+            predictionsfile = self.svmlight.classify(instancesfile)
+            self.svmlight.read_predictions(dataset, predictionsfile)
+
+
+    def tag_cached(self, dataset, feature_set):
+        """
+        Tag the dataset with its instances from the instance cache, which are
+        built from the features of its edges and stored if not cached yet.
+        """
+        from relna.learning.instances import write_instances_file
+        from relna.utils.matrices import edge_feature_matrix, edge_labels
+
+        edges = list(dataset.edges())
+        key = self.instance_cache.key(dataset, feature_set, 'predict')
+        cached = self.instance_cache.get(key)
+        if cached is None:
+            matrix, labels = edge_feature_matrix(edges), edge_labels(edges)
+            self.instance_cache.put(key, matrix, labels)
+        else:
+            matrix, labels = cached
+            if matrix.shape[0] != len(edges):
+                raise ValueError('the cached instances of the dataset have {} edges instead of {}, '
+                                 'the edge generation changed: empty the instance cache'.format(matrix.shape[0], len(edges)))
+
+        if self.scorer is not None:
+            self.scorer.tag_with_scores(dataset, self.scorer.matrix_decision_values(matrix))
+        else:
+            parse_trees = None
+            if self.svmlight.use_tree_kernel:
+                parse_trees = [edge.same_part.sentence_parse_trees[edge.same_sentence_id] for edge in edges]
+            instancesfile = write_instances_file(matrix, labels, parse_trees=parse_trees)
+            predictionsfile = self.svmlight.classify(instancesfile)
+            self.svmlight.read_predictions(dataset, predictionsfile)
 
 
 class TranscriptionFactorTagger(Tagger):
@@ -64,74 +141,110 @@ class TranscriptionFactorTagger(Tagger):
     Performs tagging for transcription factors in text, using GNormPlus and
     GO Term GO:0003700 or its descendents as the key. Any protein that has this
     GO Term will be automatically tagged as a transcription factor.
+
+    :param goterms: the file with the GO terms of transcription factors (e.g. relna/data/goose.dat)
+    :type goterms: str
+    :param go_index: the directory of an offline GO index (see relna.utils.go_index);
+        if given, the GO terms of the proteins are not downloaded from Uniprot
+    :type go_index: str
     """
-    def __init__(self, goterms):
+    def __init__(self, goterms, go_index=None):
         super().__init__([ENTREZ_GENE_ID, UNIPROT_ID])
         self.transfac_go_terms = self.read_go_terms(goterms)
+        self.go_index = go_index
 
     def tag(self, dataset, annotated=False, uniprot=False):
         """
+        Tags the dataset in three phases: the genes of all the documents are
+        found first, then all the distinct gene and protein ids of the dataset
+        are normalized at once and finally the annotations are placed.
+
         :type dataset: nalaf.structures.data.Dataset
         :param annotated: if True then saved into annotations otherwise into predicted_annotations
         """
         with GNormPlus() as gnorm:
-            for docid, doc in dataset.documents.items():
-
-                # So far this was enough for finding out if full document or not; not entirely reliable
-                is_fulltext = 'Conclusion' in doc.get_text()
-
-                if is_fulltext:
-                    genes = gnorm.get_genes_for_text(doc, docid, postproc=True)
-                else:
-                    genes, _, _ = gnorm.get_genes_for_pmid(docid, postproc=True)
-
-                # genes
-                # if uniprot normalisation as well then:
-                genes_mapping = {}
-                if uniprot:
-                    with Swissprot() as uprot:
-                        list_of_ids = gnorm.uniquify_genes(genes)
-                        genes_mapping = uprot.get_uniprotid_for_entrez_geneid(list_of_ids)
-
-                goterms_mapping = {}
-                with GOTerms() as go:
-                    list_of_ids = self.uniquify_proteins(genes_mapping.values())
-                    goterms_mapping = go.get_goterms_for_uniprot_id(list_of_ids)
-
-                last_index = -1
-                part_index = 0
-                for partid, part in doc.parts.items():
-                    last_index = part_index
-                    part_index += part.get_size() + 1
-                    for gene in genes:
-                        if gene[2] in part.text and last_index <= gene[0] < part_index:
-                            start = gene[0] - last_index
-                            # confidence value is arbitrary for gnormplus because there is no value supplied
-                            ann = Entity(class_id=PRO_CLASS_ID, offset=start, text=gene[2], confidence=0.5)
-                            try:
-                                uniprotids = genes_mapping[gene[3]]
-                                for uniprotid in uniprotids:
-                                    go_terms = goterms_mapping[uniprotid]
-                                    for go_term in go_terms:
-                                        if go_term in self.transfac_go_terms:
-                                            ann.class_id=MUT_CLASS_ID
-                            except KeyError:
-                                pass
-                            try:
-                                norm_dict = {
-                                    ENTREZ_GENE_ID: gene[3],
-                                    UNIPROT_ID: genes_mapping[gene[3]]
-                                }
-                            except KeyError:
-                                norm_dict = {'EntrezGeneID': gene[3]}
-
-                            norm_string = ''  # todo normalized_text (stemming ... ?)
-                            ann.norms = norm_dict
-                            ann.normalized_text = norm_string
-                            if annotated:
-                                part.annotations.append(ann)
-                            else:
-                                part.predicted_annotations.append(ann)
+            genes_per_document = self.find_genes(dataset, gnorm)
+
+        # genes
+        # if uniprot normalisation as well then:
+        genes_mapping = {}
+        if uniprot:
+            with Swissprot() as uprot:
+                list_of_ids = list(OrderedDict.fromkeys(gene[3] for genes in genes_per_document.values() for gene in genes))
+                genes_mapping = uprot.get_uniprotid_for_entrez_geneid(list_of_ids)
+
+        goterms_mapping = {}
+        with GOTerms(self.go_index) as go:
+            list_of_ids = self.uniquify_proteins(genes_mapping.values())
+            goterms_mapping = go.get_goterms_for_uniprot_id(list_of_ids)
+
+        for docid, doc in dataset.documents.items():
+            self.place_annotations(doc, genes_per_document[docid], genes_mapping, goterms_mapping, annotated)
+
+
+    def find_genes(self, dataset, gnorm):
+        """
+        :type gnorm: nalaf.utils.ncbi_utils.GNormPlus
+        :return: the genes found by GNormPlus in each document, keyed by document id
+        :rtype: collections.OrderedDict
+        """
+        genes_per_document = OrderedDict()
+        for docid, doc in dataset.documents.items():
+
+            # So far this was enough for finding out if full document or not; not entirely reliable
+            is_fulltext = 'Conclusion' in doc.get_text()
+
+            if is_fulltext:
+                genes = gnorm.get_genes_for_text(doc, docid, postproc=True)
+            else:
+                genes, _, _ = gnorm.get_genes_for_pmid(docid, postproc=True)
+
+            genes_per_document[docid] = genes
+        return genes_per_document
+
+
+    def place_annotations(self, doc, genes, genes_mapping, goterms_mapping, annotated):
+        """
+        Add an entity for each gene found in the document, as a transcription
+        factor if any of its Uniprot ids has a transcription factor GO term.
+
+        :param genes_mapping: dictionary geneid --> uniprotid-list
+        :param goterms_mapping: dictionary uniprotid --> goterms-list
+        """
+        last_index = -1
+        part_index = 0
+        for partid, part in doc.parts.items():
+            last_index = part_index
+            part_index += part.get_size() + 1
+            for gene in genes:
+                if gene[2] in part.text and last_index <= gene[0] < part_index:
+                    start = gene[0] - last_index
+                    # confidence value is arbitrary for gnormplus because there is no value supplied
+                    ann = Entity(class_id=PRO_CLASS_ID, offset=start, text=gene[2], confidence=0.5)
+                    try:
+                        uniprotids = genes_mapping[gene[3]]
+                        for uniprotid in uniprotids:
+                            go_terms = goterms_mapping[uniprotid]
+                            for go_term in go_terms:
+                                if go_term in self.transfac_go_terms:
+                                    ann.class_id=MUT_CLASS_ID
+                    except KeyError:
+                        pass
+                    try:
+                        norm_dict = {
+                            ENTREZ_GENE_ID: gene[3],
+                            UNIPROT_ID: genes_mapping[gene[3]]
+                        }
+                    except KeyError:
+                        norm_dict = {'EntrezGeneID': gene[3]}
+
+                    norm_string = ''  # todo normalized_text (stemming ... ?)
+                    ann.norms = norm_dict
+                    ann.normalized_text = norm_string
+                    if annotated:
+                        part.annotations.append(ann)
+                    else:
+                        part.predicted_annotations.append(ann)
 
     def read_go_terms(self, file):
         with open(file) as goose:
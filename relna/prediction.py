@@ -0,0 +1,116 @@
+import os
+import pkg_resources
+
+from relna.utils import PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID
+from nalaf.learning.svmlight import SVMLightTreeKernels
+from relna.structures.relation_pipelines import ParallelRelationExtractionPipeline
+from relna.learning.taggers import TranscriptionFactorTagger
+from relna.learning.taggers import RelnaRelationExtractor
+from relna.learning.linear import LinearSVMScorer
+from relna.utils.feature_dictionary import load_feature_set
+from relna.features.hashing import HashedFeatureSpace
+from relna.features.profiling import GeneratorProfile
+from relna.learning.instances import InstanceCache
+from relna.learning.compaction import read_skipped_generators
+
+
+class RelnaPredictor:
+    """
+    Loads the relna models once (transcription factor GO terms, feature set,
+    feature generators, parser and SVM model) and predicts the relations of any
+    number of datasets with them.
+
+    :param svmlight_dir: the directory containing the svmlight executables; if
+        not given, the linear model is applied in-process
+    :type svmlight_dir: str
+    :param go_index: the directory of an offline GO index (see relna.utils.go_index)
+    :type go_index: str
+    :param n_jobs: the number of processes used to generate the features
+    :type n_jobs: int
+    :param model_path: the svmlight model, by default relna/data/default_model
+    :type model_path: str
+    :param feature_set_path: the feature set of the model, pickled or in the memory-mapped
+        .fdict format (see relna.utils.feature_dictionary), by default relna/data/features.pickle
+    :type feature_set_path: str
+    :param feature_bits: for a model trained with a HashedFeatureSpace, its number of
+        bits; no feature set is loaded then
+    :type feature_bits: int
+    :param profile: if True, the time and features of every feature generator
+        are recorded in self.profile
+    :type profile: bool
+    :param instance_cache: the directory of a cache of the instances of the predicted
+        datasets (see relna.learning.instances.InstanceCache); the features of a
+        dataset already predicted are then not generated again
+    :type instance_cache: str
+    :param model_dir: the directory of a compact model (see relna.learning.compaction),
+        with its features.pickle, default_model and the feature generators it skips;
+        replaces model_path and feature_set_path
+    :type model_dir: str
+    """
+
+    def __init__(self, svmlight_dir=None, go_index=None, n_jobs=1, model_path=None, feature_set_path=None,
+                 feature_bits=None, profile=False, instance_cache=None, model_dir=None):
+        skip_generators = []
+        if model_dir is not None:
+            model_path = os.path.join(model_dir, 'default_model')
+            feature_set_path = os.path.join(model_dir, 'features.pickle')
+            skip_generators = read_skipped_generators(model_dir)
+
+        self.model_path = model_path if model_path is not None else \
+            pkg_resources.resource_filename('relna.data', 'default_model')
+        """the svmlight model"""
+        self.feature_set_path = feature_set_path if feature_set_path is not None else \
+            pkg_resources.resource_filename('relna.data', 'features.pickle')
+        """the pickled or .fdict feature set of the model"""
+
+        self.transcription_factor_tagger = TranscriptionFactorTagger(
+            pkg_resources.resource_filename('relna.data', 'goose.dat'), go_index=go_index)
+        """tags the genes and transcription factors"""
+
+        if feature_bits is not None:
+            self.feature_set = HashedFeatureSpace(feature_bits)
+        else:
+            self.feature_set = load_feature_set(self.feature_set_path)
+        """the feature set of the model"""
+
+        self.profile = GeneratorProfile() if profile else None
+        """the profile of the feature generators over all the predicted datasets, None if not profiled"""
+
+        self.graphs = {}
+        """the dependency graphs of the sentences, only kept while predicting a dataset"""
+        self.pipeline = ParallelRelationExtractionPipeline(
+            PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID, n_jobs=n_jobs, feature_set=self.feature_set,
+            feature_generators=RelnaRelationExtractor.default_feature_generators(PRO_CLASS_ID, MUT_CLASS_ID,
+                                                                                 graphs=self.graphs, fused=True,
+                                                                                 profile=self.profile,
+                                                                                 skip=skip_generators))
+        """preprocesses the datasets and generates their features"""
+
+        instance_cache = InstanceCache(instance_cache) if instance_cache is not None else None
+        if svmlight_dir:
+            svmlight = SVMLightTreeKernels(model_path=self.model_path, svmlight_dir_path=svmlight_dir,
+                                           use_tree_kernel=False)
+            self.relation_extractor = RelnaRelationExtractor(PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID,
+                                                             svmlight=svmlight, instance_cache=instance_cache)
+        else:
+            scorer = LinearSVMScorer(self.model_path)
+            self.relation_extractor = RelnaRelationExtractor(PRO_CLASS_ID, MUT_CLASS_ID, PRO_REL_MUT_CLASS_ID,
+                                                             scorer=scorer, instance_cache=instance_cache)
+        """classifies the edges into relations"""
+
+
+    def predict(self, dataset):
+        """
+        Tag the entities and predict the relations of the dataset.
+
+        :type dataset: nalaf.structures.data.Dataset
+        :return: the same dataset
+        """
+        try:
+            self.transcription_factor_tagger.tag(dataset, uniprot=True)
+            cached = self.relation_extractor.has_cached_instances(dataset, self.feature_set)
+            self.pipeline.execute(dataset, train=False, generate_features=not cached)
+            self.relation_extractor.tag(dataset, self.feature_set)
+        finally:
+            self.graphs.clear()
+        return dataset
@@ -0,0 +1,243 @@
+"""
+Long-running relna prediction server. The models are loaded once at start and
+the requests are served concurrently over HTTP, on a TCP port or a unix socket.
+
+Usage: ::
+
+    $ python -m relna.server --port 8080
+    $ python -m relna.server --socket /tmp/relna.sock --workers 2
+
+Endpoints:
+
+* POST /predict with a JSON body {"text": "..."} or {"pmids": ["10383460", ...]}:
+  returns the entities and relations of every document, see RelnaJsonWriter
+* POST /reload with an optional JSON body {"model_path": ..., "feature_set_path": ...}
+  or {"model_dir": ...} (a compact model, see relna.learning.compaction):
+  loads the (new) model and swaps it in once loaded; requests in flight finish
+  with the previous model
+* GET /health: the status and the model being served
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+from nalaf.utils.readers import PMIDReader, StringReader
+from relna.prediction import RelnaPredictor
+from relna.utils.writers import RelnaJsonWriter
+
+
+class PredictorPool:
+    """
+    A fixed number of RelnaPredictor's, each used by one request at a time.
+
+    :param predictor_options: the keyword arguments of RelnaPredictor
+    :type predictor_options: dict
+    :param size: the number of predictors, i.e. of requests predicted in parallel
+    :type size: int
+    """
+
+    def __init__(self, predictor_options, size=1):
+        self.predictor_options = predictor_options
+        """the keyword arguments of RelnaPredictor"""
+        self.predictors = queue.Queue()
+        """the predictors not in use"""
+        for _ in range(size):
+            self.predictors.put(RelnaPredictor(**predictor_options))
+
+
+    @contextmanager
+    def acquire(self):
+        predictor = self.predictors.get()
+        try:
+            yield predictor
+        finally:
+            self.predictors.put(predictor)
+
+
+class RelnaService:
+    """
+    The state shared by all the requests: the pool of predictors, which can be
+    replaced at any time by a newly loaded one.
+
+    :param predictor_options: the keyword arguments of RelnaPredictor
+    :type predictor_options: dict
+    :param workers: the number of requests predicted in parallel
+    :type workers: int
+    """
+
+    def __init__(self, predictor_options, workers=1):
+        self.workers = workers
+        """the number of requests predicted in parallel"""
+        self.pool = PredictorPool(predictor_options, workers)
+        """the pool of predictors serving the requests"""
+        self.reload_lock = threading.Lock()
+        """serializes the reloads"""
+
+
+    def predict(self, dataset):
+        pool = self.pool
+        with pool.acquire() as predictor:
+            return RelnaJsonWriter().to_dict(predictor.predict(dataset))
+
+
+    def reload(self, **changed_options):
+        """
+        Load a new pool of predictors with the given options changed and swap it
+        in atomically. The previous pool is released once its requests finish.
+
+        A new model_path or feature_set_path replaces the model_dir of the
+        current predictors, which would otherwise take precedence over them.
+        """
+        with self.reload_lock:
+            options = dict(self.pool.predictor_options, **changed_options)
+            if 'model_dir' not in changed_options and \
+                    ('model_path' in changed_options or 'feature_set_path' in changed_options):
+                options['model_dir'] = None
+            self.pool = PredictorPool(options, self.workers)
+            return options
+
+
+class RelnaRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles the requests of the relna server, see the module documentation.
+    """
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok', 'predictor': self.server.service.pool.predictor_options})
+        else:
+            self.send_json(404, {'error': 'not found: {}'.format(self.path)})
+
+
+    def do_POST(self):
+        try:
+            body = self.read_json()
+        except ValueError as e:
+            self.send_json(400, {'error': 'invalid JSON body: {}'.format(e)})
+            return
+
+        try:
+            if self.path == '/predict':
+                if body.get('text'):
+                    dataset = StringReader(body['text']).read()
+                elif body.get('pmids'):
+                    pmids = body['pmids']
+                    dataset = PMIDReader([str(pmid) for pmid in (pmids if isinstance(pmids, list) else [pmids])]).read()
+                else:
+                    self.send_json(400, {'error': 'either "text" or "pmids" is required'})
+                    return
+                self.send_json(200, self.server.service.predict(dataset))
+
+            elif self.path == '/reload':
+                allowed = {'model_path', 'feature_set_path', 'model_dir', 'feature_bits', 'svmlight_dir', 'go_index'}
+                unknown = set(body) - allowed
+                if unknown:
+                    self.send_json(400, {'error': 'unknown options: {}'.format(', '.join(sorted(unknown)))})
+                    return
+                options = self.server.service.reload(**body)
+                self.send_json(200, {'status': 'reloaded', 'predictor': options})
+
+            else:
+                self.send_json(404, {'error': 'not found: {}'.format(self.path)})
+
+        except Exception as e:
+            self.send_json(500, {'error': '{}: {}'.format(type(e).__name__, e)})
+
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if length == 0:
+            return {}
+        body = json.loads(self.rfile.read(length).decode('utf-8'))
+        if not isinstance(body, dict):
+            raise ValueError('expected a JSON object')
+        return body
+
+
+    def send_json(self, status, content):
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ThreadingRelnaHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        super().__init__(address, RelnaRequestHandler)
+        self.service = service
+
+
+class ThreadingRelnaUnixServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, service):
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, RelnaRequestHandler)
+        self.service = service
+
+    def get_request(self):
+        # unix socket clients have no address, the handler logs this one instead
+        request, _ = super().get_request()
+        return request, ('unix', 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve relna predictions over HTTP, loading the models only once')
+    parser.add_argument('--host', default='127.0.0.1', help='the interface to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='the TCP port to listen on')
+    parser.add_argument('--socket', help='listen on this unix socket instead of a TCP port')
+    parser.add_argument('--workers', type=int, default=1, help='the number of requests predicted in parallel, '
+                                                              'each worker holds its own copy of the models')
+    parser.add_argument('-c', '--svmlight_dir', help='path to the directory containing the svmlight executables; '
+                                                     'if not given, the linear model is applied in-process')
+    parser.add_argument('--go_index', help='directory of an offline Uniprot to GO terms index')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='the number of processes used to generate the features '
+                                                                  '(of one request at a time, only with --workers 1)')
+    parser.add_argument('--model_path', help='the svmlight model, by default the one shipped with relna')
+    parser.add_argument('--feature_set_path', help='the feature set of the model, pickled or .fdict')
+    parser.add_argument('--feature_bits', type=int, help='the number of bits of a model trained with hashed features')
+    parser.add_argument('--model_dir', help='the directory of a compact model (python3 -m relna.learning.compaction), '
+                                            'instead of --model_path and --feature_set_path')
+    args = parser.parse_args()
+
+    if args.workers > 1 and args.jobs != 1:
+        # the processes generating the features would be forked from the threads of the concurrent requests
+        parser.error('--jobs cannot be combined with --workers, use either parallel requests or parallel feature generation')
+
+    service = RelnaService({
+        'svmlight_dir': args.svmlight_dir,
+        'go_index': args.go_index,
+        'n_jobs': args.jobs,
+        'model_path': args.model_path,
+        'feature_set_path': args.feature_set_path,
+        'feature_bits': args.feature_bits,
+        'model_dir': args.model_dir
+    }, workers=args.workers)
+
+    if args.socket:
+        server = ThreadingRelnaUnixServer(args.socket, service)
+        print('relna server listening on {}'.format(args.socket))
+    else:
+        server = ThreadingRelnaHTTPServer((args.host, args.port), service)
+        print('relna server listening on http://{}:{}'.format(args.host, server.server_port))
+
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
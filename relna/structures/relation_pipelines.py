@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from nalaf.structures.data import Dataset
+from nalaf.structures.relation_pipelines import RelationExtractionPipeline
+from relna.features.engine import FusedEdgeFeatureGenerator, SentenceFeatureCache
+from relna.features.profiling import GeneratorProfile
+from relna.features.hashing import HashedFeatureSpace
+
+
+_SHARED_STATE = None
+"""the engine, feature set, shards and mode of the running execution, inherited by the forked workers"""
+
+_SHARED_STATE_LOCK = threading.Lock()
+"""serializes the executions of the threads of a process, which would otherwise overwrite each other's _SHARED_STATE"""
+
+
+def _generate_shard_features(shard_index):
+    """
+    Generate the features of a single shard in a worker process.
+
+    :return: the new feature names staged by each generator (only in training
+        mode), the features of every edge in the shard, in order, the profile
+        of the shard if the engine is profiled, and the stats of the sentence
+        cache of the shard
+    :rtype: (list[list[str]], list[dict], relna.features.profiling.GeneratorProfile, dict)
+    """
+    engine, feature_set, shards, is_training_mode = _SHARED_STATE
+    shard = shards[shard_index]
+    if engine.profile is not None:
+        engine.profile = GeneratorProfile()
+    engine.sentence_cache = SentenceFeatureCache()
+    if is_training_mode and not isinstance(feature_set, HashedFeatureSpace):
+        staged_sets = engine.stage(shard, feature_set)
+        staged_names = [list(staged_set.names) for staged_set in staged_sets]
+    else:
+        engine.run(shard, [feature_set] * len(engine.feature_generators), is_training_mode)
+        staged_names = []
+    return staged_names, [edge.features for edge in shard.edges()], engine.profile, engine.sentence_cache.stats()
+
+
+class ParallelRelationExtractionPipeline(RelationExtractionPipeline):
+    """
+    Relation extraction pipeline that generates the edge features in a pool of
+    worker processes.
+
+    The preprocessing (splitting, tokenization, parsing and edge generation) is
+    run as in RelationExtractionPipeline. The documents are then split in
+    contiguous shards, whose features are generated in parallel.
+
+    In training mode the workers do not assign feature indices; they only
+    return the feature names each generator saw first, which are registered
+    generator by generator and shard by shard, in document order. The feature
+    set is therefore identical to the one of a serial run, for any n_jobs. With
+    a HashedFeatureSpace, there is nothing to register.
+
+    Requires the fork start method, which is the default on Linux.
+
+    :param n_jobs: the number of worker processes, all available cores if -1
+    :type n_jobs: int
+    :param shards_per_job: the number of shards per worker, more shards balance
+        the load better between workers
+    :type shards_per_job: int
+    """
+
+    def __init__(self, class1, class2, rel_type, n_jobs=-1, shards_per_job=4, **kwargs):
+        super().__init__(class1, class2, rel_type, **kwargs)
+        self.n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        """the number of worker processes"""
+        self.shards_per_job = shards_per_job
+        """the number of shards per worker"""
+
+
+    def execute(self, dataset, train=False, generate_features=True):
+        """
+        :param generate_features: if False, the dataset is only preprocessed,
+            e.g. when its instances are cached (see relna.learning.instances)
+        :type generate_features: bool
+        """
+        if self.n_jobs <= 1 and generate_features:
+            return super().execute(dataset, train)
+
+        feature_generators = self.feature_generators
+        self.feature_generators = []
+        try:
+            super().execute(dataset, train)
+        finally:
+            self.feature_generators = feature_generators
+
+        if generate_features:
+            self.generate_features(dataset, train)
+
+
+    def generate_features(self, dataset, is_training_mode):
+        """
+        Generate the features of the dataset in parallel with the pipeline's
+        feature generators.
+        """
+        if len(self.feature_generators) == 1 and isinstance(self.feature_generators[0], FusedEdgeFeatureGenerator):
+            engine = self.feature_generators[0]
+        else:
+            engine = FusedEdgeFeatureGenerator(self.feature_generators)
+
+        shards = self.shard(dataset)
+
+        global _SHARED_STATE
+        with _SHARED_STATE_LOCK:
+            _SHARED_STATE = (engine, self.feature_set, shards, is_training_mode)
+            try:
+                with multiprocessing.get_context('fork').Pool(min(self.n_jobs, len(shards))) as pool:
+                    results = pool.map(_generate_shard_features, range(len(shards)))
+            finally:
+                _SHARED_STATE = None
+
+        for shard, (_, edge_features, _, _) in zip(shards, results):
+            for edge, features in zip(shard.edges(), edge_features):
+                edge.features = features
+
+        for _, _, _, sentence_cache_stats in results:
+            engine.sentence_cache.merge(sentence_cache_stats)
+        if engine.profile is not None:
+            engine.profile.runs += 1
+            for _, _, shard_profile, _ in results:
+                engine.profile.merge(shard_profile)
+
+        if is_training_mode and not isinstance(self.feature_set, HashedFeatureSpace):
+            engine.register(self.feature_set, [staged_names for staged_names, _, _, _ in results])
+            engine.index_edges(dataset, self.feature_set)
+
+
+    def shard(self, dataset):
+        """
+        :return: the documents of the dataset split in contiguous shards
+        :rtype: list[nalaf.structures.data.Dataset]
+        """
+        documents = list(dataset.documents.items())
+        n_shards = max(1, min(len(documents), self.n_jobs * self.shards_per_job))
+        shards = []
+        for index in range(n_shards):
+            shard = Dataset()
+            start = index * len(documents) // n_shards
+            end = (index + 1) * len(documents) // n_shards
+            shard.documents = OrderedDict(documents[start:end])
+            shards.append(shard)
+        return shards
+
@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import time
+from collections.abc import MutableMapping
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.relna', 'cache.sqlite3')
+"""the default cache database, can be overridden with the RELNA_CACHE environment variable"""
+
+
+class PersistentCache(MutableMapping):
+    """
+    Dictionary-like cache persisted in a SQLite database, which can be shared by
+    several processes at the same time (the database is in WAL mode, readers do
+    not block the writer).
+
+    Every user of the database has its own namespace. Values must be JSON
+    serializable and keys are strings.
+
+    An entry expires ttl seconds after it was written. When a namespace grows
+    above max_entries, the least recently used entries are evicted.
+
+    :param namespace: the name of the cache within the database
+    :type namespace: str
+    :param path: the path to the SQLite database, created if it does not exist
+    :type path: str
+    :param ttl: the time to live of an entry in seconds, None for no expiry
+    :type ttl: float
+    :param max_entries: the maximum number of entries of the namespace, None for no limit
+    :type max_entries: int
+    """
+
+    def __init__(self, namespace, path=None, ttl=604800, max_entries=100000):
+        self.namespace = namespace
+        """the name of the cache within the database"""
+        self.path = path if path is not None else os.environ.get('RELNA_CACHE', DEFAULT_CACHE_PATH)
+        """the path to the SQLite database"""
+        self.ttl = ttl
+        """the time to live of an entry in seconds"""
+        self.max_entries = max_entries
+        """the maximum number of entries of the namespace"""
+        self.hits = 0
+        """the number of lookups of an existing entry"""
+        self.misses = 0
+        """the number of lookups of a missing or expired entry"""
+        self.evictions = 0
+        """the number of entries evicted to stay within max_entries"""
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                                'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                                'written REAL NOT NULL, accessed REAL NOT NULL, '
+                                'PRIMARY KEY (namespace, key)) WITHOUT ROWID')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (namespace, accessed)')
+
+
+    def __getitem__(self, key):
+        now = time.time()
+        row = self.connection.execute('SELECT value, written FROM entries WHERE namespace = ? AND key = ?',
+                                      (self.namespace, key)).fetchone()
+        if row is None or self.is_expired(row[1], now):
+            self.misses += 1
+            if row is not None:
+                self.connection.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (self.namespace, key))
+            raise KeyError(key)
+
+        self.hits += 1
+        self.connection.execute('UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?',
+                                (now, self.namespace, key))
+        return json.loads(row[0])
+
+
+    def __contains__(self, key):
+        row = self.connection.execute('SELECT written FROM entries WHERE namespace = ? AND key = ?',
+                                      (self.namespace, key)).fetchone()
+        return row is not None and not self.is_expired(row[0], time.time())
+
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+
+    def update(self, other=(), **kwargs):
+        """
+        Write several entries in a single transaction.
+        """
+        entries = dict(other, **kwargs)
+        now = time.time()
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                                        [(self.namespace, key, json.dumps(value), now, now)
+                                         for key, value in entries.items()])
+            self.evict()
+
+
+    def __delitem__(self, key):
+        cursor = self.connection.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (self.namespace, key))
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+
+    def __iter__(self):
+        rows = self.connection.execute('SELECT key, written FROM entries WHERE namespace = ?', (self.namespace,))
+        now = time.time()
+        return iter([key for key, written in rows.fetchall() if not self.is_expired(written, now)])
+
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+    def is_expired(self, written, now):
+        return self.ttl is not None and now - written > self.ttl
+
+
+    def evict(self):
+        """
+        Delete the expired entries and, above max_entries, the least recently
+        used ones.
+        """
+        if self.ttl is not None:
+            self.connection.execute('DELETE FROM entries WHERE namespace = ? AND written < ?',
+                                    (self.namespace, time.time() - self.ttl))
+        if self.max_entries is not None:
+            count, = self.connection.execute('SELECT COUNT(*) FROM entries WHERE namespace = ?',
+                                             (self.namespace,)).fetchone()
+            if count > self.max_entries:
+                cursor = self.connection.execute(
+                    'DELETE FROM entries WHERE namespace = ? AND key IN ('
+                    'SELECT key FROM entries WHERE namespace = ? ORDER BY accessed LIMIT ?)',
+                    (self.namespace, self.namespace, count - self.max_entries))
+                self.evictions += cursor.rowcount
+
+
+    def hit_rate(self):
+        """
+        :return: the fraction of lookups that found a valid entry
+        :rtype: float
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+    def stats(self):
+        """
+        :return: the hits, misses, hit rate and evictions of this instance
+        :rtype: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate(), 'evictions': self.evictions}
+
+
+    def close(self):
+        self.connection.close()
+
+
+class PersistentCacheable:
+    """
+    Drop-in replacement for nalaf.utils.cache.Cacheable backed by a
+    PersistentCache, with one namespace per subclass.
+
+    As with Cacheable, the cache is only read and written when the subclass is
+    used with a context manager:
+        with SomeSubclass() as instance:
+            instance.do_something()
+    otherwise self.cache is a plain dictionary that lives as long as the instance.
+
+    Unlike Cacheable, the entries are written to disk as soon as they are set,
+    expire individually and can be shared by concurrent processes. On exit, the
+    statistics of the cache are kept in cache_stats.
+
+    Subclasses that implement __init__ have to call super().__init__() first.
+
+    :param cache_path: the path to the SQLite database, by default ~/.relna/cache.sqlite3
+    :type cache_path: str
+    :param max_time_in_seconds: the time to live of each entry
+    :type max_time_in_seconds: float
+    :param max_entries: the maximum number of entries of the subclass' cache
+    :type max_entries: int
+    """
+
+    def __init__(self, cache_path=None, max_time_in_seconds=604800, max_entries=100000):
+        self.cache = {}
+        self.cache_path = cache_path
+        self.max_time_in_seconds = max_time_in_seconds
+        self.max_entries = max_entries
+        self.cache_stats = None
+        """the statistics (see PersistentCache.stats) of the last context manager use"""
+
+
+    def __enter__(self):
+        self.cache = PersistentCache(self.__class__.__name__, self.cache_path, self.max_time_in_seconds,
+                                     self.max_entries)
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cache_stats = self.cache.stats()
+        self.cache.close()
+        self.cache = {}
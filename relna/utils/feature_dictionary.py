@@ -0,0 +1,195 @@
+"""
+Compact, read-only on-disk format for the feature dictionaries (feature name
+--> feature index) used for prediction. The file is memory-mapped when opened,
+so loading it takes constant time regardless of the number of features, and
+lookups go straight to an open-addressing hash table inside the file.
+
+The pickle stays the interchange format: convert it with
+
+    python3 -m relna.utils.feature_dictionary relna/data/features.pickle relna/data/features.fdict
+
+Layout of a .fdict file (all integers little endian):
+
+* header: magic (8 bytes), number of features (uint64), number of slots (uint64, a power of 2)
+* slots: for each slot, the offset (uint64) and length (uint32) of the name in the
+  names section and the feature index (uint32); an empty slot has the offset EMPTY
+* names: the utf-8 encoded feature names, concatenated
+
+A name is looked up from slot crc32(name) & (slots - 1), probing linearly.
+"""
+import argparse
+import mmap
+import pickle
+import struct
+import zlib
+from collections.abc import Mapping
+
+
+MAGIC = b'RELNAFD1'
+HEADER = struct.Struct('<8sQQ')
+SLOT = struct.Struct('<QII')
+EMPTY = 2 ** 64 - 1
+"""the name offset of the empty slots"""
+
+
+def write_feature_dictionary(feature_set, path, load_factor=0.5):
+    """
+    Write the feature dictionary to path in the .fdict format.
+
+    :param feature_set: dictionary feature name --> feature index
+    :type feature_set: dict
+    :param load_factor: the maximum ratio of features to slots of the hash table
+    :type load_factor: float
+    """
+    n_slots = 1
+    while n_slots * load_factor < max(len(feature_set), 1):
+        n_slots *= 2
+    mask = n_slots - 1
+
+    slots = bytearray(SLOT.pack(EMPTY, 0, 0) * n_slots)
+    names = bytearray()
+    for feature_name, feature_index in feature_set.items():
+        key = feature_name.encode('utf-8')
+        slot = zlib.crc32(key) & mask
+        while SLOT.unpack_from(slots, slot * SLOT.size)[0] != EMPTY:
+            slot = (slot + 1) & mask
+        SLOT.pack_into(slots, slot * SLOT.size, len(names), len(key), feature_index)
+        names.extend(key)
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, len(feature_set), n_slots))
+        file.write(slots)
+        file.write(names)
+
+
+def load_feature_set(path):
+    """
+    Load a feature dictionary, memory-mapped if path is a .fdict file and
+    unpickled otherwise.
+
+    :rtype: MappedFeatureDictionary or nalaf.structures.data.FeatureDictionary
+    """
+    if path.endswith('.fdict'):
+        return MappedFeatureDictionary(path)
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+class MappedFeatureDictionary(Mapping):
+    """
+    Read-only feature dictionary backed by a memory-mapped .fdict file, usable
+    wherever the feature set is only read (i.e. for prediction).
+
+    The results of the lookups are memoized, as the same feature names are
+    looked up over and over while predicting.
+
+    :param path: the path to a file written by write_feature_dictionary
+    :type path: str
+    :param memo_size: the maximum number of memoized lookups, the memo is
+        emptied when it grows beyond it
+    :type memo_size: int
+    """
+
+    def __init__(self, path, memo_size=2 ** 18):
+        self.path = path
+        """the path to the .fdict file"""
+        self.memo_size = memo_size
+        """the maximum number of memoized lookups"""
+        self.memo = {}
+        """feature name --> feature index or None, for the names looked up so far"""
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            """the memory-mapped file"""
+
+        magic, self.n_features, self.n_slots = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('{} is not a feature dictionary file'.format(path))
+        self.mask = self.n_slots - 1
+        self.names_offset = HEADER.size + self.n_slots * SLOT.size
+        """the start of the names section"""
+
+
+    def find(self, feature_name):
+        """
+        :return: the index of the feature or None if it is not in the dictionary
+        :rtype: int
+        """
+        try:
+            return self.memo[feature_name]
+        except KeyError:
+            if len(self.memo) >= self.memo_size:
+                self.memo.clear()
+            feature_index = self.memo[feature_name] = self.lookup(feature_name)
+            return feature_index
+
+
+    def lookup(self, feature_name):
+        """
+        Look the feature up in the hash table of the file, bypassing the memo.
+
+        :return: the index of the feature or None if it is not in the dictionary
+        :rtype: int
+        """
+        key = feature_name.encode('utf-8')
+        buffer = self.buffer
+        slot = zlib.crc32(key) & self.mask
+        while True:
+            offset, length, feature_index = SLOT.unpack_from(buffer, HEADER.size + slot * SLOT.size)
+            if offset == EMPTY:
+                return None
+            if length == len(key):
+                start = self.names_offset + offset
+                if buffer[start:start + length] == key:
+                    return feature_index
+            slot = (slot + 1) & self.mask
+
+
+    def __getitem__(self, feature_name):
+        feature_index = self.find(feature_name)
+        if feature_index is None:
+            raise KeyError(feature_name)
+        return feature_index
+
+
+    def __contains__(self, feature_name):
+        return self.find(feature_name) is not None
+
+
+    def get(self, feature_name, default=None):
+        feature_index = self.find(feature_name)
+        return default if feature_index is None else feature_index
+
+
+    def __len__(self):
+        return self.n_features
+
+
+    def __iter__(self):
+        for offset, length, _ in SLOT.iter_unpack(self.buffer[HEADER.size:self.names_offset]):
+            if offset != EMPTY:
+                start = self.names_offset + offset
+                yield self.buffer[start:start + length].decode('utf-8')
+
+
+    def __getstate__(self):
+        return {'path': self.path, 'memo_size': self.memo_size}
+
+
+    def __setstate__(self, state):
+        self.__init__(state['path'], state['memo_size'])
+
+
+    def close(self):
+        self.buffer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a pickled feature dictionary into the memory-mapped .fdict format')
+    parser.add_argument('pickle', help='the pickled feature dictionary, e.g. relna/data/features.pickle')
+    parser.add_argument('fdict', help='the .fdict file to write')
+    args = parser.parse_args()
+
+    with open(args.pickle, 'rb') as fp:
+        feature_set = pickle.load(fp)
+    write_feature_dictionary(feature_set, args.fdict)
+    print('wrote {} features to {}'.format(len(feature_set), args.fdict))
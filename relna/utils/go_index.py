@@ -0,0 +1,241 @@
+"""
+Offline index from Uniprot accessions to GO terms, built from a local dump:
+
+* a GO annotation file (GAF 2.x, e.g. goa_uniprot_all.gaf.gz from GOA), or
+* a Uniprot flat file (e.g. uniprot_sprot.dat.gz), using the DR GO lines.
+
+The index is a directory with three NumPy arrays that are memory-mapped when
+loaded, so opening it is instantaneous and lookups are binary searches:
+
+* accessions.npy: the sorted accessions (fixed-width bytes)
+* offsets.npy: for the i-th accession, its GO terms are goterms[offsets[i]:offsets[i+1]]
+* goterms.npy: the numeric part of the GO ids (GO:0003700 -> 3700)
+
+Build it with:
+
+    python3 -m relna.utils.go_index gaf goa_uniprot_all.gaf.gz go_index/
+    python3 -m relna.utils.go_index uniprot uniprot_sprot.dat.gz go_index/
+"""
+import argparse
+import gzip
+import os
+from array import array
+import numpy as np
+
+
+def open_dump(path):
+    """
+    Open a text dump, decompressing it if its name ends with .gz.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, encoding='utf-8', errors='replace')
+
+
+def read_gaf(path, chunk_size=1 << 24):
+    """
+    Read the GO terms of each Uniprot accession from a GAF file, skipping the
+    negated (NOT) annotations.
+
+    A GAF file has a line per annotation and evidence, so the same (accession,
+    GO term) pair recurs many times. The pairs are kept as 64-bit integers
+    (accession number, GO number) in a flat array, which is deduplicated every
+    chunk_size lines, so that the memory grows with the distinct pairs only.
+
+    :param chunk_size: the number of lines read between deduplications
+    :type chunk_size: int
+    :return: the GO ids of each accession, in order of first appearance
+    :rtype: relna.utils.go_index.PackedGOTerms
+    """
+    accession_numbers = {}
+    pairs = np.empty(0, dtype=np.int64)
+    buffer = array('q')
+    with open_dump(path) as file:
+        for line in file:
+            if line.startswith('!'):
+                continue
+            columns = line.rstrip('\n').split('\t')
+            if len(columns) < 5 or columns[0] != 'UniProtKB' or 'NOT' in columns[3].split('|'):
+                continue
+            accession_number = accession_numbers.setdefault(columns[1], len(accession_numbers))
+            buffer.append(accession_number << 32 | int(columns[4][3:]))
+            if len(buffer) >= chunk_size:
+                pairs = _unique_in_order(np.concatenate((pairs, np.frombuffer(buffer, dtype=np.int64))))
+                buffer = array('q')
+    pairs = _unique_in_order(np.concatenate((pairs, np.frombuffer(buffer, dtype=np.int64))))
+
+    accessions = list(accession_numbers)
+    # the accessions in sorted order, and the sorted position of each accession number
+    order = sorted(range(len(accessions)), key=accessions.__getitem__)
+    positions = np.empty(len(accessions), dtype=np.int64)
+    positions[order] = np.arange(len(accessions))
+
+    pair_positions = positions[pairs >> 32]
+    # stable, so that the GO terms of each accession stay in order of first appearance
+    grouped = np.argsort(pair_positions, kind='stable')
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(pair_positions, minlength=len(accessions)))))
+    return PackedGOTerms([accessions[number] for number in order], offsets,
+                         (pairs[grouped] & 0xFFFFFFFF).astype(np.int32))
+
+
+def _unique_in_order(values):
+    """
+    :return: the distinct values, in order of first appearance
+    :rtype: numpy.ndarray
+    """
+    _, first_indices = np.unique(values, return_index=True)
+    return values[np.sort(first_indices)]
+
+
+class PackedGOTerms:
+    """
+    The GO terms of accessions in the layout of the index (see build_index):
+    the sorted accessions and the numeric GO ids of all of them, delimited by
+    offsets.
+
+    :type accessions: list[str]
+    :type offsets: numpy.ndarray
+    :type goterms: numpy.ndarray
+    """
+
+    def __init__(self, accessions, offsets, goterms):
+        self.accessions = accessions
+        """the sorted accessions"""
+        self.offsets = offsets
+        """the start of the GO terms of each accession in goterms"""
+        self.goterms = goterms
+        """the numeric part of the GO ids of all the accessions"""
+
+
+    @staticmethod
+    def from_dict(goterms):
+        """
+        :param goterms: dictionary accession --> GO ids
+        :type goterms: dict
+        :rtype: relna.utils.go_index.PackedGOTerms
+        """
+        sorted_accessions = sorted(goterms)
+        lengths = np.fromiter((len(goterms[accession]) for accession in sorted_accessions), dtype=np.int64,
+                              count=len(sorted_accessions))
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        numbers = np.fromiter((int(goterm[3:]) for accession in sorted_accessions for goterm in goterms[accession]),
+                              dtype=np.int32, count=int(offsets[-1]))
+        return PackedGOTerms(sorted_accessions, offsets, numbers)
+
+
+    def __len__(self):
+        return len(self.accessions)
+
+
+def read_uniprot(path):
+    """
+    Read the GO terms of each entry of a Uniprot flat file. All the accessions
+    of an entry (primary and secondary) map to the GO terms of the entry, as
+    the Uniprot website does.
+
+    :return: dictionary accession --> GO ids, in the order of the DR lines
+    :rtype: dict
+    """
+    goterms = {}
+    accessions = []
+    entry_goterms = []
+    with open_dump(path) as file:
+        for line in file:
+            if line.startswith('AC   '):
+                accessions.extend(accession.strip() for accession in line[5:].split(';') if accession.strip())
+            elif line.startswith('DR   GO;'):
+                start_index = line.find('GO:')
+                entry_goterms.append(line[start_index:start_index+10])
+            elif line.startswith('//'):
+                for accession in accessions:
+                    goterms[accession] = entry_goterms
+                accessions = []
+                entry_goterms = []
+    return goterms
+
+
+def build_index(goterms, index_path):
+    """
+    Write the index of the given mapping to the index_path directory.
+
+    :param goterms: dictionary accession --> GO ids, or already packed
+    :type goterms: dict or relna.utils.go_index.PackedGOTerms
+    """
+    os.makedirs(index_path, exist_ok=True)
+    if not isinstance(goterms, PackedGOTerms):
+        goterms = PackedGOTerms.from_dict(goterms)
+
+    width = max((len(accession) for accession in goterms.accessions), default=1)
+    accessions = np.array([accession.encode('ascii') for accession in goterms.accessions], dtype='S{}'.format(width))
+
+    np.save(os.path.join(index_path, 'accessions.npy'), accessions)
+    np.save(os.path.join(index_path, 'offsets.npy'), np.asarray(goterms.offsets, dtype=np.int64))
+    np.save(os.path.join(index_path, 'goterms.npy'), np.asarray(goterms.goterms, dtype=np.int32))
+
+
+class GOIndex:
+    """
+    Read-only, memory-mapped index from Uniprot accessions to GO terms,
+    as written by build_index.
+
+    :param index_path: the directory of the index
+    :type index_path: str
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        """the directory of the index"""
+        self.accessions = np.load(os.path.join(index_path, 'accessions.npy'), mmap_mode='r')
+        """the sorted accessions"""
+        self.offsets = np.load(os.path.join(index_path, 'offsets.npy'), mmap_mode='r')
+        """the start of the GO terms of each accession in goterms"""
+        self.goterms = np.load(os.path.join(index_path, 'goterms.npy'), mmap_mode='r')
+        """the numeric part of the GO ids of all the accessions"""
+
+
+    def __len__(self):
+        return len(self.accessions)
+
+
+    def __contains__(self, accession):
+        return self.position(accession) is not None
+
+
+    def position(self, accession):
+        """
+        :return: the position of the accession in the index or None if it is not indexed
+        :rtype: int
+        """
+        try:
+            key = accession.encode('ascii')
+        except UnicodeEncodeError:
+            return None
+        if len(key) > self.accessions.dtype.itemsize:
+            return None
+        position = int(np.searchsorted(self.accessions, key))
+        if position < len(self.accessions) and self.accessions[position] == key:
+            return position
+        return None
+
+
+    def get(self, accession):
+        """
+        :return: the GO ids of the accession, empty if it is not indexed
+        :rtype: list[str]
+        """
+        position = self.position(accession)
+        if position is None:
+            return []
+        return ['GO:{:07d}'.format(number) for number in self.goterms[self.offsets[position]:self.offsets[position + 1]]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the offline index from Uniprot accessions to GO terms')
+    parser.add_argument('format', choices=['gaf', 'uniprot'], help='the format of the dump: GO annotation file or Uniprot flat file')
+    parser.add_argument('dump', help='the path to the dump, optionally gzipped')
+    parser.add_argument('index', help='the directory to write the index to')
+    args = parser.parse_args()
+
+    mapping = read_gaf(args.dump) if args.format == 'gaf' else read_uniprot(args.dump)
+    build_index(mapping, args.index)
+    print('indexed {} accessions into {}'.format(len(mapping), args.index))
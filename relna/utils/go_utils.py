@@ -1,29 +1,44 @@
 import requests
-from nalaf.utils.cache import Cacheable
+from relna.utils.cache import PersistentCacheable
+from relna.utils.go_index import GOIndex
 
-class GOTerms(Cacheable):
+class GOTerms(PersistentCacheable):
     """
     Helper class that accesses the database identifier mapping service from Uniprot.
     and returns a list of 2-tuple with the requested geneid and the corresponding Uniprot ID.
+
+    :param index_path: the directory of an offline GO index (see relna.utils.go_index)
+        to answer from instead of Uniprot
+    :type index_path: str
     """
-    def __init__(self):
+    def __init__(self, index_path=None):
         super().__init__()
         self.url = 'http://www.uniprot.org/uniprot/{}.txt'
+        self.index = GOIndex(index_path) if index_path is not None else None
+        """if given, the offline GOIndex used instead of the cache and Uniprot"""
 
 
     def get_goterms_for_uniprot_id(self, list_uniprotids):
         """
         Get dictionary mapping from { UniprotID : [ GOTerms, ... ]
+
+        The ids whose download fails map to no GO terms for this call only:
+        they are not cached and are downloaded again on the next call.
+
         :param list_geneids:
         :type list_geneids: [int] or [str] or int or str
         :return: dictionary uniprotid --> goterms-list
         """
+        if self.index is not None:
+            return {uniprotid: self.index.get(uniprotid) for uniprotid in list_uniprotids}
+
         return_dict = {}
         to_be_downloaded = []
 
         for uniprotid in list_uniprotids:
-            if uniprotid in self.cache:
-                return_dict[uniprotid] = self.cache[uniprotid]
+            cached = self.cache.get(uniprotid)
+            if cached is not None:
+                return_dict[uniprotid] = cached
             else:
                 to_be_downloaded.append(uniprotid)
 
@@ -32,11 +47,17 @@ class GOTerms(Cacheable):
 
         for uniprotid in to_be_downloaded:
             return_dict[uniprotid] = []
-            r = requests.get(self.url.format(uniprotid))
+            try:
+                r = requests.get(self.url.format(uniprotid))
+            except requests.RequestException:
+                continue
             for line in r.text.splitlines():
                 if line.startswith("DR   GO;"):
                     startIndex = line.find('GO:')
                     endIndex = startIndex+10
                     return_dict[uniprotid].append(line[startIndex:endIndex])
+            # a failed download is answered with no GO terms, but not cached, so that it is retried
+            if r.ok:
+                self.cache[uniprotid] = return_dict[uniprotid]
 
         return return_dict
@@ -0,0 +1,147 @@
+from collections import deque
+
+
+class DependencyGraph:
+    """
+    Dependency graph of a sentence, stored as adjacency lists over the token
+    ids, with the shortest-path predecessors computed by breadth-first search
+    from each source on demand and kept for all the later paths of the sentence.
+
+    Computing the predecessors of a source costs O(n), against O(n^3) for the
+    all-pairs Floyd-Warshall tables of nalaf.utils.graph, and only the sources
+    actually asked for (the entity heads and protein words) are computed.
+
+    The arcs are the ones of nalaf.utils.graph._convert_to_dependency_graph,
+    so that the paths are the same: every head --> dependent arc, but only the
+    dependent --> head arcs of the dependents that come before their head in
+    the sentence (nalaf resets the row of each token when it reaches it, which
+    drops the reverse arcs added by the heads before it).
+
+    :param sentence: the tokens of the sentence, the id feature of each token
+        being its position in the sentence
+    :type sentence: list[nalaf.structures.data.Token]
+    """
+
+    def __init__(self, sentence):
+        arcs = [{} for _ in sentence]
+        for from_token in sentence:
+            u = from_token.features['id']
+            arcs[u] = {}
+            for to_token, _ in from_token.features['dependency_to']:
+                v = to_token.features['id']
+                arcs[u][v] = 1
+                arcs[v][u] = 1
+
+        self.adjacency = [list(token_arcs) for token_arcs in arcs]
+        """the ids of the tokens each token has an arc to"""
+        self.predecessors = {}
+        """source id --> the predecessor of each token id on its shortest path from the source, -1 if unreachable"""
+
+        edges = {(min(u, v), max(u, v)) for u in range(len(arcs)) for v in arcs[u] if u != v}
+        self.is_forest = len(edges) == len(sentence) - self.count_components(edges)
+        """whether the dependencies have no cycles, so that there is at most one shortest path between two tokens"""
+
+
+    def count_components(self, edges):
+        """
+        :param edges: the undirected edges of the graph, as pairs of token ids
+        :return: the number of connected components of the graph
+        :rtype: int
+        """
+        component = list(range(len(self.adjacency)))
+
+        def find(u):
+            while component[u] != u:
+                component[u] = component[component[u]]
+                u = component[u]
+            return u
+
+        count = len(self.adjacency)
+        for u, v in edges:
+            root_u, root_v = find(u), find(v)
+            if root_u != root_v:
+                component[root_u] = root_v
+                count -= 1
+        return count
+
+
+    def predecessors_from(self, source):
+        """
+        :return: the predecessor of each token id on its shortest path from source
+        :rtype: list[int]
+        """
+        try:
+            return self.predecessors[source]
+        except KeyError:
+            predecessors = [-1] * len(self.adjacency)
+            predecessors[source] = source
+            queue = deque([source])
+            while queue:
+                u = queue.popleft()
+                for v in self.adjacency[u]:
+                    if predecessors[v] == -1:
+                        predecessors[v] = u
+                        queue.append(v)
+            self.predecessors[source] = predecessors
+            return predecessors
+
+
+    def path(self, source, target):
+        """
+        :return: the token ids of the shortest path from source to target, both
+            included, or None if target is not reachable
+        :rtype: list[int]
+        """
+        predecessors = self.predecessors_from(source)
+        if predecessors[target] == -1:
+            return None
+        path = [target]
+        while target != source:
+            target = predecessors[target]
+            path.append(target)
+        path.reverse()
+        return path
+
+
+def get_path(token_from, token_to, part, sentence_id, graphs=None):
+    """
+    Drop-in replacement for nalaf.utils.graph.get_path, returning the same
+    paths: the tokens of the shortest dependency path from token_from to
+    token_to, both included, or [] if they are the same token or not connected.
+
+    The DependencyGraph of each sentence is kept in graphs, under the key
+    (part.text, sentence_id), for all the paths of the sentence.
+
+    Dependency parses are trees, where there is at most one shortest path. For
+    the rare graphs with cycles, where equally short paths may exist, the path
+    is computed by nalaf's get_path, so the tie is broken the same way.
+
+    :type token_from: nalaf.structures.data.Token
+    :type token_to: nalaf.structures.data.Token
+    :type part: nalaf.structures.data.Part
+    :type sentence_id: int
+    :param graphs: the cache of the sentence graphs
+    :type graphs: dict
+    :rtype: list[nalaf.structures.data.Token]
+    """
+    if graphs is None:
+        graphs = {}
+
+    sentence = part.sentences[sentence_id]
+    key = (part.text, sentence_id)
+    try:
+        graph = graphs[key]
+    except KeyError:
+        graph = graphs[key] = DependencyGraph(sentence)
+
+    if not graph.is_forest:
+        from nalaf.utils.graph import get_path as floyd_warshall_get_path
+        return floyd_warshall_get_path(token_from, token_to, part, sentence_id, graphs)
+
+    if token_from.features['id'] == token_to.features['id']:
+        return []
+
+    path = graph.path(token_from.features['id'], token_to.features['id'])
+    if path is None:
+        return []
+    return [sentence[token_id] for token_id in path]
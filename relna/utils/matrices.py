@@ -0,0 +1,42 @@
+from itertools import chain
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def edge_feature_matrix(edges, n_columns=None):
+    """
+    Build the sparse edge × feature matrix of the given edges: row i holds the
+    features of the i-th edge, column j the feature with index j.
+
+    :param edges: the edges whose features (keyed by feature index) are read
+    :type edges: list[nalaf.structures.data.Edge]
+    :param n_columns: the number of columns of the matrix; feature indices
+        greater or equal are left out. By default, the highest index + 1
+    :type n_columns: int
+    :rtype: scipy.sparse.csr_matrix
+    """
+    lengths = np.fromiter((len(edge.features) for edge in edges), dtype=np.int64, count=len(edges))
+    n_values = int(lengths.sum())
+    indices = np.fromiter(chain.from_iterable(edge.features.keys() for edge in edges), dtype=np.int64, count=n_values)
+    values = np.fromiter(chain.from_iterable(edge.features.values() for edge in edges), dtype=np.float64, count=n_values)
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+
+    if n_columns is None:
+        n_columns = int(indices.max()) + 1 if n_values else 1
+    else:
+        kept = (indices >= 0) & (indices < n_columns)
+        if not kept.all():
+            rows = np.repeat(np.arange(len(edges)), lengths)
+            indptr = np.concatenate(([0], np.cumsum(np.bincount(rows[kept], minlength=len(edges)))))
+            indices = indices[kept]
+            values = values[kept]
+
+    return csr_matrix((values, indices, indptr), shape=(len(edges), n_columns))
+
+
+def edge_labels(edges):
+    """
+    :return: the real target of each edge, 0 if it has none
+    :rtype: numpy.ndarray
+    """
+    return np.fromiter((edge.real_target or 0 for edge in edges), dtype=np.int64, count=len(edges))
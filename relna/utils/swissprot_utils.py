@@ -1,23 +1,39 @@
 import requests
 
 from itertools import chain
-from nalaf.utils.cache import Cacheable
+from relna.utils.cache import PersistentCacheable
 
-class Swissprot(Cacheable):
+class Swissprot(PersistentCacheable):
     """
     Helper class that accesses the database identifier mapping service from Swissprot.
     and returns a list of 2-tuple with the requested geneid and the corresponding Uniprot ID.
     It defaults to Uniprot ID if the corresponding Swissprot entry is not found.
+
+    :param uniprot_url: the url of the Uniprot query service, can be changed to use a mirror
+    :type uniprot_url: str
+    :param batch_size: the number of gene ids resolved with a single query; 1 to query them one by one
+    :type batch_size: int
     """
 
-    def __init__(self):
+    def __init__(self, uniprot_url='http://www.uniprot.org/uniprot/', batch_size=50):
         super().__init__()
-        self.url = 'http://www.uniprot.org/uniprot/?query=database%3A%28type%3Ageneid+id%3A{}%29+AND+reviewed%3A{}&sort=score&format=list'
+        self.uniprot_url = uniprot_url
+        """the url of the Uniprot query service"""
+        self.batch_size = batch_size
+        """the number of gene ids resolved with a single query"""
 
 
     def get_uniprotid_for_entrez_geneid(self, list_geneids):
         """
         Get dictionary mapping from { EntrezGeneID : [ UniprotID, ... ]
+
+        Each gene id is mapped to its best Swissprot (reviewed) entry, or to its
+        best unreviewed entry if it has none. The best entry is the one with the
+        highest Uniprot annotation score, then the lowest accession: unlike the
+        relevance score of a search, it does not depend on the query, so the
+        same entry is taken whether the gene ids are queried one by one or in
+        batches.
+
         :param list_geneids:
         :type list_geneids: [int] or [str] or int or str
         :return: dictionary geneid --> uniprotid-list
@@ -27,20 +43,101 @@ class Swissprot(Cacheable):
 
         for geneid in list_geneids:
             geneid = str(geneid)
-            if geneid in self.cache:
-                return_dict[geneid] = self.cache[geneid]
-            else:
+            cached = self.cache.get(geneid)
+            if cached is not None:
+                return_dict[geneid] = cached
+            elif geneid not in to_be_downloaded:
                 to_be_downloaded.append(geneid)
 
         if len(to_be_downloaded) == 0:
             return return_dict
 
-        for geneid in to_be_downloaded:
-            r = requests.get(self.url.format(geneid, 'yes'))
-            if r.text=='':
-                r = requests.get(self.url.format(geneid, 'no'))
-            if r.text!='':
-                return_dict[geneid] = [r.text.splitlines()[0]]
-                self.cache[geneid] = return_dict[geneid]
+        if self.batch_size > 1:
+            downloaded = self.download_batches(to_be_downloaded)
+        else:
+            downloaded = self.download_one_by_one(to_be_downloaded)
+
+        return_dict.update(downloaded)
+        self.cache.update(downloaded)
+
+        return return_dict
+
 
+    def download_one_by_one(self, geneids):
+        """
+        Query the Swissprot (reviewed) entries of each gene id and fall back to
+        the unreviewed entries if there is none.
+
+        :type geneids: list[str]
+        :return: dictionary geneid --> uniprotid-list for the gene ids found
+        """
+        return_dict = {}
+        for geneid in geneids:
+            found = self.query_batch([geneid], 'yes')
+            if not found:
+                found = self.query_batch([geneid], 'no')
+            return_dict.update(found)
         return return_dict
+
+
+    def download_batches(self, geneids):
+        """
+        Same as download_one_by_one, but resolving batch_size gene ids per query:
+        first all of them against the reviewed entries and then the ones not
+        found against the unreviewed entries.
+
+        :type geneids: list[str]
+        :return: dictionary geneid --> uniprotid-list for the gene ids found
+        """
+        return_dict = {}
+        for start in range(0, len(geneids), self.batch_size):
+            batch = geneids[start:start + self.batch_size]
+            return_dict.update(self.query_batch(batch, 'yes'))
+            missing = [geneid for geneid in batch if geneid not in return_dict]
+            if missing:
+                return_dict.update(self.query_batch(missing, 'no'))
+        return return_dict
+
+
+    def query_batch(self, geneids, reviewed):
+        """
+        Query the entries cross-referenced to any of the gene ids and take for
+        each gene id its best entry (see get_uniprotid_for_entrez_geneid).
+
+        :param reviewed: 'yes' for Swissprot entries, 'no' for TrEMBL entries
+        :type reviewed: str
+        :return: dictionary geneid --> uniprotid-list for the gene ids found
+        """
+        query = ' OR '.join('database:(type:geneid id:{})'.format(geneid) for geneid in geneids)
+        r = requests.get(self.uniprot_url, params={
+            'query': '({}) AND reviewed:{}'.format(query, reviewed),
+            'format': 'tab',
+            'columns': 'id,annotation score,database(GeneID)'
+        })
+        return best_entries(r.text, geneids)
+
+
+def best_entries(tab_text, geneids):
+    """
+    :param tab_text: the tab format answer of Uniprot, with the columns entry,
+        annotation score (e.g. '5 out of 5') and cross-referenced gene ids
+    :type tab_text: str
+    :return: dictionary geneid --> [the accession of its entry with the highest
+        annotation score, then the lowest accession] for the gene ids found
+    """
+    best = {}
+    requested = set(geneids)
+    for line in tab_text.splitlines()[1:]:
+        columns = line.split('\t')
+        if len(columns) < 3:
+            continue
+        uniprotid, annotation_score, xrefs = columns[:3]
+        try:
+            rank = (-int(annotation_score.split()[0]), uniprotid)
+        except (IndexError, ValueError):
+            rank = (0, uniprotid)
+        for geneid in xrefs.split(';'):
+            geneid = geneid.strip()
+            if geneid in requested and (geneid not in best or rank < best[geneid]):
+                best[geneid] = rank
+    return {geneid: [rank[1]] for geneid, rank in best.items()}
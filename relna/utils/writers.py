@@ -1,3 +1,4 @@
+import json
 from itertools import chain
 import sys
 import os
@@ -69,3 +70,58 @@ class RelnaConsoleWriter:
         if not supported_platform or not is_a_tty:
             return False
         return True
+
+
+class RelnaJsonWriter:
+    """
+    Converts the predicted or true annotations and relations of a dataset into
+    JSON, with the same content as RelnaConsoleWriter: for each part, its text,
+    the entities (offsets, text, class and normalizations) and the relations.
+    """
+
+    def to_dict(self, dataset):
+        """
+        :type dataset: nalaf.structures.data.Dataset()
+        :return: a JSON serializable dictionary
+        :rtype: dict
+        """
+        documents = []
+        for doc_id, doc in dataset.documents.items():
+            parts = []
+            for part_id, part in doc.parts.items():
+                parts.append({
+                    'id': part_id,
+                    'text': part.text,
+                    'entities': [self.entity_to_dict(ann) for ann in
+                                 sorted(chain(part.predicted_annotations, part.annotations), key=lambda x: x.offset)],
+                    'relations': [self.relation_to_dict(rel) for rel in chain(part.relations, part.predicted_relations)]
+                })
+            documents.append({'id': doc_id, 'parts': parts})
+        return {'documents': documents}
+
+
+    def write(self, dataset, file=sys.stdout):
+        json.dump(self.to_dict(dataset), file)
+
+
+    @staticmethod
+    def entity_to_dict(ann):
+        return {
+            'class_id': ann.class_id,
+            'type': {MUT_CLASS_ID: 'Mutation', PRO_CLASS_ID: 'GGP'}.get(ann.class_id, ann.class_id),
+            'start': ann.offset,
+            'end': ann.offset + len(ann.text),
+            'text': ann.text,
+            'norms': getattr(ann, 'norms', {})
+        }
+
+
+    @staticmethod
+    def relation_to_dict(rel):
+        return {
+            'class_id': rel.class_id,
+            'start1': rel.start1,
+            'text1': rel.text1,
+            'start2': rel.start2,
+            'text2': rel.text2
+        }
@@ -35,6 +35,8 @@ setup(
 
     install_requires=[
         # 'nalaf',
+        'numpy',
+        'scipy',
         'spacy',
         'ujson'  # It should be included with spacy, AFAIK
     ]
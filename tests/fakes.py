@@ -0,0 +1,141 @@
+"""
+Minimal stand-ins for nalaf.structures.data, with only the attributes that relna
+reads, so that the tests of the learning modules run without nalaf.
+"""
+import random
+from collections import OrderedDict
+
+
+class Entity:
+    def __init__(self, class_id, offset, text):
+        self.class_id = class_id
+        self.offset = offset
+        self.text = text
+
+
+class Token:
+    def __init__(self, word, start):
+        self.word = word
+        self.start = start
+        self.end = start + len(word)
+        self.features = {}
+
+
+class Edge:
+    def __init__(self, features=None, real_target=None, words=(), entity1=None, entity2=None, part=None, sentence_id=None):
+        self.features = {} if features is None else features
+        self.real_target = real_target
+        self.pred_target = None
+        self.words = list(words)
+        """the words between the entities, for the fake feature generators of the tests"""
+        self.entity1 = entity1
+        self.entity2 = entity2
+        self.same_part = part
+        self.same_sentence_id = sentence_id
+
+
+class Part:
+    def __init__(self, text='', annotations=(), edges=()):
+        self.text = text
+        self.annotations = list(annotations)
+        self.predicted_annotations = []
+        self.relations = []
+        self.edges = list(edges)
+        self.sentences = []
+
+
+    def get_entities_in_sentence(self, sentence_id, class_id):
+        sentence = self.sentences[sentence_id]
+        return [ann for ann in self.annotations
+                if sentence[0].start <= ann.offset < sentence[-1].end and ann.class_id == class_id]
+
+
+    def get_sentence_string_array(self):
+        return [' '.join(token.word for token in sentence) for sentence in self.sentences]
+
+
+class Document:
+    def __init__(self, parts=()):
+        self.parts = OrderedDict(parts)
+
+
+class Dataset:
+    def __init__(self, documents=()):
+        self.documents = OrderedDict(documents)
+
+
+    def edges(self):
+        for document in self.documents.values():
+            for part in document.parts.values():
+                yield from part.edges
+
+
+    def form_predicted_relations(self):
+        return [edge for edge in self.edges() if edge.pred_target == 1]
+
+
+def edge_dataset(edges):
+    """
+    :return: a dataset of a single document with a single part, with the given edges
+    :rtype: tests.fakes.Dataset
+    """
+    return Dataset([('doc', Document([('abstract', Part(edges=edges))]))])
+
+
+WORDS = ['the', 'protein', 'binds', 'interacts', 'with', 'in', 'found', 'location', 'localizes', 'complex',
+         'mediates', 'of', 'and', ',', '.', 'coactivator', 'cells', 'Binding', 'expression', 'is', 'a']
+GENES = ['p53', 'AR', 'Ubc9', 'TP53-2', 'NF/kB', 'STAT3', 'c-Jun', 'SP1', 'Protein-X', 'CREB']
+POS = ['NN', 'VB', 'IN', 'DT', 'JJ', 'NNP', ',', '.']
+DEPS = ['nsubj', 'dobj', 'prep', 'pobj', 'det', 'amod', 'conj', 'cc', 'punct']
+
+
+def parsed_dataset(n_docs=3, seed=1, class1='e_1', class2='e_2'):
+    """
+    :return: a dataset of random parsed sentences (random dependency trees), with
+        an edge for every pair of a class1 entity and a class2 entity of a sentence,
+        for the feature generators of relna
+    :rtype: tests.fakes.Dataset
+    """
+    rnd = random.Random(seed)
+    documents = []
+    for doc_index in range(n_docs):
+        parts = []
+        for part_index in range(2):
+            part = Part()
+            for sentence_id in range(rnd.randint(2, 4)):
+                sentence = []
+                entities = []
+                length = rnd.randint(6, 18)
+                for token_id in range(length):
+                    is_entity = rnd.random() < 0.25 and token_id < length - 2
+                    token = Token(rnd.choice(GENES if is_entity else WORDS), len(part.text))
+                    part.text += token.word + ' '
+                    token.features.update(id=token_id, pos=rnd.choice(POS), dep=rnd.choice(DEPS),
+                                          is_punct=token.word in ',.', dependency_to=[])
+                    sentence.append(token)
+                    if is_entity:
+                        entity = Entity(rnd.choice([class1, class2]), token.start, token.word)
+                        entity.head_token = token
+                        entities.append(entity)
+
+                # every token but the root hangs from one already in the tree
+                root = rnd.randrange(length)
+                sentence[root].features['dependency_from'] = (sentence[root], 'ROOT')
+                placed = [sentence[root]]
+                for token in rnd.sample([token for token in sentence if token is not sentence[root]], length - 1):
+                    parent = rnd.choice(placed)
+                    dep = rnd.choice(DEPS)
+                    token.features['dependency_from'] = (parent, dep)
+                    parent.features['dependency_to'].append((token, dep))
+                    placed.append(token)
+
+                part.sentences.append(sentence)
+                part.annotations.extend(entities)
+                for entity1 in entities:
+                    for entity2 in entities:
+                        if entity1.class_id == class1 and entity2.class_id == class2:
+                            part.edges.append(Edge(real_target=rnd.choice([-1, 1]), entity1=entity1, entity2=entity2,
+                                                   part=part, sentence_id=sentence_id))
+            parts.append(('p{}'.format(part_index), part))
+        documents.append(('doc{}'.format(doc_index), Document(parts)))
+    return Dataset(documents)
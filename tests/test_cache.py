@@ -0,0 +1,36 @@
+import os
+import tempfile
+import time
+from relna.utils.cache import PersistentCache
+
+
+def test_persistent_cache_is_shared_expires_and_evicts():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cache.sqlite3')
+
+        writer = PersistentCache('Swissprot', path, ttl=None, max_entries=3)
+        writer['1'] = ['P04637']
+        writer.update({'2': ['P10275'], '3': ['P10276']})
+
+        reader = PersistentCache('Swissprot', path, ttl=None, max_entries=3)
+        assert reader.get('1') == ['P04637']
+        assert reader.get('4') is None
+        assert reader.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'evictions': 0}
+
+        # '2' is now the least recently used entry
+        time.sleep(0.01)
+        reader.get('3')
+        writer['4'] = ['A0A024']
+        assert sorted(writer) == ['1', '3', '4']
+        assert writer.evictions == 1
+
+        assert PersistentCache('GOTerms', path).get('1') is None
+
+        expiring = PersistentCache('Swissprot', path, ttl=0.05, max_entries=3)
+        time.sleep(0.1)
+        assert '1' not in expiring
+        assert expiring.get('1') is None
+        assert len(expiring) == 0
+
+        for cache in (writer, reader, expiring):
+            cache.close()
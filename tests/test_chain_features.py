@@ -0,0 +1,89 @@
+import pytest
+
+pytest.importorskip('nalaf')
+
+from relna.features.entityhead import EntityHeadTokenChainFeatureGenerator
+from relna.features.hashing import HashedFeatureSpace
+
+
+class Token:
+    def __init__(self, token_id, word, pos, dep):
+        self.word = word
+        self.start = token_id
+        self.features = {'id': token_id, 'pos': pos, 'dep': dep, 'dependency_to': []}
+
+
+class Entities:
+    def __init__(self, entity_tokens):
+        self.entity_tokens = entity_tokens
+
+    def is_entity_part(self, token):
+        return token.features['id'] in self.entity_tokens
+
+    def get_entity(self, token):
+        return Entity()
+
+    def masked_text(self, token):
+        return 'ENTITY' if self.is_entity_part(token) else token.word
+
+
+class Entity:
+    class_id = 'e_1'
+
+
+class Context:
+    def __init__(self, entities):
+        self.entities = entities
+
+
+class Edge:
+    def __init__(self):
+        self.features = {}
+
+
+class RecordingFeatureSpace(HashedFeatureSpace):
+    def __init__(self, bits):
+        super().__init__(bits)
+        self.keys_added = []
+
+    def add(self, edge, key, value=1):
+        self.keys_added.append(key)
+        super().add(edge, key, value)
+
+
+def sentence():
+    """
+    interacts (root) --> Ubc9, receptor --> the, androgen, (AR)
+    """
+    words = [('Ubc9', 'NN', 'nsubj', 1), ('interacts', 'VBZ', 'ROOT', 1), ('the', 'DT', 'det', 4),
+             ('androgen', 'NN', 'amod', 4), ('receptor', 'NN', 'dobj', 1), ('AR', 'NN', 'appos', 4)]
+    tokens = [Token(token_id, word, pos, dep) for token_id, (word, pos, dep, _) in enumerate(words)]
+    for token, (_, _, dep, head) in zip(tokens, words):
+        token.features['dependency_from'] = (tokens[head], dep)
+        if tokens[head] is not token:
+            tokens[head].features['dependency_to'].append((token, dep))
+    return tokens
+
+
+@pytest.mark.parametrize('depth', [0, 1, 2, 3, 4])
+def test_chain_features_as_build_chains(depth):
+    generator = EntityHeadTokenChainFeatureGenerator(depth=depth)
+    tokens = sentence()
+    context = Context(Entities({0, 4, 5}))
+
+    for head in (tokens[0], tokens[4]):
+        feature_set = {}
+        edge = Edge()
+        generator.build_chains(head, tokens, edge, 'entity1_', '', depth, feature_set, True, context)
+
+        features = generator.chain_features(head, 'entity1_', context, {})
+        assert list(features) == list(feature_set)
+        assert set(features.values()) <= {1}
+
+        # in hashed mode, the same features with structured keys instead of names
+        feature_space = RecordingFeatureSpace(bits=20)
+        generator.build_chains(head, tokens, Edge(), 'entity1_', '', depth, feature_space, True, context)
+        features = generator.chain_features(head, 'entity1_', context, feature_space)
+        assert all(isinstance(key, tuple) for key in features)
+        assert list(features) == list(dict.fromkeys(feature_space.keys_added))
+        assert [template.format(*parts) for template, parts in features] == list(feature_set)
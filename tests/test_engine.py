@@ -0,0 +1,97 @@
+import pytest
+
+from tests.fakes import Dataset, Edge, Entity, Part, Token, parsed_dataset
+
+pytest.importorskip('nalaf')
+pytest.importorskip('nltk')
+
+from relna.features.engine import EdgeContext, RawFeatureCache, SentenceFeatureCache
+from relna.features.hashing import HashedFeatureSpace
+from relna.learning.taggers import RelnaRelationExtractor
+
+
+def generate(fused, training_set, test_set):
+    feature_set = {}
+    for generator in RelnaRelationExtractor.default_feature_generators('e_1', 'e_2', fused=fused):
+        generator.generate(training_set, feature_set, True)
+    for generator in RelnaRelationExtractor.default_feature_generators('e_1', 'e_2', fused=fused):
+        generator.generate(test_set, feature_set, False)
+    return feature_set, [dict(edge.features) for edge in training_set.edges()], \
+        [dict(edge.features) for edge in test_set.edges()]
+
+
+def test_fused_and_unfused_generators_give_the_same_features():
+    fused = generate(True, parsed_dataset(seed=1), parsed_dataset(seed=2))
+    unfused = generate(False, parsed_dataset(seed=1), parsed_dataset(seed=2))
+
+    feature_set, training_edges, test_edges = unfused
+    assert len(feature_set) > 0 and any(training_edges) and any(test_edges)
+    assert fused == unfused
+
+
+def test_sentence_features_are_computed_once_per_sentence():
+    part = Part()
+    sentence = []
+    for token_id, word in enumerate(['AR', 'and', 'p53', 'bind', 'Ubc9', ',', 'SP1', 'and', 'CREB']):
+        token = Token(word, len(part.text))
+        token.features['id'] = token_id
+        part.text += word + ' '
+        sentence.append(token)
+    part.sentences.append(sentence)
+    for token in sentence:
+        if token.word not in ('and', 'bind', ','):
+            entity = Entity('e_1' if token.features['id'] < 3 else 'e_2', token.start, token.word)
+            entity.head_token = token
+            part.annotations.append(entity)
+    proteins = [entity for entity in part.annotations if entity.class_id == 'e_1']
+    locations = [entity for entity in part.annotations if entity.class_id == 'e_2']
+    part.edges = [Edge(entity1=protein, entity2=location, part=part, sentence_id=0)
+                  for protein in proteins for location in locations]
+
+    computed = []
+    sentence_cache = SentenceFeatureCache()
+    for edge in part.edges:
+        context = EdgeContext(edge, sentence_cache)
+        assert context.sentence_features('words', lambda: computed.append(edge) or len(context.sentence)) == 9
+
+    assert len(computed) == 1
+    assert sentence_cache.stats() == {'hits': 2 * 3 - 1, 'misses': 1, 'hit_rate': 5 / 6}
+
+
+def folds(dataset, k):
+    doc_ids = list(dataset.documents)
+    for fold in range(k):
+        training_set = Dataset((doc_id, dataset.documents[doc_id]) for index, doc_id in enumerate(doc_ids) if index % k != fold)
+        validation_set = Dataset((doc_id, dataset.documents[doc_id]) for index, doc_id in enumerate(doc_ids) if index % k == fold)
+        yield training_set, validation_set
+
+
+@pytest.mark.parametrize('feature_bits', [None, 12])
+def test_raw_feature_cache_gives_the_features_of_every_fold(feature_bits):
+    def new_feature_set():
+        return HashedFeatureSpace(feature_bits) if feature_bits else {}
+
+    cached_dataset = parsed_dataset(n_docs=4)
+    engine = RelnaRelationExtractor.default_feature_generators('e_1', 'e_2', fused=True)[0]
+    feature_cache = RawFeatureCache(engine, new_feature_set() if feature_bits else None)
+    feature_cache.fill(cached_dataset)
+
+    for (training_set, validation_set), (cached_training_set, cached_validation_set) in \
+            zip(folds(parsed_dataset(n_docs=4), 3), folds(cached_dataset, 3)):
+        # as the pipeline, which generates the edges of every fold anew
+        for dataset in (training_set, validation_set):
+            for edge in dataset.edges():
+                edge.features = {}
+        feature_set = new_feature_set()
+        engine = RelnaRelationExtractor.default_feature_generators('e_1', 'e_2', fused=True)[0]
+        engine.generate(training_set, feature_set, True)
+        engine.generate(validation_set, feature_set, False)
+
+        cached_feature_set = new_feature_set()
+        feature_cache.apply(cached_training_set, cached_feature_set, True)
+        feature_cache.apply(cached_validation_set, cached_feature_set, False)
+
+        if not feature_bits:
+            assert cached_feature_set == feature_set
+        for dataset, cached in ((training_set, cached_training_set), (validation_set, cached_validation_set)):
+            assert [edge.features for edge in cached.edges()] == [edge.features for edge in dataset.edges()]
@@ -0,0 +1,73 @@
+from relna.features.entities import PartEntityIndex
+
+
+class Entity:
+    def __init__(self, class_id, offset, text):
+        self.class_id = class_id
+        self.offset = offset
+        self.text = text
+
+
+class Token:
+    def __init__(self, word, start):
+        self.word = word
+        self.start = start
+
+    def get_entity(self, part):
+        for ann in part.annotations:
+            if ann.offset <= self.start < ann.offset + len(ann.text):
+                return ann
+        return None
+
+    def masked_text(self, part):
+        entity = self.get_entity(part)
+        return self.word if entity is None else entity.class_id
+
+
+class Part:
+    def __init__(self, text, annotations):
+        self.text = text
+        self.annotations = annotations
+        self.predicted_annotations = []
+
+
+def test_part_entity_index_as_token_lookups():
+    text = 'Ubc9 interacts with the androgen receptor (AR) in cells'
+    # overlapping annotations: the first one containing a token wins
+    annotations = [Entity('e_1', 0, 'Ubc9'), Entity('e_2', 24, 'androgen receptor'), Entity('e_1', 33, 'receptor (AR)'),
+                   Entity('e_2', 43, 'AR'), Entity('e_1', 50, '')]
+    part = Part(text, annotations)
+    tokens = []
+    start = 0
+    for word in text.split(' '):
+        tokens.append(Token(word, start))
+        start += len(word) + 1
+
+    index = PartEntityIndex.of(part)
+    for token in tokens + [Token('', -1), Token('', len(text) + 5)]:
+        assert index.get_entity(token) is token.get_entity(part)
+        assert index.is_entity_part(token) == (token.get_entity(part) is not None)
+        assert index.masked_text(token) == token.masked_text(part)
+
+
+def test_part_entity_index_invalidation():
+    part = Part('Ubc9 interacts with AR', [Entity('e_1', 0, 'Ubc9')])
+    ubc9, ar = Token('Ubc9', 0), Token('AR', 20)
+
+    index = PartEntityIndex.of(part)
+    assert PartEntityIndex.of(part) is index
+    assert index.get_entity(ubc9) is part.annotations[0] and not index.is_entity_part(ar)
+
+    part.annotations.append(Entity('e_2', 20, 'AR'))
+    assert PartEntityIndex.of(part) is not index
+    assert PartEntityIndex.of(part).masked_text(ar) == 'e_2'
+
+    part.annotations = [Entity('e_2', 20, 'AR')]
+    assert PartEntityIndex.of(part).get_entity(ubc9) is None
+
+    # edits in place are only seen by a new index
+    part.annotations[0].offset = 0
+    part.annotations[0].text = 'Ubc9'
+    assert PartEntityIndex.of(part).get_entity(ubc9) is None
+    assert PartEntityIndex.build(part).get_entity(ubc9) is part.annotations[0]
+    assert PartEntityIndex.of(part).get_entity(ubc9) is part.annotations[0]
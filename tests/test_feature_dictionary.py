@@ -0,0 +1,26 @@
+import os
+import pickle
+import tempfile
+from relna.utils.feature_dictionary import write_feature_dictionary, load_feature_set, MappedFeatureDictionary
+
+
+def test_mapped_feature_dictionary_same_as_pickle():
+    feature_set = {'{}_bow_word_{}_[0]'.format(index % 40, index): index + 1 for index in range(5000)}
+    feature_set['69_gov_site_promoter_β_[0]'] = 5001
+
+    with tempfile.TemporaryDirectory() as directory:
+        pickle_path = os.path.join(directory, 'features.pickle')
+        with open(pickle_path, 'wb') as file:
+            pickle.dump(feature_set, file)
+        fdict_path = os.path.join(directory, 'features.fdict')
+        write_feature_dictionary(load_feature_set(pickle_path), fdict_path)
+
+        mapped = load_feature_set(fdict_path)
+        assert isinstance(mapped, MappedFeatureDictionary)
+        assert len(mapped) == len(feature_set)
+        assert dict(mapped.items()) == feature_set
+        assert all(mapped[feature_name] == index for feature_name, index in feature_set.items())
+        assert all(mapped.lookup(feature_name) == index for feature_name, index in feature_set.items())
+        assert 'bow_unseen_[0]' not in mapped and mapped.get('bow_unseen_[0]') is None
+        assert pickle.loads(pickle.dumps(mapped))['69_gov_site_promoter_β_[0]'] == 5001
+        mapped.close()
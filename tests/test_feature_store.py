@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from relna.learning.feature_store import FeatureStore
+from tests.fakes import Edge, Part, Document, Dataset
+
+
+class _StagedSet:
+    def __init__(self):
+        self.names = OrderedDict()
+
+
+class _Engine:
+    """
+    A single generator with the feature name 'N_word' for every word of an edge.
+    """
+    def __init__(self):
+        self.staged = 0
+
+    def stage(self, dataset, feature_set):
+        staged_set = _StagedSet()
+        for edge in dataset.edges():
+            self.staged += 1
+            for word in edge.words:
+                feature_name = '1_' + word
+                staged_set.names[feature_name] = None
+                edge.features[feature_name] = 1
+        return [staged_set]
+
+    def register(self, feature_set, staged_runs):
+        for staged_names in staged_runs:
+            for feature_name in staged_names[0]:
+                if feature_name not in feature_set:
+                    feature_set[feature_name] = len(feature_set) + 1
+
+
+def document(text, edges):
+    return Document([('abstract', Part(text, edges=edges))])
+
+
+def corpus(third_text='Ubc9 binds AR.'):
+    return Dataset([
+        ('1', document('Ubc9 interacts with AR.', [Edge(real_target=1, words=['interacts', 'with'])])),
+        ('2', document('p53 is a protein.', [Edge(real_target=-1, words=['is', 'a']),
+                                             Edge(real_target=-1, words=['a', 'protein'])])),
+        ('3', document(third_text, [Edge(real_target=1, words=third_text.split()[1:2])])),
+    ])
+
+
+def test_feature_store(tmpdir):
+    store = FeatureStore(str(tmpdir))
+    engine = _Engine()
+    preprocessed = []
+
+    keys = store.update(corpus(), engine, preprocess=lambda dataset: preprocessed.extend(dataset.documents))
+    assert (store.hits, store.misses, preprocessed, engine.staged) == (0, 3, ['1', '2', '3'], 4)
+
+    feature_set = {}
+    training_set = store.training_set(keys, feature_set, engine)
+    assert feature_set == {'1_interacts': 1, '1_with': 2, '1_is': 3, '1_a': 4, '1_protein': 5, '1_binds': 6}
+    assert [(edge.features, edge.real_target) for edge in training_set.edges()] == \
+        [({1: 1, 2: 1}, 1), ({3: 1, 4: 1}, -1), ({4: 1, 5: 1}, -1), ({6: 1}, 1)]
+
+    # a new store on the same directory only featurizes the changed document
+    store = FeatureStore(str(tmpdir))
+    preprocessed = []
+    keys = store.update(corpus('Ubc9 colocalizes AR.'), engine, preprocess=lambda dataset: preprocessed.extend(dataset.documents))
+    assert (store.hits, store.misses, preprocessed) == (2, 1, ['3'])
+
+    feature_set = {}
+    training_set = store.training_set(keys, feature_set, engine)
+    assert feature_set['1_colocalizes'] == 6 and '1_binds' not in feature_set
+    assert [edge.features for edge in training_set.edges()][-1] == {6: 1}
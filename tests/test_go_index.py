@@ -0,0 +1,62 @@
+import gzip
+import os
+import tempfile
+from relna.utils.go_index import read_gaf, read_uniprot, build_index
+from relna.utils.go_utils import GOTerms
+
+
+GAF = """!gaf-version: 2.1
+UniProtKB\tP04637\tP53\t\tGO:0003700\tPMID:1\tIDA\t\tF\tp53\t\tprotein\ttaxon:9606\t20150101\tUniProt
+UniProtKB\tP04637\tP53\tNOT\tGO:0005739\tPMID:2\tIDA\t\tC\tp53\t\tprotein\ttaxon:9606\t20150101\tUniProt
+UniProtKB\tP10275\tAR\t\tGO:0005634\tPMID:3\tIDA\t\tC\tAR\t\tprotein\ttaxon:9606\t20150101\tUniProt
+UniProtKB\tP04637\tP53\t\tGO:0005634\tPMID:4\tIEA\t\tC\tp53\t\tprotein\ttaxon:9606\t20150101\tUniProt
+UniProtKB\tP04637\tP53\t\tGO:0003700\tPMID:5\tTAS\t\tF\tp53\t\tprotein\ttaxon:9606\t20150101\tUniProt
+"""
+
+UNIPROT = """ID   P53_HUMAN               Reviewed;         393 AA.
+AC   P04637; Q15086; Q15087;
+DR   GO; GO:0003700; F:transcription factor activity; IDA:UniProtKB.
+DR   GO; GO:0005634; C:nucleus; IDA:UniProtKB.
+DR   PDB; 1A1U; NMR; -; A=324-357.
+//
+ID   UBC9_HUMAN              Reviewed;         158 AA.
+AC   P63279;
+DR   Pfam; PF00179; UQ_con; 1.
+//
+"""
+
+
+def test_go_index_from_gaf_and_uniprot_dumps():
+    with tempfile.TemporaryDirectory() as directory:
+        gaf_path = os.path.join(directory, 'goa.gaf.gz')
+        with gzip.open(gaf_path, 'wt') as file:
+            file.write(GAF)
+        uniprot_path = os.path.join(directory, 'uniprot.dat')
+        with open(uniprot_path, 'w') as file:
+            file.write(UNIPROT)
+
+        build_index(read_gaf(gaf_path), os.path.join(directory, 'gaf_index'))
+        build_index(read_uniprot(uniprot_path), os.path.join(directory, 'uniprot_index'))
+
+        go = GOTerms(index_path=os.path.join(directory, 'gaf_index'))
+        assert go.get_goterms_for_uniprot_id(['P04637', 'P10275', 'P63279']) == {
+            'P04637': ['GO:0003700', 'GO:0005634'], 'P10275': ['GO:0005634'], 'P63279': []}
+
+        go = GOTerms(index_path=os.path.join(directory, 'uniprot_index'))
+        assert go.get_goterms_for_uniprot_id(['P04637', 'Q15087', 'P63279', 'P10275', 'TOO_LONG_ACCESSION']) == {
+            'P04637': ['GO:0003700', 'GO:0005634'], 'Q15087': ['GO:0003700', 'GO:0005634'], 'P63279': [],
+            'P10275': [], 'TOO_LONG_ACCESSION': []}
+        assert len(go.index) == 4
+
+
+def test_read_gaf_deduplicates_across_chunks():
+    with tempfile.TemporaryDirectory() as directory:
+        gaf_path = os.path.join(directory, 'goa.gaf')
+        with open(gaf_path, 'w') as file:
+            file.write(GAF)
+
+        for chunk_size in (1, 2, 1 << 24):
+            goterms = read_gaf(gaf_path, chunk_size=chunk_size)
+            assert goterms.accessions == ['P04637', 'P10275']
+            assert list(goterms.offsets) == [0, 2, 3]
+            assert list(goterms.goterms) == [3700, 5634, 5634]
@@ -0,0 +1,48 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from relna.utils.go_utils import GOTerms
+
+
+class StubUniprotHandler(BaseHTTPRequestHandler):
+    """
+    Answers the entry text of P04637, after failing as many requests as failures.
+    """
+    failures = 0
+
+    def do_GET(self):
+        if StubUniprotHandler.failures > 0:
+            StubUniprotHandler.failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            self.wfile.write(b'Service Unavailable')
+            return
+
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'ID   P53_HUMAN\nDR   GO; GO:0003700; F:transcription factor activity; IDA:UniProtKB.\n//\n')
+
+    def log_message(self, *args):
+        pass
+
+
+def test_failed_download_is_not_cached():
+    server = HTTPServer(('127.0.0.1', 0), StubUniprotHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    go = GOTerms()
+    go.url = 'http://127.0.0.1:{}/uniprot/{{}}.txt'.format(server.server_port)
+
+    try:
+        StubUniprotHandler.failures = 1
+        assert go.get_goterms_for_uniprot_id(['P04637']) == {'P04637': []}
+        assert 'P04637' not in go.cache
+
+        assert go.get_goterms_for_uniprot_id(['P04637']) == {'P04637': ['GO:0003700']}
+        assert go.cache['P04637'] == ['GO:0003700']
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # the port is closed now, but the answer is cached
+    assert go.get_goterms_for_uniprot_id(['P04637']) == {'P04637': ['GO:0003700']}
+    assert go.get_goterms_for_uniprot_id(['P10275']) == {'P10275': []}
+    assert 'P10275' not in go.cache
@@ -0,0 +1,37 @@
+from relna.utils.graph import get_path, DependencyGraph
+
+
+class Token:
+    def __init__(self, token_id):
+        self.word = 'w{}'.format(token_id)
+        self.features = {'id': token_id, 'dependency_to': []}
+
+
+class Part:
+    def __init__(self, sentence):
+        self.text = ' '.join(token.word for token in sentence)
+        self.sentences = [sentence]
+
+
+def test_get_path_on_dependency_tree():
+    # w2 is the root: w2 -> w1 -> w0 and w2 -> w4 -> w3
+    sentence = [Token(token_id) for token_id in range(5)]
+    for head, dependent in [(2, 1), (1, 0), (2, 4), (4, 3)]:
+        sentence[head].features['dependency_to'].append((sentence[dependent], 'dep'))
+    part = Part(sentence)
+    graphs = {}
+
+    def path(token_from, token_to):
+        return [token.word for token in get_path(sentence[token_from], sentence[token_to], part, 0, graphs)]
+
+    assert path(0, 3) == ['w0', 'w1', 'w2', 'w4', 'w3']
+    assert path(2, 0) == ['w2', 'w1', 'w0']
+    assert path(1, 1) == []
+    # as in nalaf, a dependent only links back to its head if it comes before it
+    assert path(3, 4) == ['w3', 'w4']
+    assert path(4, 2) == []
+    assert path(3, 0) == []
+
+    assert list(graphs) == [(part.text, 0)]
+    assert graphs[(part.text, 0)].is_forest
+    assert sorted(graphs[(part.text, 0)].predecessors) == [0, 2, 3, 4]
@@ -0,0 +1,32 @@
+from relna.features.hashing import HashedFeatureSpace, feature_key
+
+
+class Edge:
+    def __init__(self):
+        self.features = {}
+
+
+def test_hashed_feature_space():
+    feature_set = HashedFeatureSpace(bits=10)
+    names = ['57_dep_{}_{}_nsubj_[0]'.format(gram, k) for gram in ('tok', 'pos', 'stem') for k in range(200)]
+
+    hashes = [feature_set.hash(feature_name) for feature_name in names]
+    assert all(1 <= index <= 2 ** 10 and sign in (1, -1) for index, sign in hashes)
+    assert hashes == [HashedFeatureSpace(bits=10).hash(feature_name) for feature_name in names]
+    assert {sign for _, sign in hashes} == {1, -1}
+    assert len({index for index, _ in hashes}) > 400
+
+    key = feature_key(feature_set, '57_dep_{}_{}_{}_[0]', 'tok', 3, 'nsubj')
+    assert key == ('57_dep_{}_{}_{}_[0]', ('tok', 3, 'nsubj'))
+    assert feature_set.hash(key) == HashedFeatureSpace(bits=10).hash(('57_dep_{}_{}_{}_[0]', ('tok', '3', 'nsubj')))
+    assert feature_key({}, '57_dep_{}_{}_{}_[0]', 'tok', 3, 'nsubj') == '57_dep_tok_3_nsubj_[0]'
+    assert feature_key({}, '46_len_[0]') == '46_len_[0]'
+
+    assert 'never_seen' in feature_set and feature_set['never_seen'] == feature_set.hash('never_seen')[0]
+    assert set(feature_set.values()) == set(range(1, 2 ** 10 + 1))
+
+    edge = Edge()
+    feature_set.add(edge, names[0], 2)
+    feature_set.add(edge, names[0], 3)
+    index, sign = feature_set.hash(names[0])
+    assert edge.features == {index: sign * 3}
@@ -0,0 +1,72 @@
+import os
+import numpy as np
+from scipy.sparse import csr_matrix
+from relna.learning.instances import InstanceCache, instance_key, write_instances_file
+from relna.features.hashing import HashedFeatureSpace
+from tests.fakes import Entity, Part, Document, Dataset
+
+
+def dataset(text='Ubc9 interacts with AR.', offset=0):
+    return Dataset([('doc', Document([('abstract', Part(text, [Entity('e_1', offset, 'Ubc9')]))]))])
+
+
+def test_instance_key():
+    feature_set = {'1_bow_ubc9_[0]': 1, '1_bow_ar_[0]': 2}
+    key = instance_key(dataset(), feature_set, 'predict')
+    assert key == instance_key(dataset(), dict(feature_set), 'predict')
+    assert key != instance_key(dataset(text='Ubc9 binds AR.'), feature_set, 'predict')
+    assert key != instance_key(dataset(offset=1), feature_set, 'predict')
+    assert key != instance_key(dataset(), dict(feature_set, new=3), 'predict')
+    assert key != instance_key(dataset(), feature_set, 'train')
+    assert key != instance_key(dataset(), feature_set, 'predict', salt='v2')
+    assert instance_key(dataset(), HashedFeatureSpace(10), 'predict') != \
+        instance_key(dataset(), HashedFeatureSpace(12), 'predict')
+
+
+def test_instance_cache(tmpdir):
+    cache = InstanceCache(str(tmpdir))
+    matrix = csr_matrix(np.array([[0, 1, 0, 2.5], [1, 0, 0, 0], [0, 0, 0, 0]]))
+    labels = np.array([1, -1, -1])
+    key = cache.key(dataset(), {}, 'predict')
+
+    assert key not in cache and cache.get(key) is None
+    cache.put(key, matrix, labels)
+    assert key in cache
+    cached_matrix, cached_labels = cache.get(key)
+    assert (cached_matrix != matrix).nnz == 0 and cached_matrix.shape == matrix.shape
+    assert list(cached_labels) == [1, -1, -1]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert [name for name in tmpdir.listdir() if not name.basename.endswith('.npz')] == []
+
+
+class CountingFeatureSet(dict):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.fingerprinted = 0
+
+    def items(self):
+        self.fingerprinted += 1
+        return super().items()
+
+
+def test_instance_cache_fingerprints_the_feature_set_once(tmpdir):
+    cache = InstanceCache(str(tmpdir))
+    feature_set = CountingFeatureSet({'1_bow_ubc9_[0]': 1})
+
+    key = cache.key(dataset(), feature_set, 'predict')
+    assert key == instance_key(dataset(), {'1_bow_ubc9_[0]': 1}, 'predict')
+    assert cache.key(dataset(text='Ubc9 binds AR.'), feature_set, 'predict') != key
+    assert feature_set.fingerprinted == 1
+
+    feature_set['1_bow_ar_[0]'] = 2
+    assert cache.key(dataset(), feature_set, 'predict') != key
+    assert feature_set.fingerprinted == 2
+
+
+def test_write_instances_file():
+    matrix = csr_matrix(np.array([[0, 1, 0, 2.5], [1, 0, 0, 0], [0, 0, 3, 0]]))
+    labels = np.array([1, -1, -1])
+
+    with write_instances_file(matrix, labels, parse_trees=['(S a)', '(S b)', '(S c)']) as file:
+        assert open(file.name).read() == '1 |BT| (S a) |ET| 1:1 3:2.5\n-1 |BT| (S b) |ET| 0:1\n-1 |BT| (S c) |ET| 2:3\n'
+    os.remove(file.name)
@@ -0,0 +1,69 @@
+import random
+import numpy as np
+from relna.learning.linear import LinearSVMLearner, LinearSVMScorer, train_linear_svm
+from relna.utils.matrices import edge_feature_matrix
+from tests.fakes import Edge, edge_dataset
+
+
+def synthetic_dataset(n_edges, seed):
+    rand = random.Random(seed)
+    edges = []
+    for _ in range(n_edges):
+        real_target = rand.choice([1, -1, -1])
+        features = {index: 1 for index in rand.sample(range(3, 40), 5)}
+        features[1 if real_target == 1 else 2] = 1
+        edges.append(Edge(features, real_target))
+    return edge_dataset(edges)
+
+
+def test_linear_learner_separates_and_exports_the_model(tmpdir):
+    dataset = synthetic_dataset(300, seed=1)
+    feature_set = {'feature_{}'.format(index): index for index in range(1, 40)}
+    learner = LinearSVMLearner(model_path=str(tmpdir.join('model')))
+
+    instances = learner.create_input_file(dataset, 'train', feature_set)
+    assert instances.matrix.shape == (300, 40)
+    learner.learn(instances, c=1.0)
+
+    scores = learner.classify(learner.create_input_file(dataset, 'predict', feature_set))
+    relations = learner.read_predictions(dataset, scores)
+    assert all(edge.pred_target == edge.real_target for edge in dataset.edges())
+    assert len(relations) == sum(edge.real_target == 1 for edge in dataset.edges())
+
+    scorer = LinearSVMScorer(learner.model_path)
+    assert np.allclose(scorer.decision_values(dataset), scores)
+
+
+def test_linear_learner_undersampling():
+    dataset = synthetic_dataset(300, seed=2)
+    feature_set = {'feature_{}'.format(index): index for index in range(1, 40)}
+    learner = LinearSVMLearner()
+
+    instances = learner.create_input_file(dataset, 'train', feature_set, minority_class=1, majority_class_undersampling=0.0)
+    assert list(instances.labels) == [1] * sum(edge.real_target == 1 for edge in dataset.edges())
+
+    random.seed(3)
+    instances = learner.create_input_file(dataset, 'train', feature_set, minority_class=1, majority_class_undersampling=0.5)
+    random.seed(3)
+    expected = [edge.real_target for edge in dataset.edges() if edge.real_target == 1 or random.random() <= 0.5]
+    assert list(instances.labels) == expected
+
+
+def test_train_linear_svm_satisfies_the_optimality_conditions():
+    dataset = synthetic_dataset(200, seed=4)
+    for edge in list(dataset.edges())[:20]:
+        edge.real_target = -edge.real_target  # not separable anymore
+    edges = list(dataset.edges())
+    matrix = edge_feature_matrix(edges)
+    labels = np.array([edge.real_target for edge in edges], dtype=np.float64)
+    squared_norms = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+
+    weights, bias = train_linear_svm(matrix, labels, squared_norms, c=0.5, tolerance=1e-4)
+    margins = labels * (matrix.dot(weights) - bias)
+    # primal objective close to the one of a slightly perturbed solution
+    def objective(w, b):
+        return 0.5 * (w.dot(w) + b * b) + 0.5 * np.maximum(0, 1 - labels * (matrix.dot(w) - b)).sum()
+    rand = np.random.RandomState(0)
+    for _ in range(10):
+        assert objective(weights, bias) <= objective(weights + rand.normal(0, 1e-2, len(weights)), bias) + 1e-3
+    assert (margins > 0).mean() > 0.85
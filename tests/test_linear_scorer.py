@@ -0,0 +1,38 @@
+import pkg_resources
+from relna.learning.linear import LinearSVMScorer
+from tests.fakes import Edge, edge_dataset
+
+
+def read_support_vectors(model_path):
+    with open(model_path) as file:
+        lines = file.read().splitlines()
+    start = next(i for i, line in enumerate(lines) if 'threshold b' in line) + 1
+    bias = float(lines[start - 1].split('#')[0])
+    support_vectors = []
+    for line in lines[start:]:
+        tokens = line.replace('|EV|', '').split()
+        support_vectors.append((float(tokens[0]), {int(t.split(':')[0]): float(t.split(':')[1]) for t in tokens[1:]}))
+    return support_vectors, bias
+
+
+def test_linear_scorer_matches_svm_decision_function():
+    model_path = pkg_resources.resource_filename('relna.data', 'default_model')
+    scorer = LinearSVMScorer(model_path)
+    support_vectors, bias = read_support_vectors(model_path)
+
+    # the support vectors themselves plus a feature index unknown to the model
+    edges = [Edge(dict(vector)) for _, vector in support_vectors[:20]]
+    edges.append(Edge({1: 1, 999999: 3}))
+    edges.append(Edge({}))
+    dataset = edge_dataset(edges)
+
+    scores = scorer.decision_values(dataset)
+
+    for edge, score in zip(edges, scores):
+        expected = sum(alpha * sum(value * edge.features.get(index, 0) for index, value in vector.items())
+                       for alpha, vector in support_vectors) - bias
+        assert abs(score - expected) < 1e-9
+
+    relations = scorer.tag(dataset)
+    assert [edge.pred_target for edge in edges] == [1 if score > 0 else -1 for score in scores]
+    assert len(relations) == sum(score > 0 for score in scores)
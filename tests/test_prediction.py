@@ -0,0 +1,25 @@
+import os
+import pickle
+import shutil
+import pytest
+
+pytest.importorskip('nalaf.learning.svmlight')
+
+import pkg_resources
+from relna.prediction import RelnaPredictor
+
+
+def test_svmlight_predictor():
+    predictor = RelnaPredictor(svmlight_dir='/opt/svmlight')
+    svmlight = predictor.relation_extractor.svmlight
+    assert svmlight.svm_classify_call == os.path.join('/opt/svmlight', 'svm_classify')
+    assert svmlight.model_path == pkg_resources.resource_filename('relna.data', 'default_model')
+
+
+def test_svmlight_predictor_model_dir(tmpdir):
+    shutil.copyfile(pkg_resources.resource_filename('relna.data', 'default_model'), str(tmpdir.join('default_model')))
+    with open(str(tmpdir.join('features.pickle')), 'wb') as file:
+        pickle.dump({'1_feature_[0]': 1}, file)
+
+    predictor = RelnaPredictor(svmlight_dir='/opt/svmlight', model_dir=str(tmpdir))
+    assert predictor.relation_extractor.svmlight.model_path == str(tmpdir.join('default_model'))
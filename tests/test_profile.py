@@ -0,0 +1,38 @@
+from relna.features.profiling import GeneratorProfile
+
+
+class Generator:
+    pass
+
+
+def test_generator_profile():
+    profile = GeneratorProfile()
+    profile.runs += 1
+    profile.edges += 4
+    stats = profile.generator(0, Generator())
+    stats['seconds'] += 0.5
+    stats['edges'] += 4
+    stats['features'] += 10
+    profile.generator(1, Generator())['new_features'] += 3
+    profile.sentence_cache['hits'] += 5
+    profile.sentence_cache['misses'] += 1
+
+    shard_profile = GeneratorProfile()
+    shard_profile.edges += 2
+    shard_stats = shard_profile.generator(0, Generator())
+    shard_stats['seconds'] += 0.5
+    shard_stats['edges'] += 2
+    shard_stats['features'] += 2
+    shard_profile.sentence_cache['hits'] += 1
+    shard_profile.sentence_cache['misses'] += 1
+    profile.merge(shard_profile)
+
+    report = profile.report()
+    assert (report['runs'], report['edges'], report['features'], report['new_features']) == (1, 6, 12, 3)
+    assert report['sentence_cache'] == {'hits': 6, 'misses': 2, 'hit_rate': 0.75}
+    assert [stats['index'] for stats in report['generators']] == [0, 1]
+    first = report['generators'][0]
+    assert first['name'] == 'Generator'
+    assert (first['seconds'], first['edges'], first['features']) == (1.0, 6, 12)
+    assert first['edges_per_second'] == 6 and first['features_per_edge'] == 2
+    assert report['generators'][1]['edges_per_second'] is None
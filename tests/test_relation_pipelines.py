@@ -0,0 +1,36 @@
+import pytest
+
+from tests.fakes import parsed_dataset
+
+pytest.importorskip('nalaf')
+pytest.importorskip('nltk')
+
+from relna.features.hashing import HashedFeatureSpace
+from relna.learning.taggers import RelnaRelationExtractor
+from relna.structures.relation_pipelines import ParallelRelationExtractionPipeline
+
+
+@pytest.mark.parametrize('feature_bits', [None, 12])
+def test_parallel_pipeline_is_deterministic(feature_bits):
+    results = {}
+    for n_jobs in (1, 3):
+        pipeline = ParallelRelationExtractionPipeline(
+            'e_1', 'e_2', 'r_4', n_jobs=n_jobs, feature_set=HashedFeatureSpace(feature_bits) if feature_bits else None,
+            feature_generators=RelnaRelationExtractor.default_feature_generators('e_1', 'e_2', fused=True))
+        training_set, test_set = parsed_dataset(n_docs=8, seed=1), parsed_dataset(n_docs=8, seed=2)
+
+        # the datasets are already preprocessed, so only the features are generated, as execute would
+        for dataset, is_training_mode in ((training_set, True), (test_set, False)):
+            if n_jobs == 1:
+                for generator in pipeline.feature_generators:
+                    generator.generate(dataset, pipeline.feature_set, is_training_mode)
+            else:
+                pipeline.generate_features(dataset, is_training_mode)
+
+        feature_set = None if feature_bits else list(pipeline.feature_set.items())
+        # the sentence cache counters of the workers are carried back too
+        results[n_jobs] = feature_set, [edge.features for edge in training_set.edges()], \
+            [edge.features for edge in test_set.edges()], pipeline.feature_generators[0].sentence_cache.stats()
+
+    assert any(results[1][1]) and any(results[1][2]) and results[1][3]['hits'] > 0
+    assert results[3] == results[1]
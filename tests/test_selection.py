@@ -0,0 +1,138 @@
+import json
+import random
+from math import log2
+from relna.features.selection import FeatureSelection, feature_group, select_features, compact_feature_set, \
+    compact_edge_features, skipped_generators, information_gain
+from relna.learning.compaction import compact, read_skipped_generators, BUDGET_FILE
+from tests.fakes import Edge, edge_dataset
+
+
+class _Engine:
+    def __init__(self, generator_groups):
+        self.generator_groups = generator_groups
+
+
+# group 1 separates the classes, group 10 (whose names also start with '1') and group 2 do not
+FEATURE_SET = {'1_interacts_[0]': 1, '10_the_[0]': 2, '2_of_[0]': 3, '1_binds_[0]': 4}
+
+
+def dataset():
+    return edge_dataset([
+        Edge({1: 1, 2: 1, 3: 1}, 1),
+        Edge({1: 1, 3: 1, 4: 1}, 1),
+        Edge({2: 1, 3: 1}, -1),
+        Edge({2: 1}, -1),
+    ])
+
+
+def test_feature_group():
+    assert feature_group('1_interacts_[0]') == 1
+    assert feature_group('107_e_1_count_[2]') == 107
+
+
+def test_select_groups():
+    selected = FeatureSelection(dataset()).select(FEATURE_SET, nbest=1)
+    assert selected == {'1_interacts_[0]': 1, '1_binds_[0]': 4}
+
+
+def loop_information_gain(feature_set, dataset):
+    """
+    The original implementation of information_gain, one pass over the edges per feature.
+    """
+    def plogp(p):
+        return p * log2(p) if p > 0 else 0
+
+    edges = list(dataset.edges())
+    n_pos = sum(1 for edge in edges if edge.real_target == 1)
+    n_neg = len(edges) - n_pos
+    p_pos, p_neg = n_pos / len(edges), n_neg / len(edges)
+    first = -(plogp(p_pos) + plogp(p_neg))
+
+    feature_list = []
+    for key, value in feature_set.items():
+        present_pos = sum(1 for edge in edges if edge.real_target == 1 and value in edge.features)
+        present_neg = sum(1 for edge in edges if edge.real_target == -1 and value in edge.features)
+        absent_pos = sum(1 for edge in edges if edge.real_target == 1 and value not in edge.features)
+        absent_neg = sum(1 for edge in edges if edge.real_target == -1 and value not in edge.features)
+        present, absent = present_pos + present_neg, absent_pos + absent_neg
+
+        second_factor = plogp(present_pos / present) + plogp(present_neg / present) if present else 0
+        # sic: the original weighs the presence in negative edges with its presence in positive ones
+        second = (present_pos / n_pos * p_pos + present_pos / n_neg * p_neg) * second_factor
+        third_factor = plogp(absent_pos / absent) + plogp(absent_neg / absent) if absent else 0
+        third = (absent_pos / n_pos * p_pos + absent_neg / n_neg * p_neg) * third_factor
+        feature_list.append([key, value, first + second + third])
+    return feature_list
+
+
+def random_dataset(seed=1):
+    rnd = random.Random(seed)
+    feature_set = {'{}_f{}_[0]'.format(rnd.randint(1, 8), index): index for index in range(1, 60)}
+    edges = [Edge({index: 1 for index in rnd.sample(range(1, 60), rnd.randint(0, 12))}, rnd.choice([1, 1, -1, -1, -1, None]))
+             for _ in range(80)]
+    return feature_set, edge_dataset(edges)
+
+
+def test_information_gain_matches_the_loop():
+    feature_set, training_set = random_dataset()
+    feature_list = information_gain(feature_set, training_set)
+    expected = loop_information_gain(feature_set, training_set)
+    assert [item[:2] for item in feature_list] == [item[:2] for item in expected]
+    assert all(abs(item[2] - expected_item[2]) < 1e-12 for item, expected_item in zip(feature_list, expected))
+
+
+def test_select_matches_the_loop_ranking():
+    feature_set, training_set = random_dataset(seed=2)
+    expected = loop_information_gain(feature_set, training_set)
+
+    # the groups with the highest average information gain (the original sorted them
+    # in increasing order, and so selected the worst groups)
+    counts, sums = {}, {}
+    for feature_name, _, entropy in expected:
+        group = feature_group(feature_name)
+        counts[group] = counts.get(group, 0) + 1
+        sums[group] = sums.get(group, 0) + entropy
+    best_groups = sorted(counts, key=lambda group: -sums[group] / counts[group])[:3]
+    selected = FeatureSelection(training_set).select(feature_set, nbest=3)
+    assert selected == {key: value for key, value in feature_set.items() if feature_group(key) in best_groups}
+
+    best_features = sorted(expected, key=lambda item: -item[2])[:10]
+    assert set(FeatureSelection(training_set).select(feature_set, nbest=10, group=False)) == \
+        {item[0] for item in best_features}
+
+
+def test_select_features():
+    feature_list = [['1_a_[0]', 1, 0.5], ['1_b_[0]', 2, 0.05], ['2_c_[0]', 3, 0.4], ['3_d_[0]', 4, 0.3]]
+    assert select_features(feature_list, n_features=2) == {'1_a_[0]', '2_c_[0]'}
+    assert select_features(feature_list, n_groups=2) == {'2_c_[0]', '3_d_[0]'}
+    assert select_features(feature_list, n_features=1, n_groups=2) == {'2_c_[0]'}
+    assert len(select_features(feature_list, n_groups=10)) == 4
+
+
+def test_compact_feature_set():
+    compact_set, index_map = compact_feature_set(FEATURE_SET, {'1_binds_[0]', '10_the_[0]'})
+    assert compact_set == {'10_the_[0]': 1, '1_binds_[0]': 2}
+    assert index_map == {2: 1, 4: 2}
+
+    edges = [Edge({1: 1, 2: 1, 4: 0.5}, 1), Edge({3: 1}, -1)]
+    compact_edge_features(edges, index_map)
+    assert [edge.features for edge in edges] == [{1: 1, 2: 0.5}, {}]
+
+
+def test_skipped_generators():
+    generator_groups = {0: {1, 10}, 1: {2}, 2: set(), 3: {2, 3}}
+    assert skipped_generators(generator_groups, {1, 3}) == [1, 2]
+
+
+def test_compact(tmpdir):
+    training_set = dataset()
+    feature_set, index_map, skip = compact(training_set, FEATURE_SET, n_groups=1,
+                                           engine=_Engine({0: {1}, 1: {10}, 2: {2}}))
+    assert feature_set == {'1_interacts_[0]': 1, '1_binds_[0]': 2}
+    assert index_map == {1: 1, 4: 2}
+    assert skip == [1, 2]
+    assert [edge.features for edge in training_set.edges()] == [{1: 1}, {1: 1, 2: 1}, {}, {}]
+
+    assert read_skipped_generators(str(tmpdir)) == []
+    tmpdir.join(BUDGET_FILE).write(json.dumps({'skip_generators': skip, 'feature_groups': [1]}))
+    assert read_skipped_generators(str(tmpdir)) == [1, 2]
@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip('nalaf.utils.readers')
+
+import relna.server
+from relna.server import RelnaService
+
+
+class PredictorPool:
+    def __init__(self, predictor_options, size=1):
+        self.predictor_options = predictor_options
+
+
+def test_reload_model_dir(monkeypatch):
+    monkeypatch.setattr(relna.server, 'PredictorPool', PredictorPool)
+    service = RelnaService({'model_path': None, 'feature_set_path': None, 'model_dir': 'compact_v1', 'n_jobs': 1})
+
+    options = service.reload(model_dir='compact_v2')
+    assert (options['model_dir'], options['model_path']) == ('compact_v2', None)
+
+    options = service.reload(model_path='default_model', feature_set_path='features.pickle')
+    assert (options['model_dir'], options['model_path'], options['feature_set_path']) == \
+        (None, 'default_model', 'features.pickle')
+
+    options = service.reload(model_dir='compact_v3')
+    assert options['model_dir'] == 'compact_v3'
+    assert service.pool.predictor_options == options
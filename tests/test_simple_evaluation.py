@@ -2,13 +2,22 @@ from nalaf.utils.readers import HTMLReader
 from nalaf.utils.annotation_readers import AnnJsonAnnotationReader
 from nalaf.learning.taggers import StubSameSentenceRelationExtractor
 from nalaf.learning.evaluators import DocumentLevelRelationEvaluator, Evaluations
+from relna.structures.relation_pipelines import ParallelRelationExtractionPipeline
 from nalaf.structures.relation_pipelines import RelationExtractionPipeline
+from nalaf.structures.data import FeatureDictionary
 from nalaf.preprocessing.tokenizers import TmVarTokenizer, NLTK_TOKENIZER
 from nalaf.learning.svmlight import SVMLightTreeKernels
 from nalaf.preprocessing.parsers import SpacyParser
 from spacy.en import English
 # from relna.learning.taggers import TranscriptionFactorTagger
 from relna.learning.taggers import RelnaRelationExtractor
+from relna.learning.evaluators import cross_validate
+from relna.learning.linear import LinearSVMLearner
+from relna.features.hashing import HashedFeatureSpace
+from relna.features.profiling import GeneratorProfile
+from relna.features.engine import RawFeatureCache
+from relna.features.selection import compact_edge_features
+from relna.learning.compaction import compact
 import argparse
 import math
 
@@ -24,9 +33,24 @@ def parse_arguments(argv):
     parser.add_argument('--use_test_set', default=False, action='store_true')
     parser.add_argument('--k_num_folds', type=int, default=5)
     parser.add_argument('--use_tk', default=False, action='store_true')
+    parser.add_argument('--learner', default='svmlight', choices=['svmlight', 'in_process'], help='train with the svm_learn executable or in-process (LinearSVMLearner, linear kernel only)')
+    parser.add_argument('--feature_jobs', type=int, default=1, help='processes used to generate the features of each fold (without --feature_cache); -1 == all cores')
+    parser.add_argument('--feature_cache', default=False, action='store_true', help='generate the raw features once for all folds instead of again for every fold (see RawFeatureCache)')
+    parser.add_argument('--feature_bits', type=int, default=None, help='hash the features into 2^feature_bits indices instead of a feature dictionary')
+    parser.add_argument('--cv_jobs', type=int, default=1, help='folds trained and evaluated in parallel, each in its own process; -1 == all cores')
+    parser.add_argument('--feature_budget', type=int, default=None, help='retrain each fold on only its features with the highest information gain (see relna.learning.compaction)')
+    parser.add_argument('--group_budget', type=int, default=None, help='retrain each fold on only its feature groups with the highest average information gain')
+    parser.add_argument('--profile', default=None, help='write the time and features of every feature generator, over all folds, to this JSON file (requires --cv_jobs 1)')
 
     args = parser.parse_args(argv)
 
+    if args.learner == 'in_process' and args.use_tk:
+        parser.error('the in-process learner does not support tree kernels, use --learner svmlight')
+    if (args.feature_budget or args.group_budget) and args.feature_bits:
+        parser.error('hashed features cannot be selected by name, drop --feature_bits')
+    if args.profile and args.cv_jobs != 1:
+        parser.error('--profile cannot collect the feature generation of folds run in other processes, use --cv_jobs 1')
+
     if args.corpus == "relna":
         args.dataset_folder_html = './resources/corpora/relna/corrected/'
         args.dataset_folder_annjson = args.dataset_folder_html
@@ -103,22 +127,53 @@ def test_relna(argv=None):
     else:
         parser = None
 
+    profile = GeneratorProfile() if args.profile else None
+    feature_space = HashedFeatureSpace(args.feature_bits) if args.feature_bits else None
+
+    if not args.feature_cache:
+        feature_cache = None
+    else:
+        # preprocess all the documents and generate their raw features only once, for all the folds
+        preprocessing = RelationExtractionPipeline(args.e_id_1, args.e_id_2, args.r_id, parser=parser, tokenizer=TmVarTokenizer())
+        preprocessing.feature_generators = []
+        preprocessing.execute(dataset, train=True)
+        engine = RelnaRelationExtractor.default_feature_generators(args.e_id_1, args.e_id_2, fused=True, profile=profile)[0]
+        feature_cache = RawFeatureCache(engine, feature_space)
+        feature_cache.fill(dataset)
+
     def train(training_set):
-        feature_generators = RelnaRelationExtractor.default_feature_generators(args.e_id_1, args.e_id_2)
-        pipeline = RelationExtractionPipeline(args.e_id_1, args.e_id_2, args.r_id, parser=parser, tokenizer=TmVarTokenizer(), feature_generators=feature_generators)
+        if feature_cache is not None:
+            feature_set = feature_space if feature_space is not None else FeatureDictionary()
+            feature_cache.apply(training_set, feature_set, True)
+            generate_features = (lambda validation_set: feature_cache.apply(validation_set, feature_set, False))
+        else:
+            feature_generators = RelnaRelationExtractor.default_feature_generators(args.e_id_1, args.e_id_2, fused=True, profile=profile)
+            pipeline = ParallelRelationExtractionPipeline(args.e_id_1, args.e_id_2, args.r_id, n_jobs=args.feature_jobs, parser=parser, tokenizer=TmVarTokenizer(), feature_set=feature_space, feature_generators=feature_generators)
+            pipeline.execute(training_set, train=True)
+            feature_set = pipeline.feature_set
+            generate_features = (lambda validation_set: pipeline.execute(validation_set, train=False))
+
+        if args.feature_budget or args.group_budget:
+            feature_set, index_map, _ = compact(training_set, feature_set, n_features=args.feature_budget, n_groups=args.group_budget)
+            generate_full_features = generate_features
 
-        pipeline.execute(training_set, train=True)
+            def generate_features(validation_set):
+                generate_full_features(validation_set)
+                compact_edge_features(validation_set.edges(), index_map)
 
         # CAUTION! previous relna svm_light had the threshold of prediction at '-0.1' -- nalaf changed it to 0 (assumed to be correct) -- This does change the performance and actually reduce it in this example
         # http://svmlight.joachims.org For classification, the sign of this value determines the predicted class -- CAUTION, relna (Ashish), had it set before to exactly: '-0.1' (was this a bug or a conscious decision to move the threshold of classification?)
         # See more information in: https://github.com/Rostlab/relna/issues/21
-        svmlight = SVMLightTreeKernels(classification_threshold=-0.1, use_tree_kernel=args.use_tk)
-        instancesfile = svmlight.create_input_file(training_set, 'train', pipeline.feature_set, minority_class=args.minority_class, majority_class_undersampling=args.majority_class_undersampling)
+        if args.learner == 'in_process':
+            svmlight = LinearSVMLearner(classification_threshold=-0.1)
+        else:
+            svmlight = SVMLightTreeKernels(classification_threshold=-0.1, use_tree_kernel=args.use_tk)
+        instancesfile = svmlight.create_input_file(training_set, 'train', feature_set, minority_class=args.minority_class, majority_class_undersampling=args.majority_class_undersampling)
         svmlight.learn(instancesfile, c=0.5)
 
         def annotator(validation_set):
-            pipeline.execute(validation_set, train=False)
-            instancesfile = svmlight.create_input_file(validation_set, 'predict', pipeline.feature_set)
+            generate_features(validation_set)
+            instancesfile = svmlight.create_input_file(validation_set, 'predict', feature_set)
             predictionsfile = svmlight.classify(instancesfile)
 
             svmlight.read_predictions(validation_set, predictionsfile)
@@ -127,9 +182,12 @@ def test_relna(argv=None):
         return annotator
 
     evaluator = DocumentLevelRelationEvaluator(rel_type=args.r_id)
-    evaluations = Evaluations.cross_validate(train, dataset, evaluator, args.k_num_folds, use_validation_set=not args.use_test_set)
+    evaluations = cross_validate(train, dataset, evaluator, args.k_num_folds, use_validation_set=not args.use_test_set, n_jobs=args.cv_jobs)
     rel_evaluation = evaluations(args.r_id).compute(strictness="exact")
 
+    if profile is not None:
+        profile.write(args.profile)
+
     assert math.isclose(rel_evaluation.f_measure, EXPECTED_F, abs_tol=EXPECTED_F_SE * 1.1)
 
 
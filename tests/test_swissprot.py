@@ -0,0 +1,81 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+import re
+from relna.utils.swissprot_utils import Swissprot, best_entries
+
+
+# uniprot id, reviewed, annotation score, cross-referenced gene ids
+ENTRIES = [
+    ('P04637', 'yes', 5, ['7157']),
+    ('Q53GA5', 'no', 3, ['7157']),
+    ('P10275', 'yes', 4, ['367']),
+    ('P10276', 'yes', 4, ['367', '5914']),
+    ('A0A024', 'no', 2, ['5914', '999']),
+    ('B4DNT4', 'no', 2, ['999']),
+    ('Q99999', 'no', 1, ['12345', '999']),
+    ('P99998', 'yes', 3, ['4242', '367', '5914']),
+]
+
+
+class StubUniprotHandler(BaseHTTPRequestHandler):
+    """
+    Answers the Uniprot queries used by Swissprot from ENTRIES, in the order of
+    a query-dependent relevance: entries cross-referenced to more of the
+    queried gene ids come first, as with the relevance score of Uniprot.
+    """
+    requests = 0
+
+    def do_GET(self):
+        StubUniprotHandler.requests += 1
+        params = parse_qs(urlparse(self.path).query)
+        query = params['query'][0]
+        geneids = re.findall(r'id:(\w+)\)', query)
+        reviewed = re.search(r'reviewed:(\w+)', query).group(1)
+
+        matches = sorted((entry for entry in ENTRIES if entry[1] == reviewed and set(entry[3]) & set(geneids)),
+                         key=lambda entry: -len(set(entry[3]) & set(geneids)))
+
+        body = 'Entry\tAnnotation\tCross-reference (GeneID)\n' if matches else ''
+        body += ''.join('{}\t{} out of 5\t{};\n'.format(entry[0], entry[2], ';'.join(entry[3])) for entry in matches)
+
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def test_batched_mapping_matches_one_by_one():
+    server = HTTPServer(('127.0.0.1', 0), StubUniprotHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}/uniprot/'.format(server.server_port)
+    geneids = ['7157', '367', '5914', '999', '12345', '424242']
+
+    try:
+        StubUniprotHandler.requests = 0
+        one_by_one = Swissprot(uniprot_url=url, batch_size=1).get_uniprotid_for_entrez_geneid(geneids)
+        one_by_one_requests = StubUniprotHandler.requests
+
+        StubUniprotHandler.requests = 0
+        batched = Swissprot(uniprot_url=url, batch_size=50).get_uniprotid_for_entrez_geneid(geneids)
+        batched_requests = StubUniprotHandler.requests
+    finally:
+        server.shutdown()
+
+    # P99998 is the most relevant hit of the batch query for 367 and 5914, but not their best entry
+    assert one_by_one == {'7157': ['P04637'], '367': ['P10275'], '5914': ['P10276'], '999': ['A0A024'],
+                          '12345': ['Q99999']}
+    assert batched == one_by_one
+    assert one_by_one_requests == 9
+    assert batched_requests == 2
+
+
+def test_best_entries():
+    text = 'Entry\tAnnotation\tCross-reference (GeneID)\n' \
+           'B2\t3 out of 5\t1;2;\n' \
+           'A1\t3 out of 5\t2;\n' \
+           'C3\t5 out of 5\t3;1;\n' \
+           'D4\t\t4;\n'
+    assert best_entries(text, ['1', '2', '4', '5']) == {'1': ['C3'], '2': ['A1'], '4': ['D4']}